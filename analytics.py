@@ -0,0 +1,250 @@
+import heapq
+import json
+import os
+import re
+from datetime import date, timedelta
+from totals import to_fixed, from_fixed
+
+# Resúmenes del historial para estadísticas, mantenidos por incrementos.
+# Cada entrada del historial (acción, producto, delta en libras, fecha y hora) suma al
+# resumen de su hora y de su día: peso que entró y salió por producto, acciones y
+# minutos con actividad (para acciones por minuto). Las consultas ("los que más se
+# movieron esta semana", series por día u hora) leen solo los resúmenes, nunca el
+# registro completo.
+#
+# Los resúmenes se guardan en un JSON junto al historial con la cantidad de entradas
+# ya incluidas; al abrirlos se suman solo las entradas nuevas. La primera vez se
+# recorre el historial entero y las entradas antiguas sin delta se interpretan desde
+# el texto de detalles ("queso - +2.00 lb").
+# Por producto y hora solo se guardan los últimos HOURLY_PRODUCT_DAYS días y por
+# producto y día los últimos DAILY_PRODUCT_DAYS (el periodo más largo de las
+# estadísticas), así que el archivo no crece con los años; los totales por día y por
+# hora, sin detalle de productos, se guardan todos.
+
+ROLLUPS_VERSION = 1
+HOURLY_PRODUCT_DAYS = 14
+DAILY_PRODUCT_DAYS = 366
+TOP_LIMIT = 10
+CATCH_UP_CHUNK = 10000
+ORDER_IN = "entrada"
+ORDER_OUT = "salida"
+ORDER_NET = "neto"
+ORDER_MOVED = "movido"
+ORDERS = (ORDER_MOVED, ORDER_IN, ORDER_OUT, ORDER_NET)
+
+# Columnas de los totales por hora y por día
+IN, OUT, ACTIONS, MINUTES = range(4)
+
+def rollups_path_for(history_path):
+    base, _ = os.path.splitext(history_path)
+    return base + ".resumen.json"
+
+# Entradas de versiones anteriores: el peso solo está en el texto de detalles
+LEGACY_SIGNS = {"Añadido": 1, "Modificado": 1, "Ingresado": 1, "Eliminado": -1, "Peso Restado": -1}
+LEGACY_WEIGHT = re.compile(r" - \+?(\d+(?:\.\d+)?) lb")
+
+def legacy_delta(entry):
+    sign = LEGACY_SIGNS.get(entry.get("accion"))
+    if sign is None or not entry.get("producto"):
+        return None
+    match = LEGACY_WEIGHT.search(entry.get("detalles", ""))
+    return sign * float(match.group(1)) if match else None
+
+# {producto: delta en milésimas} de una entrada
+def entry_changes(entry):
+    changes = {}
+    product = entry.get("producto")
+    delta = entry.get("delta") if "paso" in entry else legacy_delta(entry)
+    if product is not None and delta:
+        changes[product] = to_fixed(delta)
+    for name, weight in (entry.get("cambios") or {}).items():
+        changes[name] = changes.get(name, 0) + to_fixed(weight)
+    return changes
+
+class HistoryRollups:
+    def __init__(self, path):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        self.processed = 0
+        self.hours = {}
+        self.days = {}
+        self.hour_products = {}
+        self.day_products = {}
+        self.last_minute = None
+        self.last_step = None
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        rollups = cls(path)
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                data = None
+            if data and data.get("version") == ROLLUPS_VERSION:
+                rollups.processed = data["procesadas"]
+                rollups.hours = data["horas"]
+                rollups.days = data["dias"]
+                rollups.hour_products = data["horas_producto"]
+                rollups.day_products = data["dias_producto"]
+                rollups.last_minute = data.get("ultimo_minuto")
+                rollups.last_step = data.get("ultimo_paso")
+        return rollups
+
+    def save(self):
+        if not self.dirty:
+            return False
+        self.prune()
+        data = {
+            "version": ROLLUPS_VERSION, "procesadas": self.processed, "ultimo_minuto": self.last_minute,
+            "ultimo_paso": self.last_step, "horas": self.hours, "dias": self.days,
+            "horas_producto": self.hour_products, "dias_producto": self.day_products,
+        }
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+        self.dirty = False
+        return True
+
+    # Descartar el detalle por producto más viejo que HOURLY_PRODUCT_DAYS (por hora) y
+    # DAILY_PRODUCT_DAYS (por día), contados desde el día más reciente
+    def prune(self):
+        self.prune_products(self.hour_products, HOURLY_PRODUCT_DAYS)
+        self.prune_products(self.day_products, DAILY_PRODUCT_DAYS)
+
+    @staticmethod
+    def prune_products(products_by_key, days):
+        if not products_by_key:
+            return
+        newest = max(products_by_key)[:10]
+        oldest = (date.fromisoformat(newest) - timedelta(days=days - 1)).isoformat()
+        for key in [key for key in products_by_key if key[:10] < oldest]:
+            del products_by_key[key]
+
+    def add(self, entry):
+        self.processed += 1
+        self.dirty = True
+        fecha = entry.get("fecha") or ""
+        if not fecha:
+            return
+        hora = entry.get("hora") or "00:00:00"
+        hour = f"{fecha} {hora[:2]}"
+        day_totals = self.days.get(fecha)
+        if day_totals is None:
+            day_totals = self.days[fecha] = [0, 0, 0, 0]
+        hour_totals = self.hours.get(hour)
+        if hour_totals is None:
+            hour_totals = self.hours[hour] = [0, 0, 0, 0]
+        # Las entradas de un mismo paso (p. ej. un ingreso masivo) son una sola acción
+        step = entry.get("paso")
+        if step is None or step != self.last_step:
+            day_totals[ACTIONS] += 1
+            hour_totals[ACTIONS] += 1
+            minute = f"{fecha} {hora[:5]}"
+            if minute != self.last_minute:
+                day_totals[MINUTES] += 1
+                hour_totals[MINUTES] += 1
+                self.last_minute = minute
+        self.last_step = step
+        changes = entry_changes(entry)
+        if not changes:
+            return
+        day_products = self.day_products.setdefault(fecha, {})
+        hour_products = self.hour_products.setdefault(hour, {})
+        for name, delta in changes.items():
+            column = IN if delta > 0 else OUT
+            amount = abs(delta)
+            day_totals[column] += amount
+            hour_totals[column] += amount
+            for products in (day_products, hour_products):
+                moved = products.get(name)
+                if moved is None:
+                    moved = products[name] = [0, 0]
+                moved[column] += amount
+
+    def extend(self, entries):
+        for entry in entries:
+            self.add(entry)
+
+    # Sumar las entradas del historial que todavía no están en los resúmenes. Si se
+    # cancela queda a medias pero coherente (processed dice hasta dónde llegó)
+    def catch_up(self, history_log, progress=None, cancelled=None):
+        total = len(history_log)
+        if self.processed > total:
+            # El historial se reemplazó: se vuelve a resumir desde el principio
+            self.reset()
+        before = self.processed
+        for entry in history_log.entries_since(self.processed):
+            self.add(entry)
+            if (self.processed - before) % CATCH_UP_CHUNK == 0:
+                # Un historial de años no llega a tener todo el detalle en memoria
+                self.prune()
+                if cancelled is not None and cancelled():
+                    break
+                if progress is not None:
+                    progress(self.processed, total)
+        return self.processed - before
+
+    # Consultas: días terminados en "until" (hoy por defecto), del más viejo al más nuevo
+    @staticmethod
+    def day_keys(days, until=None):
+        until = until or date.today()
+        return [(until - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+
+    # [(día, entrada, salida, acciones, minutos)] con los pesos en libras
+    def daily(self, days, until=None):
+        rows = []
+        for day in self.day_keys(days, until):
+            totals = self.days.get(day, (0, 0, 0, 0))
+            rows.append((day, from_fixed(totals[IN]), from_fixed(totals[OUT]), totals[ACTIONS], totals[MINUTES]))
+        return rows
+
+    # Las 24 horas de un día: [(hora, entrada, salida, acciones, minutos)]
+    def hourly(self, day=None):
+        day = day or date.today().isoformat()
+        rows = []
+        for number in range(24):
+            hour = f"{day} {number:02d}"
+            totals = self.hours.get(hour, (0, 0, 0, 0))
+            rows.append((f"{number:02d}", from_fixed(totals[IN]), from_fixed(totals[OUT]), totals[ACTIONS], totals[MINUTES]))
+        return rows
+
+    # Productos que más se movieron en los últimos "days" días (como mucho
+    # DAILY_PRODUCT_DAYS): [(producto, entrada, salida, neto)] ordenado por "order"
+    def top_movers(self, days=7, order=ORDER_MOVED, limit=TOP_LIMIT, until=None):
+        return self.rank(self.day_products, self.day_keys(days, until), order, limit)
+
+    # Lo mismo para una sola hora ("HH") de un día de los últimos HOURLY_PRODUCT_DAYS
+    def hour_movers(self, day, hour, order=ORDER_MOVED, limit=TOP_LIMIT):
+        return self.rank(self.hour_products, [f"{day} {hour}"], order, limit)
+
+    @staticmethod
+    def rank(products_by_key, keys, order, limit):
+        moved = {}
+        for key in keys:
+            for name, (weight_in, weight_out) in products_by_key.get(key, {}).items():
+                total = moved.get(name)
+                if total is None:
+                    moved[name] = [weight_in, weight_out]
+                else:
+                    total[IN] += weight_in
+                    total[OUT] += weight_out
+        sort_key = {
+            ORDER_MOVED: lambda item: item[1][IN] + item[1][OUT],
+            ORDER_IN: lambda item: item[1][IN],
+            ORDER_OUT: lambda item: item[1][OUT],
+            ORDER_NET: lambda item: item[1][IN] - item[1][OUT],
+        }[order]
+        return [(name, from_fixed(weight_in), from_fixed(weight_out), from_fixed(weight_in - weight_out))
+                for name, (weight_in, weight_out) in heapq.nlargest(limit, moved.items(), key=sort_key)]
+
+# Acciones por minuto con actividad de una serie de daily()/hourly()
+def throughput(rows):
+    actions = sum(row[3] for row in rows)
+    minutes = sum(row[4] for row in rows)
+    return actions / minutes if minutes else 0.0
@@ -0,0 +1,188 @@
+import bisect
+from collections import Counter
+
+# Índice de nombres para autocompletar.
+# Los nombres se guardan en una lista ordenada por su forma normalizada (minúsculas,
+# espacios simples), así que las coincidencias por prefijo salen con bisect. Para
+# tolerar errores de tipeo cada nombre se indexa además por sus trigramas, y los
+# parecidos se buscan sin recorrer la lista completa. Se actualiza al añadir o quitar
+# un nombre.
+
+DEFAULT_LIMIT = 15
+MIN_FUZZY_LENGTH = 3
+MIN_FUZZY_SCORE = 0.3
+CANDIDATE_BUDGET = 4000
+RERANK_FACTOR = 4
+BULK_REBUILD_MIN = 200
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+class NameIndex:
+    def __init__(self, names=()):
+        self.keys = []
+        self.names = []
+        self.grams = {}
+        self.gram_counts = {}
+        self.rebuild(names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def rebuild(self, names):
+        pairs = sorted((normalize(name), name) for name in set(names))
+        self.keys = [key for key, _ in pairs]
+        self.names = [name for _, name in pairs]
+        self.grams = {}
+        self.gram_counts = {}
+        for key, name in pairs:
+            self.index_grams(key, name)
+
+    def index_grams(self, key, name):
+        grams = trigrams(key)
+        self.gram_counts[name] = len(grams)
+        for gram in grams:
+            self.grams.setdefault(gram, set()).add(name)
+
+    def position(self, name):
+        key = normalize(name)
+        position = bisect.bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.names[position] == name:
+                return key, position, True
+            position += 1
+        return key, position, False
+
+    def add(self, name):
+        key, position, found = self.position(name)
+        if found:
+            return
+        self.keys.insert(position, key)
+        self.names.insert(position, name)
+        self.index_grams(key, name)
+
+    # Muchos nombres a la vez: insertar o borrar uno a uno mueve la lista cada vez,
+    # así que por encima de cierta cantidad sale más barato rehacerla entera
+    def add_many(self, names):
+        names = [name for name in names if not self.position(name)[2]]
+        if len(names) <= BULK_REBUILD_MIN:
+            for name in names:
+                self.add(name)
+            return
+        pairs = sorted([(normalize(name), name) for name in names] + list(zip(self.keys, self.names)))
+        self.keys = [key for key, _ in pairs]
+        self.names = [name for _, name in pairs]
+        for name in names:
+            self.index_grams(normalize(name), name)
+
+    def remove(self, name):
+        key, position, found = self.position(name)
+        if not found:
+            return
+        del self.keys[position]
+        del self.names[position]
+        del self.gram_counts[name]
+        for gram in trigrams(key):
+            posting = self.grams.get(gram)
+            if posting is not None:
+                posting.discard(name)
+                if not posting:
+                    del self.grams[gram]
+
+    def remove_many(self, names):
+        names = set(names)
+        if len(names) <= BULK_REBUILD_MIN:
+            for name in names:
+                self.remove(name)
+            return
+        pairs = [(key, name) for key, name in zip(self.keys, self.names) if name not in names]
+        self.keys = [key for key, _ in pairs]
+        self.names = [name for _, name in pairs]
+        for name in names:
+            if self.gram_counts.pop(name, None) is None:
+                continue
+            for gram in trigrams(normalize(name)):
+                posting = self.grams.get(gram)
+                if posting is not None:
+                    posting.discard(name)
+                    if not posting:
+                        del self.grams[gram]
+
+    # Rango [inicio, fin) de la lista ordenada cuyos nombres empiezan por el texto
+    def prefix_range(self, text):
+        key = normalize(text)
+        start = bisect.bisect_left(self.keys, key)
+        return start, bisect.bisect_left(self.keys, key + "\U0010ffff", start)
+
+    def prefix(self, text, limit=DEFAULT_LIMIT):
+        start, end = self.prefix_range(text)
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.names[start:end]
+
+    # Nombres que contienen el texto: intersección de los trigramas del texto y
+    # comprobación final (con menos de 3 letras se recorren las claves)
+    def contains(self, text):
+        key = normalize(text)
+        if len(key) < 3:
+            return {name for name, name_key in zip(self.names, self.keys) if key in name_key}
+        postings = sorted((self.grams.get(key[position:position + 3], ()) for position in range(len(key) - 2)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates &= posting
+        if len(postings) == 1:
+            return candidates
+        return {name for name in candidates if key in normalize(name)}
+
+    # Nombres parecidos aunque tengan errores de tipeo, del más al menos parecido.
+    # Los candidatos salen de los trigramas menos frecuentes (hasta CANDIDATE_BUDGET
+    # nombres; si hasta el menos frecuente es muy común, de la intersección de varios)
+    # y solo los mejores se puntúan con la similitud exacta de trigramas.
+    def fuzzy(self, text, limit=DEFAULT_LIMIT):
+        key = normalize(text)
+        if len(key) < MIN_FUZZY_LENGTH:
+            return []
+        query = trigrams(key)
+        postings = sorted((self.grams[gram] for gram in query if gram in self.grams), key=len)
+        if not postings:
+            return []
+        if len(postings[0]) <= CANDIDATE_BUDGET:
+            counts = Counter()
+            inspected = 0
+            for posting in postings:
+                if inspected + len(posting) > CANDIDATE_BUDGET:
+                    break
+                counts.update(posting)
+                inspected += len(posting)
+            candidates = [name for name, _ in counts.most_common(limit * RERANK_FACTOR)]
+        else:
+            narrowed = postings[0]
+            for posting in postings[1:]:
+                if len(narrowed) <= CANDIDATE_BUDGET:
+                    break
+                narrowed = narrowed & posting
+            candidates = list(narrowed)[:limit * RERANK_FACTOR]
+        matches = []
+        for name in candidates:
+            shared = len(query & trigrams(normalize(name)))
+            score = shared / (len(query) + self.gram_counts[name] - shared)
+            if score >= MIN_FUZZY_SCORE:
+                matches.append((-score, name))
+        matches.sort()
+        return [name for _, name in matches[:limit]]
+
+    # Sugerencias para la lista desplegable: primero por prefijo, luego parecidos
+    def complete(self, text, limit=DEFAULT_LIMIT):
+        if not normalize(text):
+            return self.names[:limit]
+        matches = self.prefix(text, limit)
+        if len(matches) < limit:
+            seen = set(matches)
+            matches.extend(name for name in self.fuzzy(text, limit) if name not in seen)
+        return matches[:limit]
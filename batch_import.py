@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pdf_import import scan_pdf, read_pdf_pages
+
+# Importación por lotes de muchos PDF en un grupo de procesos.
+# Cada PDF se examina en un proceso: si trae el adjunto de productos se usa tal cual;
+# si no, sus páginas se reparten en tramos de PAGES_PER_TASK entre los procesos.
+# Los resultados se suman por producto a medida que llegan (como add_product) y la
+# interfaz recibe el avance por la cola `messages`. Un archivo con errores se anota
+# en `errors` sin detener el resto del lote.
+
+PAGES_PER_TASK = 20
+
+class BatchImport:
+    def __init__(self, file_paths, workers=None):
+        self.file_paths = list(dict.fromkeys(file_paths))
+        self.workers = workers
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.products = {}
+        self.sources = {}
+        self.errors = []
+        self.files_done = 0
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    # Productos que aparecen en más de un archivo del lote
+    def conflicts(self):
+        return sorted(name for name, count in self.sources.items() if count > 1)
+
+    def run(self):
+        try:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+                self.collect(executor)
+        except Exception as e:
+            self.messages.put(("error", e))
+
+    def collect(self, executor):
+        pending = {executor.submit(scan_pdf, path): (path, None) for path in self.file_paths}
+        # Tramos de páginas por archivo: {ruta: {primera página: productos o None}}
+        chunks = {}
+        failed = set()
+        while pending:
+            done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            if self.cancel_event.is_set():
+                for future in pending:
+                    future.cancel()
+                self.messages.put(("cancelled", None))
+                return
+            for future in done:
+                path, start = pending.pop(future)
+                if path in failed:
+                    continue
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed.add(path)
+                    chunks.pop(path, None)
+                    self.errors.append((os.path.basename(path), str(e)))
+                    self.finish_file(path, None)
+                    continue
+                if start is None:
+                    kind, value = result
+                    if kind == "productos":
+                        self.finish_file(path, value)
+                    elif value == 0:
+                        self.finish_file(path, {})
+                    else:
+                        chunks[path] = {}
+                        for first in range(0, value, PAGES_PER_TASK):
+                            chunks[path][first] = None
+                            task = executor.submit(read_pdf_pages, path, first, min(first + PAGES_PER_TASK, value))
+                            pending[task] = (path, first)
+                    continue
+                file_chunks = chunks[path]
+                file_chunks[start] = result
+                if all(part is not None for part in file_chunks.values()):
+                    # Dentro de un mismo archivo manda la última aparición, como al leerlo entero
+                    imported_products = {}
+                    for first in sorted(file_chunks):
+                        imported_products.update(file_chunks[first])
+                    del chunks[path]
+                    self.finish_file(path, imported_products)
+        self.messages.put(("done", None))
+
+    def finish_file(self, path, imported_products):
+        if imported_products:
+            for name, weight in imported_products.items():
+                self.products[name] = self.products.get(name, 0) + weight
+                self.sources[name] = self.sources.get(name, 0) + 1
+        elif imported_products is not None:
+            self.errors.append((os.path.basename(path), "No se encontraron productos válidos."))
+        self.files_done += 1
+        self.messages.put(("progress", self.files_done))
@@ -0,0 +1,404 @@
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from ledger import open_ledger, STORAGES, STORAGE_JSON
+from export import FORMAT_CSV, FORMAT_XLSX, FORMAT_JSONL
+from product_filter import ProductView, ProductFilter
+
+# Banco de pruebas de rendimiento de las operaciones frecuentes, sin ventana.
+# Se mide sobre el núcleo (ProductLedger y ProductView), que es lo que ejecutan los
+# botones de fda.py: añadir producto, refrescar la lista, total, pasos de deshacer,
+# guardar/cargar la sesión, exportar (CSV, XLSX, JSON Lines, PDF) e importar PDF.
+# Para cada tamaño de inventario sintético (1k/10k/100k por defecto) se guarda
+# latencia (media, p50, p95, máx.), operaciones por segundo y memoria máxima
+# asignada (tracemalloc, en una pasada aparte para no alterar los tiempos).
+#
+#   python benchmarks.py --guardar base_rendimiento.json     crear la referencia
+#   python benchmarks.py --comparar base_rendimiento.json    falla si algo empeoró
+#
+# Cada tamaño corre en un directorio temporal con nombres y ediciones generados con
+# una semilla fija, así que dos ejecuciones miden exactamente el mismo trabajo. Todo
+# se repite en varias rondas y de cada operación se guarda la ronda con el p50
+# mediano. En una máquina compartida una ejecución entera puede ir casi al doble de
+# lento que otra, así que las operaciones de milisegundos o de pocas muestras
+# (filtrar 100k, guardar, exportar, PDF) se comparan con una tolerancia más amplia y
+# las de microsegundos solo cuentan si empeoran más que MIN_REGRESSION_MS; las
+# regresiones que interesan (un recorrido completo donde no debía haberlo) son de
+# veces, no de porcentajes. La referencia se genera siempre completa, en una sola
+# ejecución.
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_SEED = 1234
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_MS = 0.1
+DEFAULT_ROUNDS = 3
+# Operaciones con menos muestras que esto, o con p50 de al menos SLOW_OPERATION_MS,
+# usan WIDE_TOLERANCE si es mayor que la pedida
+FEW_SAMPLES = 10
+SLOW_OPERATION_MS = 1.0
+WIDE_TOLERANCE = 1.5
+MIN_REGRESSION_BYTES = 1024 * 1024
+MAX_REPEATS = 2000
+PDF_MAX_SIZE = 100000
+WORDS = ("queso", "leche", "pollo", "carne", "tomate", "manzana", "arroz", "frijol", "pan", "yogur",
+         "jamón", "pavo", "lechuga", "papa", "cebolla", "naranja", "harina", "azúcar", "café", "atún")
+KINDS = ("fresco", "entero", "molido", "orgánico", "light", "importado", "congelado", "natural")
+
+def product_names(count, seed):
+    generator = random.Random(seed)
+    return [f"{generator.choice(WORDS)} {generator.choice(KINDS)} {number:06d}" for number in range(count)]
+
+def inventory(count, seed):
+    generator = random.Random(seed + 1)
+    return {name: round(generator.uniform(0.5, 200), 2) for name in product_names(count, seed)}
+
+# Historial de ediciones sintético: (operación, nombre, peso) sobre nombres existentes
+# y nuevos, en la proporción de un día normal de trabajo
+def edit_history(names, count, seed):
+    generator = random.Random(seed + 2)
+    operations = []
+    for number in range(count):
+        roll = generator.random()
+        if roll < 0.6:
+            operations.append(("agregar", generator.choice(names), round(generator.uniform(0.1, 10), 2)))
+        elif roll < 0.8:
+            operations.append(("agregar", f"nuevo {number:06d}", round(generator.uniform(0.1, 10), 2)))
+        elif roll < 0.95:
+            operations.append(("restar", generator.choice(names), 0.01))
+        else:
+            operations.append(("renombrar", generator.choice(names), None))
+    return operations
+
+def summarize(durations):
+    durations = sorted(durations)
+    count = len(durations)
+    total = sum(durations)
+    return {
+        "n": count,
+        "media_ms": total / count * 1000,
+        "p50_ms": durations[count // 2] * 1000,
+        "p95_ms": durations[min(count - 1, int(count * 0.95))] * 1000,
+        "max_ms": durations[-1] * 1000,
+        "ops_s": count / total if total else None,
+    }
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+# Memoria máxima asignada durante una llamada (en bytes, por encima de lo ya asignado)
+def peak_memory(function, *args):
+    gc.collect()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+class Bench:
+    def __init__(self, size, seed, storage, directory):
+        self.size = size
+        self.seed = seed
+        self.storage = storage
+        self.directory = directory
+        self.products = inventory(size, seed)
+        self.names = list(self.products)
+        self.repeats = min(size, MAX_REPEATS)
+        self.random = random.Random(seed + 3)
+        self.ledger = self.open()
+        self.ledger.replace(self.products, "inventario sintético")
+        self.ledger.save(force=True)
+        self.view = ProductView(self.ledger)
+
+    def open(self):
+        path = lambda name: os.path.join(self.directory, name)
+        return open_ledger(self.storage, path("fda.sqlite3"), path("sesion.json"), path("historial.jsonl"), None)
+
+    def close(self):
+        self.ledger.close()
+
+    def sample(self):
+        return self.random.choice(self.names)
+
+    # Cada operación devuelve (lista de duraciones, función para medir memoria)
+    def add_existing(self):
+        names = [self.sample() for _ in range(self.repeats)]
+        return [timed(self.ledger.add, name, 1.5) for name in names], lambda: self.ledger.add(self.sample(), 1.5)
+
+    def add_new(self):
+        durations = [timed(self.ledger.add, f"alta {number:06d}", 2.0) for number in range(self.repeats)]
+        return durations, lambda: self.ledger.add("alta extra", 2.0)
+
+    def refresh_list(self):
+        def refresh():
+            self.view.refresh()
+            self.view.window(0, 40)
+        return [timed(refresh) for _ in range(20)], refresh
+
+    def filter_list(self):
+        def search():
+            self.view.set_filter(ProductFilter("que", min_weight=10, max_weight=90))
+            self.view.window(0, 40)
+        durations = [timed(search) for _ in range(20)]
+        self.view.set_filter(ProductFilter())
+        return durations, search
+
+    def update_list(self):
+        def update():
+            self.view.update(self.ledger.add(self.sample(), 0.5))
+            self.view.window(0, 40)
+        return [timed(update) for _ in range(self.repeats)], update
+
+    def total(self):
+        return [timed(lambda: self.ledger.total) for _ in range(self.repeats)], lambda: self.ledger.total
+
+    def suggest(self):
+        texts = [self.sample()[:4] for _ in range(self.repeats)]
+        return [timed(self.ledger.suggest, text) for text in texts], lambda: self.ledger.suggest("quso")
+
+    # Paso de deshacer de una acción suelta (lo que antes era save_undo_state) y su deshacer
+    def undo_single(self):
+        durations = []
+        for _ in range(min(self.repeats, 500)):
+            self.ledger.add(self.sample(), 1.0)
+            durations.append(timed(self.ledger.undo))
+        return durations, lambda: (self.ledger.add(self.sample(), 1.0), self.ledger.undo())
+
+    # Deshacer y rehacer una importación que cambia todo el inventario
+    def undo_bulk(self):
+        weights = {name: 1.0 for name in self.names}
+        durations = []
+        for _ in range(3):
+            self.ledger.add_many(weights, "lote")
+            durations.append(timed(self.ledger.undo))
+            durations.append(timed(self.ledger.redo))
+        return durations, lambda: (self.ledger.add_many(weights, "lote"), self.ledger.undo())
+
+    def replay_history(self):
+        operations = edit_history(self.names, self.repeats, self.seed)
+        ledger = self.ledger
+
+        def apply(operation, name, weight):
+            if name not in ledger and operation != "agregar":
+                return
+            if operation == "agregar":
+                ledger.add(name, weight)
+            elif operation == "restar" and ledger.weight(name) > 0.02:
+                ledger.subtract(name, weight)
+            elif operation == "renombrar":
+                ledger.rename(name, name + " r")
+                ledger.rename(name + " r", name)
+        durations = [timed(apply, *operation) for operation in operations]
+        return durations, lambda: apply(*operations[0])
+
+    def save(self):
+        def save():
+            self.ledger.add(self.sample(), 0.25)
+            self.ledger.save(force=True)
+        return [timed(save) for _ in range(5)], save
+
+    def load(self):
+        def load():
+            ledger = self.open()
+            try:
+                ledger.load()
+            finally:
+                ledger.close()
+        return [timed(load) for _ in range(3)], load
+
+    # Comparar la sesión abierta con la guardada tras cambiar un 1 % de los productos
+    # (lectura de la sesión + hash join de los dos inventarios)
+    def reconcile(self):
+        from reconcile import prepare_source, compare, CURRENT, NAMED_PREFIX
+        if self.storage == STORAGE_JSON:
+            self.ledger.save(force=True)
+            source = self.ledger.session_store.snapshot_path
+        else:
+            self.ledger.session_store.save_as("banco")
+            source = NAMED_PREFIX + "banco"
+        for name in self.names[::100]:
+            self.ledger.add(name, 0.5)
+
+        def reconcile():
+            return compare(prepare_source(CURRENT, self.ledger)(), prepare_source(source, self.ledger)())
+        return [timed(reconcile) for _ in range(5)], reconcile
+
+    # Consultas de estadísticas sobre un año de historial sintético ("size" acciones
+    # repartidas en 365 días): totales por día y los productos con más movimiento
+    def analytics(self):
+        from datetime import date, timedelta
+        from analytics import HistoryRollups
+        rollups = HistoryRollups(os.path.join(self.directory, "historial.resumen.json"))
+        first_day = date.today() - timedelta(days=364)
+        for number in range(self.size):
+            moment = number * 365 * 24 * 60 // self.size
+            day = (first_day + timedelta(days=moment // (24 * 60))).isoformat()
+            delta = round(self.random.uniform(-5, 10), 2)
+            rollups.add({"fecha": day, "hora": f"{moment // 60 % 24:02d}:{moment % 60:02d}:00",
+                         "accion": "Añadido", "producto": self.sample(), "delta": delta, "paso": number})
+
+        def query():
+            rollups.daily(365)
+            return rollups.top_movers(365)
+        return [timed(query) for _ in range(5)], query
+
+    # Exportar el inventario completo en cada formato (para elegir el más barato)
+    def export(self, export_format):
+        path = os.path.join(self.directory, f"inventario.{export_format}")
+        return [timed(self.ledger.export, path) for _ in range(3)], lambda: self.ledger.export(path)
+
+    def export_pdf(self):
+        path = os.path.join(self.directory, "inventario.pdf")
+        return [timed(self.ledger.export_pdf, path)], lambda: self.ledger.export_pdf(path)
+
+    def import_pdf(self):
+        path = os.path.join(self.directory, "inventario.pdf")
+        if not os.path.exists(path):
+            self.ledger.export_pdf(path)
+        return [timed(self.ledger.import_pdf, path)], lambda: self.ledger.import_pdf(path)
+
+OPERATIONS = {
+    "agregar_existente": Bench.add_existing,
+    "agregar_nuevo": Bench.add_new,
+    "lista_completa": Bench.refresh_list,
+    "lista_filtrada": Bench.filter_list,
+    "lista_cambio": Bench.update_list,
+    "total": Bench.total,
+    "sugerencias": Bench.suggest,
+    "deshacer": Bench.undo_single,
+    "deshacer_lote": Bench.undo_bulk,
+    "historial_ediciones": Bench.replay_history,
+    "guardar_sesion": Bench.save,
+    "cargar_sesion": Bench.load,
+    "conciliar": Bench.reconcile,
+    "estadisticas": Bench.analytics,
+    "exportar_csv": lambda bench: bench.export(FORMAT_CSV),
+    "exportar_xlsx": lambda bench: bench.export(FORMAT_XLSX),
+    "exportar_jsonl": lambda bench: bench.export(FORMAT_JSONL),
+    "exportar_pdf": Bench.export_pdf,
+    "importar_pdf": Bench.import_pdf,
+}
+PDF_OPERATIONS = ("exportar_pdf", "importar_pdf")
+
+def pdf_available():
+    return all(importlib.util.find_spec(module) is not None for module in ("reportlab", "PyPDF2"))
+
+def run_size(size, operations, seed, storage, measure_memory, log):
+    directory = tempfile.mkdtemp(prefix="fda_bench_")
+    results = {}
+    try:
+        bench = Bench(size, seed, storage, directory)
+        try:
+            for name in operations:
+                if name in PDF_OPERATIONS and (size > PDF_MAX_SIZE or not pdf_available()):
+                    continue
+                durations, once = OPERATIONS[name](bench)
+                result = summarize(durations)
+                if measure_memory:
+                    result["memoria_max_bytes"] = peak_memory(once)
+                results[name] = result
+                log(f"  {name:<22} p50 {result['p50_ms']:9.3f} ms   p95 {result['p95_ms']:9.3f} ms"
+                    f"   máx {result['max_ms']:9.3f} ms"
+                    + (f"   {result['memoria_max_bytes'] / 1048576:8.2f} MB" if measure_memory else ""))
+        finally:
+            bench.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+# Una ronda por operación: la de p50 mediano (con su memoria), y cuántas hubo
+def median_round(rounds):
+    results = {}
+    for name in rounds[0]:
+        results[name] = dict(sorted((result[name] for result in rounds), key=lambda result: result["p50_ms"])[len(rounds) // 2])
+        results[name]["rondas"] = len(rounds)
+    return results
+
+def run(sizes, operations, seed=DEFAULT_SEED, storage=STORAGE_JSON, measure_memory=True, log=print, rounds=DEFAULT_ROUNDS):
+    report = {
+        "version": 1,
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "almacen": storage,
+        "semilla": seed,
+        "rondas": rounds,
+        "resultados": {},
+    }
+    for size in sizes:
+        results = []
+        for number in range(rounds):
+            log(f"{size} productos ({storage}), ronda {number + 1} de {rounds}")
+            results.append(run_size(size, operations, seed, storage, measure_memory, log))
+        report["resultados"][str(size)] = median_round(results)
+    # Memoria máxima del proceso completo (KB en Linux)
+    report["rss_max_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return report
+
+# Regresiones respecto a una referencia: p50 (o el único tiempo) y memoria que superan
+# la tolerancia relativa y además un mínimo absoluto (para ignorar ruido en lo muy rápido)
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    for size, operations in report["resultados"].items():
+        for name, result in operations.items():
+            reference = baseline.get("resultados", {}).get(size, {}).get(name)
+            if reference is None:
+                continue
+            time_tolerance = tolerance
+            if min(result["n"], reference["n"]) < FEW_SAMPLES or reference["p50_ms"] >= SLOW_OPERATION_MS:
+                time_tolerance = max(tolerance, WIDE_TOLERANCE)
+            current, previous = result["p50_ms"], reference["p50_ms"]
+            if current > previous * (1 + time_tolerance) and current - previous > MIN_REGRESSION_MS:
+                regressions.append(f"{name} ({size}): p50 {previous:.3f} → {current:.3f} ms (+{(current / previous - 1) * 100:.0f}%)")
+            current, previous = result.get("memoria_max_bytes"), reference.get("memoria_max_bytes")
+            if current is not None and previous is not None:
+                if current > previous * (1 + tolerance) and current - previous > MIN_REGRESSION_BYTES:
+                    regressions.append(f"{name} ({size}): memoria {previous / 1048576:.2f} → {current / 1048576:.2f} MB")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento del inventario FDA (sin ventana).")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(DEFAULT_SIZES), help="productos del inventario sintético")
+    parser.add_argument("--operaciones", nargs="+", choices=list(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument("--almacen", choices=STORAGES, default=STORAGE_JSON)
+    parser.add_argument("--semilla", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--sin-memoria", action="store_true", help="no medir memoria (más rápido)")
+    parser.add_argument("--rondas", type=int, default=DEFAULT_ROUNDS, help="repeticiones completas; se guarda la mediana")
+    parser.add_argument("--guardar", help="escribir los resultados en este archivo JSON")
+    parser.add_argument("--comparar", help="referencia JSON con la que comparar")
+    parser.add_argument("--tolerancia", type=float, default=DEFAULT_TOLERANCE, help="empeoramiento tolerado (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    if not pdf_available():
+        print("reportlab/PyPDF2 no están instalados: se omiten exportar_pdf e importar_pdf.", file=sys.stderr)
+    report = run(args.tamanos, args.operaciones, args.semilla, args.almacen, not args.sin_memoria, rounds=max(1, args.rondas))
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as file:
+            regressions = compare(report, json.load(file), args.tolerancia)
+        if regressions:
+            print(f"{len(regressions)} regresiones:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print("Sin regresiones respecto a la referencia.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
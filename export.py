@@ -0,0 +1,257 @@
+import csv
+import json
+import os
+import re
+import zipfile
+from totals import UNIT_LB, from_fixed, to_unit
+
+# Exportación de datos (sin interfaz gráfica): una tubería de filas y escritores
+# intercambiables. La tabla a exportar (inventario ordenado y/o filtrado, o el
+# historial) se prepara en el hilo de la interfaz a partir de una copia inmutable y
+# sus filas salen de un generador, así que los escritores reciben una fila a la vez
+# y escriben en flujo: CSV, JSON Lines, XLSX (zip con la hoja en XML escrita a medida
+# que llegan las filas, sin openpyxl) y PDF (pdf_export). Solo el orden del
+# inventario necesita la lista de posiciones en memoria; el resto es constante.
+#
+# Se escribe en un archivo temporal que reemplaza al destino al terminar, de modo que
+# un error o una cancelación no dejan un archivo a medias.
+
+FORMAT_CSV = "csv"
+FORMAT_XLSX = "xlsx"
+FORMAT_JSONL = "jsonl"
+FORMAT_PDF = "pdf"
+FORMATS = (FORMAT_CSV, FORMAT_XLSX, FORMAT_JSONL, FORMAT_PDF)
+EXTENSIONS = {".csv": FORMAT_CSV, ".xlsx": FORMAT_XLSX, ".jsonl": FORMAT_JSONL, ".ndjson": FORMAT_JSONL, ".pdf": FORMAT_PDF}
+SOURCE_INVENTORY = "inventario"
+SOURCE_HISTORY = "historial"
+ORDER_NAME = "nombre"
+ORDER_WEIGHT = "peso"
+ORDERS = (ORDER_NAME, ORDER_WEIGHT)
+PROGRESS_EVERY = 500
+WRITE_CHUNK = 1000
+
+# Exportación cancelada por el usuario
+class ExportCancelled(Exception):
+    pass
+
+class ExportTable:
+    def __init__(self, source, title, columns, rows, count=None, unit=UNIT_LB, widths=None):
+        self.source = source
+        self.title = title
+        self.columns = columns
+        self.rows = rows
+        self.count = count
+        self.unit = unit
+        self.widths = widths
+
+def format_for_path(file_path):
+    _, extension = os.path.splitext(file_path)
+    try:
+        return EXTENSIONS[extension.lower()]
+    except KeyError:
+        raise ValueError(f"Formato de exportación desconocido: '{extension or file_path}' (use .csv, .xlsx, .jsonl o .pdf).")
+
+# Inventario a partir de ProductStore.frozen(): filtro de product_filter.ProductFilter,
+# orden por nombre o de mayor a menor peso y pesos en "unit"
+def inventory_table(frozen, order=ORDER_NAME, product_filter=None, unit=UNIT_LB):
+    names, weights = frozen.names, frozen.weights
+    slots = [number for number, name in enumerate(names) if name is not None]
+    if product_filter is not None and product_filter.active:
+        slots = [number for number in slots if product_filter.matches(names[number], from_fixed(weights[number]))]
+    if order == ORDER_WEIGHT:
+        slots.sort(key=lambda number: (-weights[number], names[number]))
+    else:
+        slots.sort(key=names.__getitem__)
+
+    def rows():
+        for number in slots:
+            weight = from_fixed(weights[number])
+            yield names[number], weight if unit == UNIT_LB else round(to_unit(weight, unit), 3)
+    return ExportTable(SOURCE_INVENTORY, "Lista de Productos", ("producto", f"peso_{unit}"), rows(), len(slots), unit, (40, 14))
+
+# Historial en orden cronológico, leído de corrido (entries_since puede correr en otro
+# hilo). Filtros como HistoryLog.query: fechas AAAA-MM-DD inclusive, acción exacta y
+# texto contenido en el producto
+def history_table(history_log, date_from=None, date_to=None, action=None, product=None):
+    needle = product.lower() if product else None
+    filtered = bool(date_from or date_to or action or needle)
+
+    def rows():
+        for entry in history_log.entries_since(0):
+            fecha = entry.get("fecha", "")
+            name = entry.get("producto")
+            if filtered:
+                if (date_from and fecha < date_from) or (date_to and fecha > date_to):
+                    continue
+                if action and entry.get("accion") != action:
+                    continue
+                if needle and (name is None or needle not in name.lower()):
+                    continue
+            yield fecha, entry.get("hora", ""), entry.get("accion", ""), name, entry.get("delta"), entry.get("detalles", "")
+    columns = ("fecha", "hora", "accion", "producto", "delta_lb", "detalles")
+    return ExportTable(SOURCE_HISTORY, "Historial", columns, rows(), None if filtered else len(history_log), UNIT_LB,
+                       (11, 9, 18, 32, 10, 60))
+
+# Las filas pasan por aquí: avance cada PROGRESS_EVERY filas y cancelación
+def tracked(rows, count, progress=None, cancelled=None):
+    done = 0
+    for row in rows:
+        yield row
+        done += 1
+        if done % PROGRESS_EVERY == 0:
+            if cancelled is not None and cancelled():
+                raise ExportCancelled()
+            if progress is not None:
+                progress(done, count)
+    if progress is not None:
+        progress(done, count)
+
+def write_csv(file_path, table):
+    # Con BOM para que Excel reconozca UTF-8 (acentos)
+    with open(file_path, "w", newline="", encoding="utf-8-sig") as file:
+        writer = csv.writer(file)
+        writer.writerow(table.columns)
+        writer.writerows(table.rows)
+
+def write_json_lines(file_path, table):
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    columns = table.columns
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.writelines(encode(dict(zip(columns, row))) + "\n" for row in table.rows)
+
+def write_pdf(file_path, table):
+    if table.source != SOURCE_INVENTORY or table.unit != UNIT_LB:
+        raise ValueError("El PDF solo incluye el inventario en lb; use CSV, XLSX o JSON Lines.")
+    from pdf_export import write_inventory_pdf
+    write_inventory_pdf(file_path, table.rows, table.count, title=table.title)
+
+# XLSX mínimo: libro con una hoja, encabezado en negrita y fijo, textos en línea (sin
+# tabla de cadenas compartidas, que obligaría a guardar todos los textos)
+XLSX_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+XLSX_RELATIONSHIPS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+XLSX_PACKAGE_RELATIONSHIPS = "http://schemas.openxmlformats.org/package/2006/relationships"
+XLSX_SHEET_NAME = re.compile(r"[\[\]:*?/\\]")
+XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+XML_SPECIAL = re.compile('[&<>"\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def xlsx_parts(sheet_name):
+    return {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            '</Types>'
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<Relationships xmlns="{XLSX_PACKAGE_RELATIONSHIPS}">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ),
+        "xl/workbook.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<workbook xmlns="{XLSX_MAIN}" xmlns:r="{XLSX_RELATIONSHIPS}">'
+            f'<sheets><sheet name="{xml_text(sheet_name)}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<Relationships xmlns="{XLSX_PACKAGE_RELATIONSHIPS}">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+            '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+            '</Relationships>'
+        ),
+        "xl/styles.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<styleSheet xmlns="{XLSX_MAIN}">'
+            '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+            '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+            '</styleSheet>'
+        ),
+    }
+
+def xml_text(text):
+    if XML_SPECIAL.search(text) is None:
+        return text
+    text = XML_INVALID.sub("", text)
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+def column_letter(number):
+    letters = ""
+    number += 1
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def xlsx_cell(reference, value, style=""):
+    if value is None or value == "":
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{reference}"{style}><v>{value!r}</v></c>'
+    return f'<c r="{reference}"{style} t="inlineStr"><is><t xml:space="preserve">{xml_text(str(value))}</t></is></c>'
+
+def write_xlsx(file_path, table):
+    letters = [column_letter(number) for number in range(len(table.columns))]
+    sheet_name = XLSX_SHEET_NAME.sub(" ", table.title)[:31]
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in xlsx_parts(sheet_name).items():
+            archive.writestr(name, content)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            head = [
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>',
+                f'<worksheet xmlns="{XLSX_MAIN}">',
+                '<sheetViews><sheetView workbookViewId="0">'
+                '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>',
+            ]
+            if table.widths:
+                head.append("<cols>" + "".join(
+                    f'<col min="{number}" max="{number}" width="{width}" customWidth="1"/>'
+                    for number, width in enumerate(table.widths, 1)) + "</cols>")
+            head.append('<sheetData><row r="1">')
+            head.extend(xlsx_cell(f"{letter}1", column, ' s="1"') for letter, column in zip(letters, table.columns))
+            head.append("</row>")
+            sheet.write("".join(head).encode("utf-8"))
+            chunk = []
+            for number, row in enumerate(table.rows, 2):
+                chunk.append(f'<row r="{number}">'
+                             + "".join(xlsx_cell(f"{letter}{number}", value) for letter, value in zip(letters, row))
+                             + "</row>")
+                if len(chunk) == WRITE_CHUNK:
+                    sheet.write("".join(chunk).encode("utf-8"))
+                    chunk = []
+            chunk.append("</sheetData></worksheet>")
+            sheet.write("".join(chunk).encode("utf-8"))
+
+WRITERS = {
+    FORMAT_CSV: write_csv,
+    FORMAT_XLSX: write_xlsx,
+    FORMAT_JSONL: write_json_lines,
+    FORMAT_PDF: write_pdf,
+}
+
+# Escribir la tabla con el escritor del formato (por la extensión si no se indica);
+# progress(hechas, total) y cancelled() como en pdf_export.write_inventory_pdf
+def write_table(file_path, table, export_format=None, progress=None, cancelled=None):
+    export_format = export_format or format_for_path(file_path)
+    writer = WRITERS.get(export_format)
+    if writer is None:
+        raise ValueError(f"Formato de exportación desconocido: '{export_format}'.")
+    table.rows = tracked(table.rows, table.count, progress, cancelled)
+    temp_path = file_path + ".tmp"
+    try:
+        writer(temp_path, table)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
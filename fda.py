@@ -1,98 +1,398 @@
+import time
+STARTUP_STARTED = time.perf_counter()
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from tkinter import ttk, messagebox, filedialog, simpledialog
+import queue
+import threading
+import argparse
 import os
+import sys
 import json
-from datetime import datetime
+from ledger import open_ledger, STORAGES, STORAGE_JSON
+from totals import UNITS, UNIT_LB, format_weight, from_unit, to_unit
+from product_filter import ProductView, ProductFilter, MODE_CONTAINS, MODE_PREFIX
+from instrumentation import instruments, timed, span, LOOP_LAG
+from jobs import JobScheduler, JOB_POLL_MS
+# reportlab, PyPDF2, asyncio y los módulos que los usan se importan al usarlos (y los
+# de PDF se precargan en segundo plano tras mostrar la ventana), para abrir antes
+STARTUP_IMPORTED = time.perf_counter()
 
-# Archivo donde se guardará la sesión
-SESSION_FILE = "productos_sesion.json"
-
-# Función para guardar la sesión actual
+# Guardar la sesión (compactar el diario en la instantánea) en segundo plano: el
+# inventario se copia al empezar y el disco se escribe en el grupo de trabajos. Los
+# guardados que se piden mientras otro corre quedan en uno solo
 def save_session(show_alert=True):
-    try:
-        with open(SESSION_FILE, "w") as file:
-            json.dump(products, file)
+    if jobs.is_running("cargar") or not ledger.installed:
+        return
+
+    def prepare():
+        write = ledger.save_job(force=show_alert)
+        if write is None:
+            return None
+
+        def work(job):
+            with span("guardar sesión"):
+                write()
+        return work
+
+    def done(result):
         if show_alert:
             messagebox.showinfo("Éxito", "La sesión se ha guardado correctamente.")
-    except Exception as e:
+
+    def failed(e):
+        ledger.save_failed()
         messagebox.showerror("Error", f"No se pudo guardar la sesión: {str(e)}")
 
-# Función para cargar la sesión al iniciar
-def load_session():
-    global products
-    if os.path.exists(SESSION_FILE):
+    jobs.submit("guardar sesión", prepare, key="guardar", on_done=done, on_error=failed)
+
+# Al cerrar se cancela lo que esté en curso (salvo un guardado, que se espera) y se
+# compacta lo pendiente del diario. Si la sesión no llegó a instalarse no se guarda:
+# la instantánea y el diario en disco siguen siendo la sesión
+def close_app():
+    global closing
+    closing = True
+    loading = jobs.is_running("cargar")
+    if device_reader is not None:
+        device_reader.stop()
+    if sync_client is not None:
+        sync_client.stop()
+    jobs.shutdown(keep=("guardar",))
+    if ledger.installed and not loading:
         try:
-            with open(SESSION_FILE, "r") as file:
-                products = json.load(file)
-                update_product_list()
-                product_names.update(products.keys())
-                update_total_weight()
+            ledger.save()
         except Exception as e:
-            messagebox.showerror("Error", f"No se pudo cargar la sesión: {str(e)}")
+            messagebox.showerror("Error", f"No se pudo guardar la sesión: {str(e)}")
+    ledger.close()
+    instruments.stop_trace()
+    root.destroy()
+
+# Cerrar la ventana o "Salir": no mientras se carga la sesión
+def request_close():
+    if jobs.is_running("cargar"):
+        return
+    close_app()
+
+def poll_jobs():
+    if closing:
+        return
+    jobs.poll()
+    root.after(JOB_POLL_MS, poll_jobs)
+
+# Mientras se carga la sesión no se aceptan cambios (se perderían al instalarla)
+def set_input_state(state):
+    for widget in [add_button, product_weight_entry, *menu_buttons]:
+        widget.config(state=state)
+    product_name_entry.config(state="normal" if state == "normal" else "disabled")
+
+# Cargar la sesión al iniciar (instantánea + cambios del diario): la lectura y el índice
+# de nombres se preparan en el grupo de trabajos y se instalan en el hilo de la interfaz
+def load_session():
+    set_input_state("disabled")
+    total_weight_label.config(text="Cargando sesión...")
 
-# Función para calcular y actualizar el peso total
+    def work(job):
+        with span("leer sesión"):
+            return ledger.read_session()
+
+    def loaded(result):
+        with span("instalar sesión"):
+            ledger.install(*result)
+            update_product_list()
+            update_total_weight()
+            update_name_suggestions()
+        set_input_state("normal")
+        if not closing:
+            start_connections()
+        mark_session_loaded()
+
+    def failed(e):
+        set_input_state("normal")
+        update_total_weight()
+        messagebox.showerror("Error", f"No se pudo cargar la sesión: {str(e)}")
+
+    jobs.submit("cargar sesión", lambda: work, key="cargar", on_done=loaded, on_error=failed)
+
+# Función para actualizar el peso total (los totales se mantienen por diferencias en el núcleo)
 def update_total_weight():
-    total_weight = sum(products.values())
-    total_weight_label.config(text=f"Peso Total: {total_weight:.2f} lb")
+    total_weight_label.config(text=f"Peso Total: {format_weight(ledger.total, weight_unit)}")
+
+# Unidad para mostrar e ingresar pesos (el inventario sigue en libras): fda.py --unidad kg,
+# la variable de entorno FDA_UNIDAD o el selector junto al peso
+UNIT_ENV = "FDA_UNIDAD"
 
-# Pila para deshacer cambios
-undo_stack = []
-def save_undo_state():
-    undo_stack.append(products.copy())
+def startup_unit():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--unidad", choices=UNITS, default=os.environ.get(UNIT_ENV, UNIT_LB))
+    args, _ = parser.parse_known_args()
+    return args.unidad
+
+def change_unit(event=None):
+    global weight_unit
+    weight_unit = unit_entry.get()
+    update_total_weight()
+    # El rango de peso escrito se lee ahora en la nueva unidad
+    if min_weight_entry.get().strip() or max_weight_entry.get().strip():
+        apply_search()
+    else:
+        render_table()
+
+# Peso escrito por el usuario en la unidad elegida, en libras
+def read_weight(text):
+    return from_unit(float(text.strip().replace(",", ".")), weight_unit)
+
+# Refrescar la vista tras una operación del núcleo que cambió los productos indicados
+def show_changes(changed_products):
+    refresh_products(changed_products)
+    update_total_weight()
 
 def undo_action(event=None):
-    if not undo_stack:
+    with span("deshacer"):
+        changed = ledger.undo()
+        if changed is not None:
+            show_changes(changed)
+    if changed is None:
         messagebox.showinfo("Deshacer", "No hay acciones para deshacer.")
         return
-    last_state = undo_stack.pop()
-    global products, product_names
-    products = last_state
-    product_names = set(products.keys())
-    update_product_list()
-    update_total_weight()
     messagebox.showinfo("Deshacer", "Última acción revertida.")
 
+def redo_action(event=None):
+    with span("rehacer"):
+        changed = ledger.redo()
+        if changed is not None:
+            show_changes(changed)
+    if changed is None:
+        messagebox.showinfo("Rehacer", "No hay acciones para rehacer.")
+        return
+    messagebox.showinfo("Rehacer", "Acción rehecha.")
+
 # Función para añadir productos
 def add_product(event=None):
-    product_name = product_name_entry.get().strip()
     try:
-        weight = float(product_weight_entry.get())
-        if product_name == "":
-            messagebox.showerror("Error", "El nombre del producto no puede estar vacío.")
-            return
-        if weight <= 0:
-            messagebox.showerror("Error", "El peso debe ser mayor a 0.")
-            return
-
-        save_undo_state()
-        if product_name in products:
-            products[product_name] += weight
-            add_to_history("Modificado", f"{product_name} - +{weight:.2f} lb")
-        else:
-            products[product_name] = weight
-            product_names.add(product_name)
-            add_to_history("Añadido", f"{product_name} - {weight:.2f} lb")
-
-        update_product_list()
-        update_total_weight()
-        product_name_entry.delete(0, tk.END)
-        product_weight_entry.delete(0, tk.END)
-        product_name_entry.focus()
+        weight = read_weight(product_weight_entry.get())
     except ValueError:
         messagebox.showerror("Error", "El peso debe ser un número válido.")
+        return
+    try:
+        with span("añadir producto"):
+            show_changes(ledger.add(product_name_entry.get(), weight))
+            product_name_entry.delete(0, tk.END)
+            product_weight_entry.delete(0, tk.END)
+            update_name_suggestions()
+    except ValueError as e:
+        messagebox.showerror("Error", str(e))
+        return
+    product_name_entry.focus()
 
-# Actualizar lista de productos (orden alfabético)
-def update_product_list():
+# Autocompletar: en cada tecla la lista desplegable se llena con los nombres que
+# empiezan por lo escrito y, si faltan, con los parecidos (errores de tipeo)
+AUTOCOMPLETE_IGNORED_KEYS = {"Up", "Down", "Return", "KP_Enter", "Tab", "Escape", "Left", "Right", "Home", "End"}
+
+def update_name_suggestions(event=None):
+    if event is not None and event.keysym in AUTOCOMPLETE_IGNORED_KEYS:
+        return
+    product_name_entry["values"] = ledger.suggest(product_name_entry.get())
+
+# Tabla virtual: product_view tiene la lista filtrada y ordenada completa, pero la
+# Treeview solo contiene las filas visibles desde view_offset más TABLE_BUFFER_ROWS.
+# El desplazamiento lo maneja table_scrollbar; la selección se guarda por nombre para
+# que sobreviva al desplazamiento y al filtrado.
+TABLE_BUFFER_ROWS = 5
+TABLE_ROW_HEIGHT = 25
+SEARCH_DELAY_MS = 150
+view_offset = 0
+selected_products = set()
+search_job = None
+
+def product_row_values(product):
+    return (product, format_weight(ledger.products.get(product, 0), weight_unit))
+
+def visible_row_count():
+    height = product_list.winfo_height()
+    if height <= 1:
+        return int(product_list["height"])
+    return max(1, height // TABLE_ROW_HEIGHT - 1)
+
+@timed("dibujar tabla")
+def render_table():
+    global view_offset
+    rows = visible_row_count()
+    view_offset = max(0, min(view_offset, len(product_view) - rows))
+    names = product_view.window(view_offset, rows + TABLE_BUFFER_ROWS)
     product_list.delete(*product_list.get_children())
-    for product in sorted(products.keys()):
-        weight = products[product]
-        product_list.insert("", "end", values=(product, f"{weight:.2f} lb"))
+    for name in names:
+        product_list.insert("", "end", iid=name, values=product_row_values(name))
+    product_list.yview_moveto(0)
+    keep = [name for name in names if name in selected_products]
+    if keep:
+        product_list.selection_set(keep)
+    total = len(product_view)
+    if total:
+        table_scrollbar.set(view_offset / total, min(1.0, (view_offset + rows) / total))
+    else:
+        table_scrollbar.set(0, 1)
+    shown = f"Mostrando {total} de {len(ledger)} productos" if product_view.filter.active else f"{total} productos"
+    search_count_label.config(text=shown)
+
+# Un clic simple reemplaza la selección; con Ctrl o Mayús la amplía y se conservan los
+# seleccionados que quedaron fuera de la ventana visible. Los cambios que hace
+# render_table al desplazarse también conservan los de fuera de la ventana
+CLICK_EXTEND_MASK = 0x0001 | 0x0004
+table_click = {"replace": False}
+
+def on_table_click(event):
+    table_click["replace"] = not event.state & CLICK_EXTEND_MASK
+    # Si el clic no cambia la selección no llega <<TreeviewSelect>>
+    product_list.after_idle(table_click.update, replace=False)
+
+def on_table_select(event=None):
+    global selected_products
+    if table_click["replace"]:
+        table_click["replace"] = False
+        selected_products = set(product_list.selection())
+        return
+    window = set(product_list.get_children())
+    selected_products = (selected_products - window) | set(product_list.selection())
+
+# Productos seleccionados que siguen en la vista filtrada, en el orden de la tabla
+def selected_items():
+    positions = [product_view.position(name) for name in selected_products]
+    return [product_view.names[position] for position, listed in sorted(positions) if listed]
+
+def scroll_table(rows):
+    global view_offset
+    view_offset += rows
+    render_table()
+
+def on_table_scrollbar(command, value, units=None):
+    global view_offset
+    if command == "moveto":
+        view_offset = int(float(value) * len(product_view))
+        render_table()
+    elif units == "pages":
+        scroll_table(int(value) * visible_row_count())
+    else:
+        scroll_table(int(value))
 
-# Exportar a PDF
+def on_table_wheel(event):
+    if event.num == 4:
+        scroll_table(-3)
+    elif event.num == 5:
+        scroll_table(3)
+    else:
+        scroll_table(-3 if event.delta > 0 else 3)
+    return "break"
+
+# Flechas en el borde de la ventana visible: desplazar la lista en vez de salir de ella
+def on_table_arrow(event):
+    children = product_list.get_children()
+    focus = product_list.focus()
+    if not children or focus not in children:
+        return None
+    position = children.index(focus)
+    step = -1 if event.keysym == "Up" else 1
+    if (step < 0 and position == 0 and view_offset > 0) or (step > 0 and position >= visible_row_count() - 1):
+        target = view_offset + position + step
+        if not 0 <= target < len(product_view):
+            return "break"
+        selected_products.clear()
+        selected_products.add(product_view.names[target])
+        scroll_table(step)
+        product_list.focus(product_view.names[target])
+        return "break"
+    return None
+
+# Reconstruir la tabla completa (carga, importación, limpiar, cambio de filtro)
+def update_product_list():
+    product_view.refresh()
+    render_table()
+
+# Actualizar solo los productos indicados; la ventana visible se vuelve a dibujar
+def refresh_products(changed_products):
+    product_view.update(changed_products)
+    render_table()
+
+# Búsqueda: texto (contiene / empieza con) y rango de peso, aplicada al dejar de teclear
+def schedule_search(event=None):
+    global search_job
+    if search_job is not None:
+        root.after_cancel(search_job)
+    search_job = root.after(SEARCH_DELAY_MS, apply_search)
+
+def parse_optional_weight(entry):
+    text = entry.get().strip()
+    if not text:
+        return None
+    try:
+        return read_weight(text)
+    except ValueError:
+        return None
+
+@timed("buscar")
+def apply_search():
+    global search_job, view_offset
+    search_job = None
+    mode = MODE_PREFIX if search_mode_entry.get() == "Empieza con" else MODE_CONTAINS
+    product_view.set_filter(ProductFilter(
+        search_entry.get(),
+        mode,
+        parse_optional_weight(min_weight_entry),
+        parse_optional_weight(max_weight_entry),
+    ))
+    view_offset = 0
+    render_table()
+
+def clear_search():
+    for entry in (search_entry, min_weight_entry, max_weight_entry):
+        entry.delete(0, tk.END)
+    apply_search()
+
+# Exportar en el grupo de trabajos con barra de progreso y cancelación. La tabla
+# (ledger.export_table) ya tiene la copia de lo que se exporta, así que se puede
+# seguir pesando mientras se escribe
+def run_export(file_path, table, export_format, label):
+    from export import write_table, SOURCE_INVENTORY
+    row_count = table.count
+    noun = "productos" if table.source == SOURCE_INVENTORY else "filas"
+
+    progress_window = tk.Toplevel(root)
+    progress_window.title(f"Exportando {label}")
+    progress_window.geometry("400x140")
+    progress_window.transient(root)
+    status_label = tk.Label(progress_window, text=f"Exportando 0 de {row_count} {noun}..." if row_count is not None else "Exportando...")
+    status_label.pack(pady=10)
+    if row_count is not None:
+        progress_bar = ttk.Progressbar(progress_window, maximum=max(1, row_count), length=340)
+    else:
+        progress_bar = ttk.Progressbar(progress_window, mode="indeterminate", length=340)
+        progress_bar.start()
+    progress_bar.pack(pady=5)
+
+    @timed(f"exportar {export_format}")
+    def work(job):
+        write_table(file_path, table, export_format, progress=job.progress, cancelled=job.cancelled)
+
+    def progress(done, total):
+        if total is None:
+            status_label.config(text=f"Exportadas {done} {noun}...")
+            return
+        progress_bar["value"] = done
+        status_label.config(text=f"Exportando {done} de {total} {noun}...")
+
+    def done(result):
+        progress_window.destroy()
+        messagebox.showinfo("Éxito", f"Datos exportados a {file_path}")
+
+    def failed(e):
+        progress_window.destroy()
+        messagebox.showerror("Error", f"No se pudo exportar a {label}: {str(e)}")
+
+    job = jobs.submit(f"exportar {export_format}", lambda: work, on_done=done, on_error=failed, on_progress=progress,
+                      on_cancel=lambda result: progress_window.destroy())
+    ttk.Button(progress_window, text="Cancelar", command=job.cancel).pack(pady=10)
+    progress_window.protocol("WM_DELETE_WINDOW", job.cancel)
+
+# Exportar a PDF (tabla por columnas)
 def export_to_pdf():
-    if not products:
+    if not len(ledger):
         messagebox.showerror("Error", "No hay productos para exportar.")
         return
 
@@ -103,63 +403,128 @@ def export_to_pdf():
     )
     if not file_path:
         return
+    run_export(file_path, ledger.export_table(), "pdf", "PDF")
 
-    try:
-        pdf = canvas.Canvas(file_path, pagesize=letter)
-        pdf.setFont("Helvetica", 12)
-        pdf.drawString(30, 750, "Lista de Productos")
-        pdf.drawString(30, 730, "-" * 50)
-        y_position = 710
-        for product in sorted(products.keys()):
-            weight = products[product]
-            pdf.drawString(30, y_position, f"{product}: {weight:.2f} lb")
-            y_position -= 20
-            if y_position < 50:
-                pdf.showPage()
-                pdf.setFont("Helvetica", 12)
-                y_position = 750
-        pdf.save()
-        messagebox.showinfo("Éxito", f"Lista exportada a {file_path}")
-    except Exception as e:
-        messagebox.showerror("Error", f"No se pudo exportar el PDF: {str(e)}")
+# Exportar datos para otros sistemas: inventario completo o la lista filtrada (en la
+# unidad elegida) o el historial, en CSV, XLSX, JSON Lines o PDF
+EXPORT_SOURCES = ("Inventario completo", "Lista filtrada", "Historial")
+
+def show_export():
+    from export import FORMAT_CSV, FORMAT_XLSX, FORMAT_JSONL, FORMAT_PDF, ORDER_NAME, ORDER_WEIGHT
+    orders = {"Nombre": ORDER_NAME, "Peso (mayor a menor)": ORDER_WEIGHT}
+    formats = {
+        "CSV": (FORMAT_CSV, ".csv", "CSV"),
+        "Excel (XLSX)": (FORMAT_XLSX, ".xlsx", "Excel"),
+        "JSON Lines": (FORMAT_JSONL, ".jsonl", "JSON Lines"),
+        "PDF": (FORMAT_PDF, ".pdf", "PDF files"),
+    }
+
+    window = tk.Toplevel(root)
+    window.title("Exportar Datos")
+    window.geometry("380x220")
+    window.transient(root)
+
+    fields = tk.Frame(window)
+    fields.pack(fill="x", padx=10, pady=10)
+    entries = []
+    for row, (text, values) in enumerate((("Datos:", EXPORT_SOURCES), ("Formato:", list(formats)), ("Orden:", list(orders)))):
+        tk.Label(fields, text=text).grid(row=row, column=0, sticky="w", pady=3)
+        entry = ttk.Combobox(fields, width=24, values=values, state="readonly")
+        entry.set(values[0])
+        entry.grid(row=row, column=1, padx=5, pady=3)
+        entries.append(entry)
+    source_entry, format_entry, order_entry = entries
+    note_label = tk.Label(window, text="", fg="#666666", wraplength=350, justify="left")
+    note_label.pack(fill="x", padx=10)
+
+    def update_note(event=None):
+        source = source_entry.get()
+        export_format = formats[format_entry.get()][0]
+        if source == "Historial":
+            note = "El historial no se puede exportar a PDF." if export_format == FORMAT_PDF else "Todas las entradas, de la más antigua a la más reciente."
+        elif export_format == FORMAT_PDF:
+            note = "Pesos en lb (el PDF se puede volver a importar)."
+        else:
+            note = f"Pesos en {weight_unit}."
+        note_label.config(text=note)
+        order_entry.config(state="disabled" if source == "Historial" else "readonly")
+
+    def start_export():
+        source = source_entry.get()
+        export_format, extension, type_name = formats[format_entry.get()]
+        if source == "Historial" and export_format == FORMAT_PDF:
+            messagebox.showerror("Error", "El historial no se puede exportar a PDF.", parent=window)
+            return
+        if source != "Historial" and not len(ledger):
+            messagebox.showerror("Error", "No hay productos para exportar.", parent=window)
+            return
+        file_path = filedialog.asksaveasfilename(
+            parent=window,
+            defaultextension=extension,
+            filetypes=[(type_name, f"*{extension}")],
+            title="Exportar datos"
+        )
+        if not file_path:
+            return
+        if source == "Historial":
+            table = ledger.export_table(history=True)
+        else:
+            table = ledger.export_table(
+                order=orders[order_entry.get()],
+                product_filter=product_view.filter if source == "Lista filtrada" else None,
+                unit=weight_unit if export_format != FORMAT_PDF else UNIT_LB,
+            )
+        window.destroy()
+        run_export(file_path, table, export_format, format_entry.get())
+
+    source_entry.bind("<<ComboboxSelected>>", update_note)
+    format_entry.bind("<<ComboboxSelected>>", update_note)
+    ttk.Button(window, text="Exportar...", command=start_export).pack(pady=10)
+    update_note()
 
 # Limpiar lista
 def clear_list():
     if messagebox.askyesno("Confirmar", "¿Estás seguro de que deseas limpiar la lista?"):
-        save_undo_state()
-        for product in products.keys():
-            add_to_history("Eliminado", f"{product} - {products[product]:.2f} lb")
-        products.clear()
-        product_names.clear()
-        update_product_list()
-        update_total_weight()
+        with span("limpiar lista"):
+            ledger.clear()
+            update_product_list()
+            update_total_weight()
         messagebox.showinfo("Éxito", "La lista ha sido despejada.")
 
 # Eliminar producto
+DELETE_NAMES_SHOWN = 10
+
+# Nombrar lo que se va a eliminar y avisar de lo que no se ve en la tabla
+def delete_confirmation(names):
+    if len(names) == 1:
+        message = f"¿Está seguro que quiere eliminar '{names[0]}'?"
+    else:
+        listed = "\n".join(f"  {name}" for name in names[:DELETE_NAMES_SHOWN])
+        more = f"\n  ... y {len(names) - DELETE_NAMES_SHOWN} más" if len(names) > DELETE_NAMES_SHOWN else ""
+        message = f"¿Está seguro que quiere eliminar estos {len(names)} productos?\n{listed}{more}"
+    visible = set(product_list.get_children())
+    hidden = sum(1 for name in names if name not in visible)
+    if hidden:
+        message += f"\n\n{hidden} de ellos no están visibles en la tabla (seleccionados antes de desplazarla)."
+    return message
+
 def delete_selected():
-    selected_items = product_list.selection()
-    if not selected_items:
+    products_to_delete = selected_items()
+    if not products_to_delete:
         messagebox.showerror("Error", "Selecciona al menos un producto para eliminar.")
         return
-    if messagebox.askyesno("Confirmar", "¿Está seguro que quiere eliminar el producto seleccionado?"):
-        save_undo_state()
-        for item in selected_items:
-            product_name = product_list.item(item)["values"][0]
-            if product_name in products:
-                add_to_history("Eliminado", f"{product_name} - {products[product_name]:.2f} lb")
-                del products[product_name]
-                product_names.discard(product_name)
-        update_product_list()
-        update_total_weight()
+    if messagebox.askyesno("Confirmar", delete_confirmation(products_to_delete)):
+        with span("eliminar productos"):
+            show_changes(ledger.delete(products_to_delete))
 
 # Editar producto
 def edit_product():
-    selected_item = product_list.selection()
+    selected_item = selected_items()
     if len(selected_item) != 1:
         messagebox.showerror("Error", "Selecciona un único producto para editar.")
         return
-    product_name = product_list.item(selected_item[0])["values"][0]
-    current_weight = products[product_name]
+    product_name = selected_item[0]
+    current_weight = ledger.weight(product_name)
 
     edit_window = tk.Toplevel(root)
     edit_window.title("Editar Producto")
@@ -167,105 +532,459 @@ def edit_product():
     edit_window.transient(root)
 
     tk.Label(edit_window, text=f"Producto actual: {product_name}", font=("Arial", 12, "bold")).pack(pady=5)
-    tk.Label(edit_window, text=f"Peso actual: {current_weight:.2f} lb", font=("Arial", 12)).pack(pady=5)
+    tk.Label(edit_window, text=f"Peso actual: {format_weight(current_weight, weight_unit)}", font=("Arial", 12)).pack(pady=5)
 
     tk.Label(edit_window, text="Nuevo Nombre:").pack(pady=5)
     new_name_entry = ttk.Entry(edit_window, font=("Arial", 11))
     new_name_entry.pack(pady=5, ipadx=5, ipady=5)
     new_name_entry.insert(0, product_name)
 
-    tk.Label(edit_window, text="Restar peso (lb):").pack(pady=5)
+    tk.Label(edit_window, text=f"Restar peso ({weight_unit}):").pack(pady=5)
     subtract_weight_entry = ttk.Entry(edit_window, font=("Arial", 11))
     subtract_weight_entry.pack(pady=5, ipadx=5, ipady=5)
 
-    tk.Label(edit_window, text="Peso Nuevo (lb):").pack(pady=5)
+    tk.Label(edit_window, text=f"Peso Nuevo ({weight_unit}):").pack(pady=5)
     new_weight_entry = ttk.Entry(edit_window, font=("Arial", 11))
     new_weight_entry.pack(pady=5, ipadx=5, ipady=5)
 
     def save_edit():
-        new_name = new_name_entry.get().strip() or product_name
         try:
-            final_weight = current_weight
-            if subtract_weight_entry.get().strip():
-                subtract_value = float(subtract_weight_entry.get())
-                if subtract_value < 0:
-                    messagebox.showerror("Error", "No se puede restar un valor negativo.")
-                    return
-                final_weight -= subtract_value
-                add_to_history("Peso Restado", f"{product_name} - {subtract_value:.2f} lb (Nuevo peso: {final_weight:.2f} lb)")
-
-            if new_weight_entry.get().strip():
-                new_weight = float(new_weight_entry.get())
-                if new_weight <= 0:
-                    messagebox.showerror("Error", "El peso nuevo debe ser mayor a 0.")
-                    return
-                final_weight = new_weight
-                add_to_history("Peso Reemplazado", f"{product_name} → {new_name} - {final_weight:.2f} lb")
-
-            if final_weight <= 0:
-                messagebox.showerror("Error", "El peso final debe ser mayor a 0.")
-                return
-
-            save_undo_state()
-            # Si el nuevo nombre ya existe, sumar los pesos
-            if new_name in products and new_name != product_name:
-                combined_weight = products[new_name] + final_weight
-                del products[product_name]
-                products[new_name] = combined_weight
-                add_to_history("Combinado", f"{product_name} → {new_name} (Peso combinado: {combined_weight:.2f} lb)")
-            else:
-                del products[product_name]
-                product_names.discard(product_name)
-                products[new_name] = final_weight
-                product_names.add(new_name)
-                add_to_history("Editado", f"{product_name} → {new_name} - {final_weight:.2f} lb")
-
-            update_product_list()
-            update_total_weight()
-            edit_window.destroy()
+            subtract_value = read_weight(subtract_weight_entry.get()) if subtract_weight_entry.get().strip() else None
+            new_weight = read_weight(new_weight_entry.get()) if new_weight_entry.get().strip() else None
         except ValueError:
             messagebox.showerror("Error", "Por favor ingrese valores numéricos válidos.")
+            return
+        try:
+            with span("editar producto"):
+                show_changes(ledger.edit(product_name, new_name_entry.get(), subtract_value, new_weight))
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        edit_window.destroy()
 
     ttk.Button(edit_window, text="Guardar Cambios", command=save_edit).pack(pady=30, ipadx=15, ipady=8)
 
-# Historial
-history_log = []
-def add_to_history(action, details):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    history_log.append({"fecha": timestamp.split()[0], "hora": timestamp.split()[1], "accion": action, "detalles": details})
+# Historial persistente (registro en disco con índice por fecha, acción y producto)
+HISTORY_PAGE_SIZE = 200
 
 def show_history():
-    if not history_log:
+    history_log = ledger.history_log
+    if not len(history_log):
         messagebox.showinfo("Historial", "No hay acciones registradas.")
         return
 
     history_window = tk.Toplevel(root)
     history_window.title("Historial de Acciones")
-    history_window.geometry("500x400")
+    history_window.geometry("650x500")
     history_window.transient(root)
 
+    filter_frame = tk.Frame(history_window)
+    filter_frame.pack(fill="x", padx=10, pady=5)
+    tk.Label(filter_frame, text="Desde (AAAA-MM-DD):").grid(row=0, column=0, sticky="w")
+    date_from_entry = ttk.Entry(filter_frame, width=12)
+    date_from_entry.grid(row=0, column=1, padx=5)
+    tk.Label(filter_frame, text="Hasta:").grid(row=0, column=2, sticky="w")
+    date_to_entry = ttk.Entry(filter_frame, width=12)
+    date_to_entry.grid(row=0, column=3, padx=5)
+    tk.Label(filter_frame, text="Acción:").grid(row=1, column=0, sticky="w")
+    action_entry = ttk.Combobox(filter_frame, width=18, values=[""] + history_log.actions, state="readonly")
+    action_entry.grid(row=1, column=1, padx=5, pady=5)
+    tk.Label(filter_frame, text="Producto:").grid(row=1, column=2, sticky="w")
+    product_entry = ttk.Entry(filter_frame, width=18)
+    product_entry.grid(row=1, column=3, padx=5, pady=5)
+
     frame = tk.Frame(history_window)
     frame.pack(expand=True, fill="both")
 
     scrollbar = tk.Scrollbar(frame)
     scrollbar.pack(side="right", fill="y")
 
-    text_widget = tk.Text(frame, wrap="word", font=("Arial", 11), yscrollcommand=scrollbar.set)
+    text_widget = tk.Text(frame, wrap="word", font=("Arial", 11))
     text_widget.pack(expand=True, fill="both", padx=10, pady=10)
-
     scrollbar.config(command=text_widget.yview)
-    text_widget.insert("end", "=== HISTORIAL DE ACCIONES ===\n\n")
 
-    last_date = ""
-    for entry in history_log:
-        if entry["fecha"] != last_date:
-            last_date = entry["fecha"]
-            text_widget.insert("end", f"\n📅 {last_date}:\n")
-        text_widget.insert("end", f"  🕑 {entry['hora']} - {entry['accion']}: {entry['detalles']}\n")
+    # Las entradas se leen del disco por páginas (de la más reciente a la más antigua)
+    # a medida que el usuario se acerca al final del texto
+    view = {"numbers": iter(()), "last_date": "", "done": True, "pending": False}
+
+    def load_page():
+        view["pending"] = False
+        entries = history_log.page(view["numbers"], HISTORY_PAGE_SIZE)
+        if len(entries) < HISTORY_PAGE_SIZE:
+            view["done"] = True
+        lines = []
+        for entry in entries:
+            if entry["fecha"] != view["last_date"]:
+                view["last_date"] = entry["fecha"]
+                lines.append(f"\n📅 {view['last_date']}:\n")
+            lines.append(f"  🕑 {entry['hora']} - {entry['accion']}: {entry['detalles']}\n")
+        text_widget.config(state="normal")
+        text_widget.insert("end", "".join(lines))
+        text_widget.config(state="disabled")
+
+    def on_scroll(first, last):
+        scrollbar.set(first, last)
+        if float(last) > 0.9 and not view["done"] and not view["pending"]:
+            view["pending"] = True
+            history_window.after_idle(load_page)
+
+    def apply_filter():
+        view["numbers"] = history_log.query(
+            date_from_entry.get().strip() or None,
+            date_to_entry.get().strip() or None,
+            action_entry.get() or None,
+            product_entry.get().strip() or None,
+        )
+        view["last_date"] = ""
+        view["done"] = False
+        text_widget.config(state="normal")
+        text_widget.delete("1.0", "end")
+        text_widget.insert("end", "=== HISTORIAL DE ACCIONES ===\n\n")
+        load_page()
+
+    ttk.Button(filter_frame, text="Filtrar", command=apply_filter).grid(row=0, column=4, rowspan=2, padx=10)
+    text_widget.config(yscrollcommand=on_scroll)
+    apply_filter()
+
+# Conciliar dos inventarios (sesión actual, otra sesión JSON, PDF o sesión guardada):
+# se leen y comparan en el grupo de trabajos, las diferencias se muestran por páginas
+# a medida que se desplaza la tabla y aplicarlas es un solo paso de deshacer
+RECONCILE_PAGE_SIZE = 500
+
+def show_reconciliation():
+    from reconcile import prepare_source, source_label, compare, CURRENT, ADDED, REMOVED, CHANGED
+    kind_labels = {ADDED: "Añadido", REMOVED: "Eliminado", CHANGED: "Cambiado"}
+    kind_filters = {"Todas": None, "Añadidos": (ADDED,), "Eliminados": (REMOVED,), "Cambiados": (CHANGED,)}
+
+    window = tk.Toplevel(root)
+    window.title("Conciliar Inventarios")
+    window.geometry("780x560")
+    window.transient(root)
+
+    def browse(entry):
+        path = filedialog.askopenfilename(
+            parent=window,
+            title="Seleccionar inventario",
+            filetypes=[("Sesión o PDF", "*.json *.pdf"), ("PDF files", "*.pdf"), ("Sesión JSON", "*.json")]
+        )
+        if path:
+            entry.delete(0, tk.END)
+            entry.insert(0, path)
+
+    source_frame = tk.Frame(window)
+    source_frame.pack(fill="x", padx=10, pady=5)
+    source_entries = []
+    for row, (text, default) in enumerate((("Inventario base:", CURRENT), ("Comparar con:", ""))):
+        tk.Label(source_frame, text=text).grid(row=row, column=0, sticky="w")
+        entry = ttk.Entry(source_frame, width=60)
+        entry.insert(0, default)
+        entry.grid(row=row, column=1, padx=5, pady=2)
+        ttk.Button(source_frame, text="Examinar...", command=lambda e=entry: browse(e)).grid(row=row, column=2)
+        source_entries.append(entry)
+    left_entry, right_entry = source_entries
+    tk.Label(source_frame, text=f"'{CURRENT}' = sesión abierta, sesion:NOMBRE = sesión guardada (SQLite)",
+             fg="#666666").grid(row=2, column=0, columnspan=3, sticky="w")
+
+    options_frame = tk.Frame(window)
+    options_frame.pack(fill="x", padx=10, pady=5)
+    tk.Label(options_frame, text=f"Tolerancia ({weight_unit}):").grid(row=0, column=0, sticky="w")
+    tolerance_entry = ttk.Entry(options_frame, width=8)
+    tolerance_entry.grid(row=0, column=1, padx=5)
+    tk.Label(options_frame, text="Tolerancia (%):").grid(row=0, column=2, sticky="w")
+    percent_entry = ttk.Entry(options_frame, width=6)
+    percent_entry.grid(row=0, column=3, padx=5)
+    tk.Label(options_frame, text="Mostrar:").grid(row=0, column=4, sticky="w")
+    kind_entry = ttk.Combobox(options_frame, width=11, values=list(kind_filters), state="readonly")
+    kind_entry.set("Todas")
+    kind_entry.grid(row=0, column=5, padx=5)
+
+    table_frame = tk.Frame(window)
+    table_frame.pack(expand=True, fill="both", padx=10, pady=5)
+    columns = ("Producto", "Diferencia", "Base", "Comparado", "Cambio")
+    table = ttk.Treeview(table_frame, columns=columns, show="headings")
+    for column, width in zip(columns, (240, 90, 110, 110, 110)):
+        table.heading(column, text=column)
+        table.column(column, width=width)
+    table.tag_configure(ADDED, foreground="#1B7A1B")
+    table.tag_configure(REMOVED, foreground="#B22222")
+    table.tag_configure(CHANGED, foreground="#A0700B")
+    table.pack(side="left", expand=True, fill="both")
+    scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=table.yview)
+    scrollbar.pack(side="right", fill="y")
+
+    bottom_frame = tk.Frame(window)
+    bottom_frame.pack(fill="x", padx=10, pady=5)
+    summary_label = tk.Label(bottom_frame, text="", anchor="w")
+    summary_label.pack(side="left", fill="x", expand=True)
+
+    view = {"result": None, "sources": None, "rows": [], "shown": 0, "pending": False}
+
+    def row_values(difference):
+        return (
+            difference.name,
+            kind_labels[difference.kind],
+            format_weight(difference.left_weight, weight_unit) if difference.kind != ADDED else "",
+            format_weight(difference.right_weight, weight_unit) if difference.kind != REMOVED else "",
+            f"{to_unit(difference.delta_weight, weight_unit):+.3f} {weight_unit}",
+        )
+
+    def load_page():
+        view["pending"] = False
+        start = view["shown"]
+        for difference in view["rows"][start:start + RECONCILE_PAGE_SIZE]:
+            table.insert("", "end", values=row_values(difference), tags=(difference.kind,))
+        view["shown"] = min(len(view["rows"]), start + RECONCILE_PAGE_SIZE)
+
+    def on_scroll(first, last):
+        scrollbar.set(first, last)
+        if float(last) > 0.9 and view["shown"] < len(view["rows"]) and not view["pending"]:
+            view["pending"] = True
+            window.after_idle(load_page)
+
+    def show_rows(event=None):
+        result = view["result"]
+        table.delete(*table.get_children())
+        view["rows"] = result.only(kind_filters[kind_entry.get()]) if result is not None else []
+        view["shown"] = 0
+        load_page()
+        apply_button.config(state="normal" if view["rows"] else "disabled")
+
+    def run_compare():
+        try:
+            tolerance = read_weight(tolerance_entry.get()) if tolerance_entry.get().strip() else 0
+            relative = float(percent_entry.get().replace(",", ".")) / 100 if percent_entry.get().strip() else 0
+        except ValueError:
+            messagebox.showerror("Error", "La tolerancia debe ser un número válido.", parent=window)
+            return
+        left, right = left_entry.get(), right_entry.get()
 
-    text_widget.config(state="disabled")
+        def prepare():
+            read_left = prepare_source(left, ledger)
+            read_right = prepare_source(right, ledger)
 
-# Importar PDF para editar (REEMPLAZAR lista actual)
+            def work(job):
+                with span("conciliar"):
+                    return compare(read_left(), read_right(), tolerance, relative)
+            return work
+
+        def done(result):
+            if not window.winfo_exists():
+                return
+            compare_button.config(state="normal")
+            view["result"] = result
+            view["sources"] = (source_label(left), source_label(right))
+            summary_label.config(text=f"{result.summary()}. Cambio total: {to_unit(result.total_delta, weight_unit):+.3f} {weight_unit}")
+            show_rows()
+
+        def failed(e):
+            if not window.winfo_exists():
+                return
+            compare_button.config(state="normal")
+            summary_label.config(text="")
+            messagebox.showerror("Error", f"No se pudo comparar: {str(e)}", parent=window)
+
+        compare_button.config(state="disabled")
+        summary_label.config(text="Comparando...")
+        jobs.submit("conciliar", prepare, key="conciliar", on_done=done, on_error=failed)
+
+    def apply_differences():
+        differences = view["rows"]
+        source = " → ".join(view["sources"])
+        if not messagebox.askyesno(
+            "Conciliar",
+            f"¿Aplicar {len(differences)} diferencias ({source}) a la sesión actual?\n"
+            "Se puede deshacer en un solo paso.",
+            parent=window,
+        ):
+            return
+        with span("aplicar conciliación"):
+            show_changes(ledger.apply_differences(differences, source))
+        view["result"] = None
+        summary_label.config(text="Diferencias aplicadas. Compara de nuevo para ver el estado actual.")
+        show_rows()
+
+    compare_button = ttk.Button(options_frame, text="Comparar", command=run_compare)
+    compare_button.grid(row=0, column=6, padx=10)
+    apply_button = ttk.Button(bottom_frame, text="Aplicar a la sesión", command=apply_differences, state="disabled")
+    apply_button.pack(side="right")
+    table.config(yscrollcommand=on_scroll)
+    kind_entry.bind("<<ComboboxSelected>>", show_rows)
+    right_entry.focus()
+
+# Estadísticas del historial: los resúmenes por hora y día se leen y ponen al día en el
+# grupo de trabajos la primera vez (luego se mantienen con cada acción) y todas las
+# consultas salen de ellos. El gráfico (lienzo de Tk, sin matplotlib) muestra el peso
+# que entró y salió y las acciones de cada hora o día; al hacer clic en una barra la
+# tabla muestra los productos que más se movieron en esa hora o día
+CHART_HEIGHT = 260
+CHART_MARGIN = 50
+CHART_ACTIONS_HEIGHT = 50
+CHART_IN_COLOR = "#1B7A1B"
+CHART_OUT_COLOR = "#B22222"
+CHART_ACTIONS_COLOR = "#6286f0"
+ANALYTICS_PERIODS = {"Hoy": 0, "7 días": 7, "30 días": 30, "365 días": 365}
+
+def chart_bucket_width(canvas, rows):
+    return max(1.0, (canvas.winfo_width() - 2 * CHART_MARGIN) / max(1, len(rows)))
+
+# rows: [(etiqueta, entrada, salida, acciones, minutos)] como los de HistoryRollups
+def draw_activity_chart(canvas, rows, selected=None):
+    canvas.delete("all")
+    width = canvas.winfo_width()
+    height = canvas.winfo_height()
+    if not rows or width < 2 * CHART_MARGIN:
+        return
+    bucket = chart_bucket_width(canvas, rows)
+    weights_bottom = height - CHART_ACTIONS_HEIGHT - 30
+    actions_bottom = height - 20
+    top = 15
+    most_weight = max(max(row[1], row[2]) for row in rows) or 1
+    most_actions = max(row[3] for row in rows) or 1
+    canvas.create_line(CHART_MARGIN, weights_bottom, width - CHART_MARGIN, weights_bottom, fill="#999999")
+    canvas.create_line(CHART_MARGIN, actions_bottom, width - CHART_MARGIN, actions_bottom, fill="#999999")
+    canvas.create_text(CHART_MARGIN - 4, top, text=f"{to_unit(most_weight, weight_unit):.0f}", anchor="ne", font=("Arial", 8))
+    canvas.create_text(CHART_MARGIN - 4, weights_bottom, text=weight_unit, anchor="se", font=("Arial", 8))
+    canvas.create_text(CHART_MARGIN - 4, weights_bottom + 10, text=f"{most_actions}", anchor="ne", font=("Arial", 8))
+    canvas.create_text(CHART_MARGIN - 4, actions_bottom, text="acc.", anchor="se", font=("Arial", 8))
+    label_every = max(1, int(40 // bucket) + 1)
+    for number, (label, weight_in, weight_out, actions, minutes) in enumerate(rows):
+        left = CHART_MARGIN + number * bucket
+        if number == selected:
+            canvas.create_rectangle(left, top, left + bucket, actions_bottom, fill="#E8E8F8", outline="")
+        half = max(1.0, bucket / 2 - (1 if bucket > 4 else 0))
+        for offset, weight, color in ((0, weight_in, CHART_IN_COLOR), (half, weight_out, CHART_OUT_COLOR)):
+            if weight:
+                bar_top = weights_bottom - (weights_bottom - top) * weight / most_weight
+                canvas.create_rectangle(left + offset, bar_top, left + offset + half, weights_bottom, fill=color, outline="")
+        if actions:
+            bar_top = actions_bottom - (CHART_ACTIONS_HEIGHT - 10) * actions / most_actions
+            canvas.create_rectangle(left, bar_top, left + max(1.0, bucket - 1), actions_bottom, fill=CHART_ACTIONS_COLOR, outline="")
+        if number % label_every == 0:
+            canvas.create_text(left, actions_bottom + 2, text=label[5:] if len(label) == 10 else label, anchor="nw", font=("Arial", 8))
+    canvas.create_text(width - CHART_MARGIN, 2, text="■ entrada", fill=CHART_IN_COLOR, anchor="ne", font=("Arial", 8))
+    canvas.create_text(width - CHART_MARGIN - 70, 2, text="■ salida", fill=CHART_OUT_COLOR, anchor="ne", font=("Arial", 8))
+    canvas.create_text(width - CHART_MARGIN - 130, 2, text="■ acciones", fill=CHART_ACTIONS_COLOR, anchor="ne", font=("Arial", 8))
+
+def show_analytics():
+    from datetime import date
+    from analytics import ORDER_MOVED, ORDER_IN, ORDER_OUT, ORDER_NET, throughput
+    orders = {"Más movidos": ORDER_MOVED, "Más entrada": ORDER_IN, "Más salida": ORDER_OUT, "Mayor neto": ORDER_NET}
+
+    window = tk.Toplevel(root)
+    window.title("Estadísticas")
+    window.geometry("860x640")
+    window.transient(root)
+
+    options_frame = tk.Frame(window)
+    options_frame.pack(fill="x", padx=10, pady=5)
+    tk.Label(options_frame, text="Periodo:").pack(side="left")
+    period_entry = ttk.Combobox(options_frame, width=9, values=list(ANALYTICS_PERIODS), state="readonly")
+    period_entry.set("7 días")
+    period_entry.pack(side="left", padx=5)
+    tk.Label(options_frame, text="Ordenar por:").pack(side="left")
+    order_entry = ttk.Combobox(options_frame, width=12, values=list(orders), state="readonly")
+    order_entry.set("Más movidos")
+    order_entry.pack(side="left", padx=5)
+    summary_label = tk.Label(window, text="Leyendo el historial...", anchor="w")
+    summary_label.pack(fill="x", padx=10)
+
+    canvas = tk.Canvas(window, height=CHART_HEIGHT, bg="#FFFFFF", highlightthickness=0)
+    canvas.pack(fill="x", padx=10, pady=5)
+
+    movers_label = tk.Label(window, text="", anchor="w", font=("Arial", 10, "bold"))
+    movers_label.pack(fill="x", padx=10)
+    columns = ("Producto", "Entrada", "Salida", "Neto")
+    table = ttk.Treeview(window, columns=columns, show="headings", height=10)
+    for column, width in zip(columns, (300, 150, 150, 150)):
+        table.heading(column, text=column)
+        table.column(column, width=width)
+    table.pack(expand=True, fill="both", padx=10, pady=5)
+
+    view = {"rows": [], "selected": None, "day": None}
+
+    def show_movers():
+        rollups = ledger.rollups
+        order = orders[order_entry.get()]
+        days = ANALYTICS_PERIODS[period_entry.get()]
+        selected = view["selected"]
+        if selected is None:
+            movers = rollups.top_movers(max(days, 1), order)
+            movers_label.config(text=f"Productos con más movimiento ({period_entry.get().lower()})")
+        elif days:
+            day = view["rows"][selected][0]
+            movers = rollups.top_movers(1, order, until=date.fromisoformat(day))
+            movers_label.config(text=f"Productos con más movimiento el {day}")
+        else:
+            hour = view["rows"][selected][0]
+            movers = rollups.hour_movers(view["day"], hour, order)
+            movers_label.config(text=f"Productos con más movimiento de {hour}:00 a {hour}:59")
+        table.delete(*table.get_children())
+        for name, weight_in, weight_out, net in movers:
+            table.insert("", "end", values=(
+                name, format_weight(weight_in, weight_unit), format_weight(weight_out, weight_unit),
+                f"{to_unit(net, weight_unit):+.2f} {weight_unit}",
+            ))
+
+    def show_period(event=None):
+        rollups = ledger.rollups
+        if rollups is None:
+            return
+        days = ANALYTICS_PERIODS[period_entry.get()]
+        with span("estadísticas"):
+            view["day"] = date.today().isoformat()
+            view["rows"] = rollups.daily(days) if days else rollups.hourly(view["day"])
+            view["selected"] = None
+            rows = view["rows"]
+            weight_in = sum(row[1] for row in rows)
+            weight_out = sum(row[2] for row in rows)
+            actions = sum(row[3] for row in rows)
+            summary_label.config(text=(
+                f"Entrada: {format_weight(weight_in, weight_unit)}   Salida: {format_weight(weight_out, weight_unit)}   "
+                f"Acciones: {actions}   Acciones por minuto activo: {throughput(rows):.2f}"
+            ))
+            draw_activity_chart(canvas, rows)
+            show_movers()
+
+    def select_bucket(event):
+        rows = view["rows"]
+        if not rows or event.x < CHART_MARGIN:
+            return
+        number = int((event.x - CHART_MARGIN) // chart_bucket_width(canvas, rows))
+        if number >= len(rows):
+            return
+        view["selected"] = None if number == view["selected"] else number
+        draw_activity_chart(canvas, rows, view["selected"])
+        show_movers()
+
+    def progress(done, total):
+        if window.winfo_exists():
+            summary_label.config(text=f"Leyendo el historial... {done}/{total} entradas")
+
+    # rollups es None si ya estaban en uso (otra ventana los leyó mientras tanto)
+    def done(rollups):
+        if rollups is not None:
+            ledger.install_rollups(rollups)
+        if window.winfo_exists():
+            show_period()
+
+    def failed(e):
+        if window.winfo_exists():
+            summary_label.config(text="")
+            messagebox.showerror("Error", f"No se pudieron leer las estadísticas: {str(e)}", parent=window)
+
+    def prepare():
+        if ledger.rollups is not None:
+            return None
+        return lambda job: ledger.read_rollups(job.progress, job.cancelled)
+
+    period_entry.bind("<<ComboboxSelected>>", show_period)
+    order_entry.bind("<<ComboboxSelected>>", lambda event: ledger.rollups is not None and show_movers())
+    canvas.bind("<Button-1>", select_bucket)
+    canvas.bind("<Configure>", lambda event: draw_activity_chart(canvas, view["rows"], view["selected"]))
+    jobs.submit("estadísticas", prepare, key="estadisticas", on_done=done, on_error=failed, on_progress=progress)
+
+# Importar PDF para editar (REEMPLAZAR lista actual): el PDF se lee en el grupo de
+# trabajos y la lista se reemplaza en el hilo de la interfaz
 def import_pdf_to_edit():
     file_path = filedialog.askopenfilename(
         title="Seleccionar PDF para editar",
@@ -274,113 +993,606 @@ def import_pdf_to_edit():
     if not file_path:
         return
 
-    try:
-        from PyPDF2 import PdfReader
-        reader = PdfReader(file_path)
-        imported_products = {}
-        for page in reader.pages:
-            text = page.extract_text()
-            if not text:
-                continue
-            for line in text.split("\n"):
-                if ":" in line and "lb" in line:
-                    try:
-                        name, weight_text = line.split(":")
-                        weight = float(weight_text.strip().replace("lb", "").strip())
-                        imported_products[name.strip()] = weight
-                    except:
-                        continue
+    @timed("leer pdf")
+    def work(job):
+        from pdf_import import read_pdf_products
+        return read_pdf_products(file_path)
 
+    def done(imported_products):
+        update_total_weight()
         if not imported_products:
             messagebox.showerror("Error", "No se encontraron productos válidos en el PDF.")
             return
+        with span("importar pdf"):
+            ledger.replace(imported_products, os.path.basename(file_path))
+            update_product_list()
+            update_total_weight()
+        messagebox.showinfo("Éxito", "Lista reemplazada exitosamente desde el PDF.")
+
+    def failed(e):
+        update_total_weight()
+        messagebox.showerror("Error", f"No se pudo importar el PDF: {str(e)}")
+
+    total_weight_label.config(text="Leyendo PDF...")
+    jobs.submit("importar pdf", lambda: work, key="importar", on_done=done, on_error=failed)
+
+# Importar varios PDF a la vez en procesos aparte: reemplazar la lista o sumar a ella
+BATCH_CONFLICTS_SHOWN = 15
+
+def import_pdf_batch():
+    file_paths = filedialog.askopenfilenames(
+        title="Seleccionar PDF para importar",
+        filetypes=[("PDF files", "*.pdf")]
+    )
+    if not file_paths:
+        return
+    merge = messagebox.askyesnocancel(
+        "Importar PDF",
+        "¿Sumar los pesos a la lista actual?\n\nSí: combinar con la lista actual\nNo: reemplazar la lista actual"
+    )
+    if merge is None:
+        return
 
-        save_undo_state()
-        products.clear()
-        product_names.clear()
-        for name, weight in imported_products.items():
-            products[name] = weight
-            product_names.add(name)
+    from batch_import import BatchImport
+    batch = BatchImport(file_paths)
+    file_count = len(batch.file_paths)
 
+    progress_window = tk.Toplevel(root)
+    progress_window.title("Importando PDF")
+    progress_window.geometry("400x140")
+    progress_window.transient(root)
+    status_label = tk.Label(progress_window, text=f"Leyendo 0 de {file_count} archivos...")
+    status_label.pack(pady=10)
+    progress_bar = ttk.Progressbar(progress_window, maximum=file_count, length=340)
+    progress_bar.pack(pady=5)
+    ttk.Button(progress_window, text="Cancelar", command=batch.cancel).pack(pady=10)
+    progress_window.protocol("WM_DELETE_WINDOW", batch.cancel)
+
+    def poll():
+        while True:
+            try:
+                kind, value = batch.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                progress_bar["value"] = value
+                status_label.config(text=f"Leyendo {value} de {file_count} archivos ({len(batch.products)} productos)...")
+                continue
+            progress_window.destroy()
+            if kind == "done":
+                apply_batch(batch, merge)
+            elif kind == "error":
+                messagebox.showerror("Error", f"No se pudo importar los PDF: {str(value)}")
+            return
+        progress_window.after(100, poll)
+
+    batch.start()
+    poll()
+
+@timed("aplicar lote de pdf")
+def apply_batch(batch, merge):
+    conflicts = batch.conflicts()
+    if batch.products:
+        source = f"{batch.files_done - len(batch.errors)} PDF"
+        if merge:
+            _, existing = ledger.merge(batch.products, source)
+            conflicts = sorted(set(conflicts) | set(existing))
+        else:
+            ledger.replace(batch.products, source)
         update_product_list()
         update_total_weight()
-        add_to_history("Importado", f"Lista reemplazada desde {os.path.basename(file_path)}")
-        messagebox.showinfo("Éxito", "Lista reemplazada exitosamente desde el PDF.")
-    except Exception as e:
-        messagebox.showerror("Error", f"No se pudo importar el PDF: {str(e)}")
 
-# Ventana principal
-root = tk.Tk()
-root.title("FDA")
-root.geometry("800x600")
-root.minsize(600, 400)
-
-products = {}
-product_names = set()
-
-# Estilos
-style = ttk.Style()
-style.theme_use("clam")
-style.configure("TLabel", background="#E0E0E0", foreground="#333333", font=("Arial", 11))
-style.configure("TButton", background="#6286f0", foreground="white", font=("Arial", 10), padding=6)
-style.map("TButton", background=[("active", "#5679d6")])
-style.configure("Treeview", background="#FFFFFF", foreground="#333333", font=("Arial", 13), rowheight=25)
-style.configure("Treeview.Heading", font=("Arial", 13, "bold"), background="#DDDDDD")
-root.configure(bg="#E0E0E0")
-
-menu_frame = tk.Frame(root, bg="#333333", width=200)
-menu_frame.grid(row=0, column=0, rowspan=3, sticky="nsw")
-
-buttons = [
-    ("Exportar a PDF", export_to_pdf),
-    ("Importar PDF para Editar", import_pdf_to_edit),
-    ("Limpiar Lista", clear_list),
-    ("Eliminar Producto", delete_selected),
-    ("Editar Producto", edit_product),
-    ("Guardar Sesión", save_session),
-    ("Ver Historial", show_history),
-    ("Salir", root.quit),
-]
-for text, command in buttons:
-    btn = tk.Button(menu_frame, text=text, command=command, bg="#333333", fg="white", font=("Arial", 10), relief="flat")
-    btn.pack(fill="x", pady=5)
-    tk.Frame(menu_frame, height=2, bg="white").pack(fill="x")
-    btn.bind("<Enter>", lambda e, b=btn: b.config(bg="#5679d6"))
-    btn.bind("<Leave>", lambda e, b=btn: b.config(bg="#333333"))
-
-frame_top = tk.Frame(root, bg="#E0E0E0")
-frame_top.grid(row=0, column=1, padx=10, pady=10, sticky="ew")
-tk.Label(frame_top, text="Nombre del Producto:", bg="#E0E0E0").grid(row=0, column=0, sticky="w")
-product_name_entry = ttk.Combobox(frame_top, width=25)
-product_name_entry.grid(row=0, column=1, padx=5, pady=5)
-tk.Label(frame_top, text="Peso (lb):", bg="#E0E0E0").grid(row=1, column=0, sticky="w")
-product_weight_entry = ttk.Entry(frame_top, width=25)
-product_weight_entry.grid(row=1, column=1, padx=5, pady=5)
-add_button = ttk.Button(frame_top, text="Añadir Producto", command=add_product)
-add_button.grid(row=2, column=0, columnspan=2, pady=10)
-
-product_list = ttk.Treeview(root, columns=("Producto", "Peso Total"), show="headings", height=15)
-product_list.heading("Producto", text="Producto")
-product_list.heading("Peso Total", text="Peso Total")
-product_list.column("Producto", width=200)
-product_list.column("Peso Total", width=100)
-product_list.grid(row=1, column=1, padx=10, pady=10, sticky="nsew")
-
-total_weight_label = tk.Label(root, text="Peso Total: 0.00 lb", font=("Arial", 12, "bold"), bg="#E0E0E0")
-total_weight_label.grid(row=2, column=1, pady=10)
-
-root.grid_rowconfigure(1, weight=1)
-root.grid_columnconfigure(1, weight=1)
-
-product_name_entry.bind("<Return>", lambda e: product_weight_entry.focus())
-product_weight_entry.bind("<Return>", add_product)
-root.bind("<Control-z>", undo_action)
-
-def auto_save():
-    if root.winfo_exists():
-        save_session(False)
-        root.after(10000, auto_save)
-
-load_session()
-root.after(10000, auto_save)
-root.mainloop()
+    lines = [f"Archivos leídos: {batch.files_done - len(batch.errors)} de {len(batch.file_paths)}",
+             f"Productos importados: {len(batch.products)}"]
+    if conflicts:
+        lines.append(f"\nProductos repetidos (pesos sumados): {len(conflicts)}")
+        lines.extend(f"  • {name}" for name in conflicts[:BATCH_CONFLICTS_SHOWN])
+        if len(conflicts) > BATCH_CONFLICTS_SHOWN:
+            lines.append(f"  … y {len(conflicts) - BATCH_CONFLICTS_SHOWN} más")
+    if batch.errors:
+        lines.append(f"\nArchivos con errores: {len(batch.errors)}")
+        lines.extend(f"  • {name}: {error}" for name, error in batch.errors)
+    if batch.products:
+        messagebox.showinfo("Importación terminada", "\n".join(lines))
+    else:
+        messagebox.showerror("Error", "\n".join(lines))
+
+# Ingreso masivo de registros de báscula (CSV/TSV) en segundo plano; se aplica como
+# un solo paso de deshacer y un solo refresco de la tabla
+def ingest_scale_logs():
+    file_paths = filedialog.askopenfilenames(
+        title="Seleccionar registros de báscula",
+        filetypes=[("Registros CSV/TSV", "*.csv *.tsv *.txt"), ("Todos los archivos", "*.*")]
+    )
+    if not file_paths:
+        return
+    from scale_ingest import ingest_files, reject_path_for
+    reject_path = reject_path_for(file_paths[0])
+    messages = queue.Queue()
+    cancel_event = threading.Event()
+
+    progress_window = tk.Toplevel(root)
+    progress_window.title("Ingresando registros")
+    progress_window.geometry("400x140")
+    progress_window.transient(root)
+    status_label = tk.Label(progress_window, text="Leyendo registros...")
+    status_label.pack(pady=10)
+    progress_bar = ttk.Progressbar(progress_window, maximum=100, length=340)
+    progress_bar.pack(pady=5)
+    ttk.Button(progress_window, text="Cancelar", command=cancel_event.set).pack(pady=10)
+    progress_window.protocol("WM_DELETE_WINDOW", cancel_event.set)
+
+    def worker():
+        try:
+            result = ingest_files(
+                file_paths,
+                reject_path,
+                progress=lambda name, done, total: messages.put(("progress", (name, done, total))),
+                cancelled=cancel_event.is_set,
+            )
+            messages.put(("done", result) if result is not None else ("cancelled", None))
+        except Exception as e:
+            messages.put(("error", e))
+
+    def poll():
+        while True:
+            try:
+                kind, value = messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                name, done, total = value
+                progress_bar["value"] = 100 * done / total if total else 100
+                status_label.config(text=f"Leyendo {name}...")
+                continue
+            progress_window.destroy()
+            if kind == "done":
+                apply_ingest(value, reject_path)
+            elif kind == "error":
+                messagebox.showerror("Error", f"No se pudo leer el registro: {str(value)}")
+            return
+        progress_window.after(100, poll)
+
+    threading.Thread(target=worker, daemon=True).start()
+    poll()
+
+@timed("aplicar registro de báscula")
+def apply_ingest(result, reject_path):
+    if result.weights:
+        # Un total que ya no cabe en milésimas: no se aplica nada del registro
+        try:
+            show_changes(ledger.add_many(result.products(), ", ".join(result.files)))
+        except ValueError as e:
+            messagebox.showerror("Error", f"No se pudo aplicar el registro: {str(e)}")
+            return
+    lines = [f"Lecturas: {result.rows}", f"Aceptadas: {result.accepted}", f"Productos: {len(result.weights)}"]
+    if result.rejected:
+        lines.append(f"\nRechazadas: {result.rejected} (detalle en {reject_path})")
+        lines.extend(f"  • {name} línea {line}: {reason}" for name, line, reason in result.samples)
+    if result.weights:
+        messagebox.showinfo("Ingreso terminado", "\n".join(lines))
+    else:
+        messagebox.showerror("Error", "\n".join(lines))
+
+# Básculas conectadas: las lecturas llegan por un hilo con asyncio y se aplican juntas
+# cada DEVICE_FRAME_MS (un add_many y un refresco por intervalo). Las lecturas que
+# solo traen el peso se suman al producto escrito en "Nombre del Producto"
+DEVICE_SOURCE_DEFAULT = "simulada"
+
+def connect_scale():
+    if device_reader is not None:
+        if messagebox.askyesno("Báscula", "¿Desconectar la báscula?"):
+            stop_scale()
+        return
+    source = simpledialog.askstring(
+        "Conectar Báscula",
+        "Fuente (serial:/dev/ttyUSB0[:baudios], tcp:host:puerto, archivo o simulada):",
+        initialvalue=DEVICE_SOURCE_DEFAULT, parent=root,
+    )
+    if source:
+        start_scale([source.strip()])
+
+def start_scale(sources):
+    global device_reader
+    try:
+        from scale_device import DeviceReader, DEVICE_FRAME_MS
+        device_reader = DeviceReader(sources)
+        device_reader.start()
+    except ValueError as e:
+        device_reader = None
+        messagebox.showerror("Error", f"No se pudo conectar la báscula: {e}")
+        return
+    device_status_label.config(text=f"Báscula: {', '.join(sources)}")
+    root.after(DEVICE_FRAME_MS, poll_scale)
+
+def stop_scale():
+    global device_reader
+    device_reader.stop()
+    device_reader = None
+    device_status_label.config(text="")
+
+# Se vuelve a programar siempre: un intervalo con lecturas que no se pudieron sumar
+# se informa y la báscula sigue leyendo
+def poll_scale():
+    from scale_device import DEVICE_FRAME_MS
+    if device_reader is None or not root.winfo_exists():
+        return
+    try:
+        weights, count = device_reader.drain(product_name_entry.get().strip())
+        if weights:
+            with span("lecturas de báscula"):
+                show_changes(ledger.add_many(weights, "báscula"))
+            device_status_label.config(text=f"Báscula: {count} lecturas, {len(weights)} productos en el último intervalo")
+        errors = device_reader.take_errors()
+        if errors:
+            device_status_label.config(text=f"Báscula: {errors[-1]}")
+    except (ValueError, OverflowError) as e:
+        device_status_label.config(text=f"Báscula: lecturas descartadas ({e})")
+    finally:
+        root.after(DEVICE_FRAME_MS, poll_scale)
+
+# Almacenamiento elegido al arrancar: fda.py --almacen sqlite [--base archivo], o la
+# variable de entorno FDA_ALMACEN
+STORAGE_ENV = "FDA_ALMACEN"
+
+def startup_storage():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--almacen", choices=STORAGES, default=os.environ.get(STORAGE_ENV, STORAGE_JSON))
+    parser.add_argument("--base")
+    args, _ = parser.parse_known_args()
+    return args.almacen, args.base
+
+# Sincronización con otras estaciones: fda.py --sincronizar host:puerto [--estacion nombre],
+# o las variables de entorno FDA_SINCRONIZAR / FDA_ESTACION. Los cambios que llegan se
+# aplican en el hilo de la interfaz cada SYNC_POLL_MS
+SYNC_ENV = "FDA_SINCRONIZAR"
+STATION_ENV = "FDA_ESTACION"
+SYNC_POLL_MS = 100
+SYNC_STATE_FILE = "fda_sync_{}.json"
+
+def startup_sync():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--sincronizar", default=os.environ.get(SYNC_ENV))
+    parser.add_argument("--estacion", default=os.environ.get(STATION_ENV))
+    args, _ = parser.parse_known_args()
+    if not args.sincronizar:
+        return None
+    import socket
+    from sync import SYNC_HOST
+    host, _, port = args.sincronizar.rpartition(":")
+    return host or SYNC_HOST, int(port), args.estacion or socket.gethostname()
+
+# Básculas a conectar al arrancar: fda.py --bascula fuente (se puede repetir)
+def startup_devices():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--bascula", action="append", default=[])
+    args, _ = parser.parse_known_args()
+    return args.bascula
+
+# Sincronización y básculas pedidas al arrancar; se conectan cuando la sesión ya está
+# cargada, porque la sincronización parte de los pesos locales
+def start_connections():
+    sync_settings = startup_sync()
+    if sync_settings is not None:
+        start_sync(*sync_settings)
+    device_sources = startup_devices()
+    if device_sources:
+        start_scale(device_sources)
+
+def start_sync(host, port, station):
+    global sync_client
+    from sync import SyncClient
+    sync_client = SyncClient(ledger, station, host, port, SYNC_STATE_FILE.format(station))
+    sync_client.start()
+    sync_status_label.config(text=f"Sincronización: conectando a {host}:{port}...")
+    root.after(SYNC_POLL_MS, poll_sync)
+
+def poll_sync():
+    if sync_client is None or not root.winfo_exists():
+        return
+    if sync_client.inbound.empty():
+        root.after(SYNC_POLL_MS, poll_sync)
+        return
+    with span("sincronización"):
+        changed = sync_client.apply_remote()
+        if changed:
+            show_changes(changed)
+    if changed is not None:
+        state = "conectada" if sync_client.connected else "sin conexión (reintentando)"
+        sync_status_label.config(text=f"Sincronización ({sync_client.station}): {state}")
+    root.after(SYNC_POLL_MS, poll_sync)
+
+# Panel oculto de rendimiento (F12): p50/p95/máx. de cada acción en las últimas
+# muestras y el retraso del bucle de eventos, medido con una llamada programada cada
+# LAG_PROBE_MS que debería llegar a tiempo
+LAG_PROBE_MS = 100
+OVERLAY_REFRESH_MS = 500
+INSTRUMENT_ENV = "FDA_INSTRUMENTAR"
+lag_probe_running = False
+
+def probe_loop_lag(expected=None):
+    global lag_probe_running
+    if not instruments.enabled or not root.winfo_exists():
+        lag_probe_running = False
+        return
+    now = time.perf_counter()
+    if expected is not None:
+        instruments.record(LOOP_LAG, expected, max(0.0, now - expected))
+    lag_probe_running = True
+    root.after(LAG_PROBE_MS, probe_loop_lag, now + LAG_PROBE_MS / 1000)
+
+def start_instrumentation(trace_path=None):
+    if trace_path:
+        instruments.start_trace(trace_path)
+    instruments.enable()
+    if not lag_probe_running:
+        probe_loop_lag()
+
+def toggle_overlay(event=None):
+    if performance_overlay.winfo_ismapped():
+        performance_overlay.place_forget()
+        return
+    start_instrumentation()
+    performance_overlay.place(relx=1.0, y=0, anchor="ne")
+    performance_overlay.lift()
+    refresh_overlay()
+
+def refresh_overlay():
+    if not performance_overlay.winfo_ismapped():
+        return
+    lines = [f"{'operación':<28}{'n':>6}{'p50':>9}{'p95':>9}{'máx':>9}  (ms)"]
+    for name, count, p50, p95, worst in instruments.summary():
+        lines.append(f"{name[:27]:<28}{count:>6}{p50:>9.1f}{p95:>9.1f}{worst:>9.1f}")
+    if instruments.trace_file is not None:
+        lines.append(f"traza: {instruments.trace_file.name}")
+    performance_overlay.config(text="\n".join(lines))
+    root.after(OVERLAY_REFRESH_MS, refresh_overlay)
+
+# Medición desde el arranque: fda.py --instrumentar [--traza archivo.json], o la
+# variable de entorno FDA_INSTRUMENTAR (su valor, si no es "1", es el archivo de traza)
+def startup_instrumentation():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--instrumentar", action="store_true")
+    parser.add_argument("--traza")
+    args, _ = parser.parse_known_args()
+    value = os.environ.get(INSTRUMENT_ENV, "")
+    trace_path = args.traza or (value if value not in ("", "1") else None)
+    return args.instrumentar or bool(value) or bool(trace_path), trace_path
+
+# Precarga en segundo plano de los módulos de PDF (reportlab, PyPDF2) después de que la
+# ventana se muestra, para que la primera exportación o importación no espere
+PREWARM_DELAY_MS = 500
+PREWARM_MODULES = ("pdf_export", "pdf_import")
+
+def prewarm_modules():
+    def worker():
+        import importlib
+        for module in PREWARM_MODULES:
+            try:
+                with span(f"precarga {module}"):
+                    importlib.import_module(module)
+            except ImportError:
+                pass
+    threading.Thread(target=worker, daemon=True).start()
+
+# Medición del arranque: fda.py --medir-arranque [archivo.json] [--cerrar]. Anota el
+# tiempo de las importaciones, la creación de la ventana, cuando la ventana se muestra,
+# el primer dibujo completo y cuando termina de cargarse la sesión (en segundo plano);
+# el informe se escribe cuando pasaron las dos últimas. Si el lanzador define FDA_LANZADO
+# (segundos desde epoch, p. ej. FDA_LANZADO=$(date +%s.%N)) se incluye también lo que
+# pasa antes de que Python ejecute fda.py (con el exe de un solo archivo, descomprimirlo)
+LAUNCHED_ENV = "FDA_LANZADO"
+STARTUP_REPORT_FILE = "fda_arranque.json"
+startup_marks = [("importaciones", STARTUP_IMPORTED)]
+
+def mark_startup(name):
+    startup_marks.append((name, time.perf_counter()))
+
+def startup_measurement():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--medir-arranque", nargs="?", const=STARTUP_REPORT_FILE)
+    parser.add_argument("--cerrar", action="store_true")
+    args, _ = parser.parse_known_args()
+    return args.medir_arranque, args.cerrar
+
+startup_measurement_state = {"path": None, "close": False, "mapped": False, "painted": False, "loaded": False}
+
+def on_first_map(event):
+    if event.widget is not root or startup_measurement_state["mapped"]:
+        return
+    startup_measurement_state["mapped"] = True
+    mark_startup("ventana visible")
+    root.after_idle(mark_first_paint)
+
+def mark_first_paint():
+    root.update_idletasks()
+    mark_startup("primer dibujo")
+    startup_measurement_state["painted"] = True
+    finish_startup_measurement()
+
+def mark_session_loaded():
+    mark_startup("sesión cargada")
+    startup_measurement_state["loaded"] = True
+    finish_startup_measurement()
+
+def finish_startup_measurement():
+    state = startup_measurement_state
+    if not state["path"] or not state["painted"] or not state["loaded"]:
+        return
+    report = {"etapas_ms": {}, "acumulado_ms": {}}
+    previous = STARTUP_STARTED
+    for name, moment in startup_marks:
+        report["etapas_ms"][name] = round((moment - previous) * 1000, 1)
+        report["acumulado_ms"][name] = round((moment - STARTUP_STARTED) * 1000, 1)
+        previous = moment
+    launched = os.environ.get(LAUNCHED_ENV)
+    if launched:
+        started_wall = time.time() - (time.perf_counter() - STARTUP_STARTED)
+        report["antes_de_python_ms"] = round((started_wall - float(launched)) * 1000, 1)
+        report["desde_lanzamiento_ms"] = round((time.time() - float(launched)) * 1000, 1)
+    report["congelado"] = bool(getattr(sys, "frozen", False))
+    with open(state["path"], "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    state["path"] = None
+    if state["close"]:
+        close_app()
+
+if __name__ == "__main__":
+    # Los procesos de la importación por lotes importan este módulo sin abrir la ventana;
+    # en el ejecutable necesitan freeze_support (sin empaquetar no hace nada)
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+
+    # Ventana principal
+    root = tk.Tk()
+    root.title("FDA")
+    root.geometry("800x600")
+    root.minsize(600, 400)
+    mark_startup("ventana creada")
+
+    ledger = open_ledger(*startup_storage())
+    jobs = JobScheduler()
+    closing = False
+    sync_client = None
+    device_reader = None
+    weight_unit = startup_unit()
+
+    # Estilos
+    style = ttk.Style()
+    style.theme_use("clam")
+    style.configure("TLabel", background="#E0E0E0", foreground="#333333", font=("Arial", 11))
+    style.configure("TButton", background="#6286f0", foreground="white", font=("Arial", 10), padding=6)
+    style.map("TButton", background=[("active", "#5679d6")])
+    style.configure("Treeview", background="#FFFFFF", foreground="#333333", font=("Arial", 13), rowheight=25)
+    style.configure("Treeview.Heading", font=("Arial", 13, "bold"), background="#DDDDDD")
+    root.configure(bg="#E0E0E0")
+
+    menu_frame = tk.Frame(root, bg="#333333", width=200)
+    menu_frame.grid(row=0, column=0, rowspan=5, sticky="nsw")
+
+    buttons = [
+        ("Exportar a PDF", export_to_pdf),
+        ("Exportar Datos", show_export),
+        ("Importar PDF para Editar", import_pdf_to_edit),
+        ("Importar Varios PDF", import_pdf_batch),
+        ("Conciliar Inventarios", show_reconciliation),
+        ("Ingresar Registro de Báscula", ingest_scale_logs),
+        ("Conectar Báscula", connect_scale),
+        ("Limpiar Lista", clear_list),
+        ("Eliminar Producto", delete_selected),
+        ("Editar Producto", edit_product),
+        ("Guardar Sesión", save_session),
+        ("Ver Historial", show_history),
+        ("Ver Estadísticas", show_analytics),
+        ("Salir", request_close),
+    ]
+    menu_buttons = []
+    for text, command in buttons:
+        btn = tk.Button(menu_frame, text=text, command=command, bg="#333333", fg="white", font=("Arial", 10), relief="flat")
+        menu_buttons.append(btn)
+        btn.pack(fill="x", pady=5)
+        tk.Frame(menu_frame, height=2, bg="white").pack(fill="x")
+        btn.bind("<Enter>", lambda e, b=btn: b.config(bg="#5679d6"))
+        btn.bind("<Leave>", lambda e, b=btn: b.config(bg="#333333"))
+
+    frame_top = tk.Frame(root, bg="#E0E0E0")
+    frame_top.grid(row=0, column=1, padx=10, pady=10, sticky="ew")
+    tk.Label(frame_top, text="Nombre del Producto:", bg="#E0E0E0").grid(row=0, column=0, sticky="w")
+    product_name_entry = ttk.Combobox(frame_top, width=25)
+    product_name_entry.grid(row=0, column=1, padx=5, pady=5)
+    tk.Label(frame_top, text="Peso:", bg="#E0E0E0").grid(row=1, column=0, sticky="w")
+    product_weight_entry = ttk.Entry(frame_top, width=25)
+    product_weight_entry.grid(row=1, column=1, padx=5, pady=5)
+    unit_entry = ttk.Combobox(frame_top, width=4, values=UNITS, state="readonly")
+    unit_entry.set(weight_unit)
+    unit_entry.grid(row=1, column=2, padx=5)
+    add_button = ttk.Button(frame_top, text="Añadir Producto", command=add_product)
+    add_button.grid(row=2, column=0, columnspan=2, pady=10)
+
+    search_frame = tk.Frame(root, bg="#E0E0E0")
+    search_frame.grid(row=1, column=1, padx=10, sticky="ew")
+    tk.Label(search_frame, text="Buscar:", bg="#E0E0E0").grid(row=0, column=0, sticky="w")
+    search_entry = ttk.Entry(search_frame, width=22)
+    search_entry.grid(row=0, column=1, padx=5)
+    search_mode_entry = ttk.Combobox(search_frame, width=11, values=["Contiene", "Empieza con"], state="readonly")
+    search_mode_entry.set("Contiene")
+    search_mode_entry.grid(row=0, column=2, padx=5)
+    tk.Label(search_frame, text="Peso de:", bg="#E0E0E0").grid(row=0, column=3, sticky="w")
+    min_weight_entry = ttk.Entry(search_frame, width=7)
+    min_weight_entry.grid(row=0, column=4, padx=2)
+    tk.Label(search_frame, text="a:", bg="#E0E0E0").grid(row=0, column=5, sticky="w")
+    max_weight_entry = ttk.Entry(search_frame, width=7)
+    max_weight_entry.grid(row=0, column=6, padx=2)
+    ttk.Button(search_frame, text="Limpiar", command=clear_search).grid(row=0, column=7, padx=5)
+    search_count_label = tk.Label(search_frame, text="", bg="#E0E0E0")
+    search_count_label.grid(row=1, column=0, columnspan=8, sticky="w")
+
+    table_frame = tk.Frame(root, bg="#E0E0E0")
+    table_frame.grid(row=2, column=1, padx=10, pady=10, sticky="nsew")
+    product_list = ttk.Treeview(table_frame, columns=("Producto", "Peso Total"), show="headings", height=15)
+    product_list.heading("Producto", text="Producto")
+    product_list.heading("Peso Total", text="Peso Total")
+    product_list.column("Producto", width=200)
+    product_list.column("Peso Total", width=100)
+    product_list.grid(row=0, column=0, sticky="nsew")
+    table_scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=on_table_scrollbar)
+    table_scrollbar.grid(row=0, column=1, sticky="ns")
+    table_frame.grid_rowconfigure(0, weight=1)
+    table_frame.grid_columnconfigure(0, weight=1)
+    product_view = ProductView(ledger)
+
+    total_weight_label = tk.Label(root, text=f"Peso Total: {format_weight(0, weight_unit)}", font=("Arial", 12, "bold"), bg="#E0E0E0")
+    total_weight_label.grid(row=3, column=1, pady=10)
+    status_frame = tk.Frame(root, bg="#E0E0E0")
+    status_frame.grid(row=4, column=1, sticky="ew", padx=10)
+    sync_status_label = tk.Label(status_frame, text="", bg="#E0E0E0")
+    sync_status_label.pack(side="left")
+    device_status_label = tk.Label(status_frame, text="", bg="#E0E0E0")
+    device_status_label.pack(side="right")
+
+    root.grid_rowconfigure(2, weight=1)
+    root.grid_columnconfigure(1, weight=1)
+
+    product_name_entry.bind("<Return>", lambda e: product_weight_entry.focus())
+    product_name_entry.bind("<KeyRelease>", update_name_suggestions)
+    product_name_entry.bind("<<ComboboxSelected>>", lambda e: product_weight_entry.focus())
+    product_weight_entry.bind("<Return>", add_product)
+    for entry in (search_entry, min_weight_entry, max_weight_entry):
+        entry.bind("<KeyRelease>", schedule_search)
+    search_mode_entry.bind("<<ComboboxSelected>>", schedule_search)
+    unit_entry.bind("<<ComboboxSelected>>", change_unit)
+    product_list.bind("<ButtonPress-1>", on_table_click)
+    product_list.bind("<<TreeviewSelect>>", on_table_select)
+    product_list.bind("<Configure>", lambda e: render_table())
+    product_list.bind("<MouseWheel>", on_table_wheel)
+    product_list.bind("<Button-4>", on_table_wheel)
+    product_list.bind("<Button-5>", on_table_wheel)
+    product_list.bind("<Up>", on_table_arrow)
+    product_list.bind("<Down>", on_table_arrow)
+    root.bind("<Control-z>", undo_action)
+    root.bind("<Control-y>", redo_action)
+    performance_overlay = tk.Label(root, text="", justify="left", anchor="nw", font=("Courier", 9),
+                                   bg="#111111", fg="#9BE89B", padx=8, pady=6)
+    root.bind("<F12>", toggle_overlay)
+
+    @timed("autoguardado")
+    def auto_save():
+        if root.winfo_exists():
+            save_session(False)
+            root.after(10000, auto_save)
+
+    root.protocol("WM_DELETE_WINDOW", request_close)
+    instrument, trace_path = startup_instrumentation()
+    if instrument:
+        start_instrumentation(trace_path)
+    mark_startup("interfaz construida")
+    report_path, close_after = startup_measurement()
+    if report_path:
+        startup_measurement_state.update(path=report_path, close=close_after)
+        root.bind("<Map>", on_first_map, add="+")
+    poll_jobs()
+    load_session()
+    root.after(10000, auto_save)
+    root.after(PREWARM_DELAY_MS, prewarm_modules)
+    root.mainloop()
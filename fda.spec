@@ -1,38 +1,89 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
 
+# Perfil de compilación: "carpeta" (por defecto) genera dist/fda/ con el ejecutable y
+# sus bibliotecas ya descomprimidas, sin UPX, así que al abrir no hay que extraer nada
+# en un directorio temporal ni descomprimir DLLs. "unico" mantiene el exe de un solo
+# archivo comprimido con UPX (más cómodo de copiar, más lento al abrir).
+#   pyinstaller fda.spec                      (perfil carpeta)
+#   set FDA_PERFIL=unico && pyinstaller fda.spec
+PROFILE = os.environ.get("FDA_PERFIL", "carpeta")
+ONEFILE = PROFILE == "unico"
+
+# Módulos que la aplicación no usa y que PyInstaller arrastraría por dependencias
+# opcionales (reportlab intenta cargar PIL solo para dibujar imágenes)
+EXCLUDES = [
+    "PIL", "numpy", "pandas", "matplotlib", "scipy", "IPython", "jupyter_client",
+    "unittest", "doctest", "pydoc", "pdb", "lib2to3", "test", "tkinter.test",
+    "setuptools", "distutils", "pip", "pytest", "xmlrpc", "ftplib", "curses",
+]
+
+# Se importan dentro de funciones (carga diferida); se listan para que siempre entren
+HIDDEN_IMPORTS = [
+    "pdf_export", "pdf_import", "batch_import", "scale_ingest", "scale_device", "sync",
+    "sqlite_store", "reconcile", "export",
+]
 
 a = Analysis(
     ['fda.py'],
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    hiddenimports=HIDDEN_IMPORTS,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='fda',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+if ONEFILE:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='fda',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='fda',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='fda',
+    )
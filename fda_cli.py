@@ -0,0 +1,333 @@
+import argparse
+import os
+import shlex
+import sys
+from ledger import open_ledger, SESSION_FILE, HISTORY_FILE, LEGACY_HISTORY_FILE, STORAGES, STORAGE_JSON
+from totals import UNITS, UNIT_LB, to_unit, format_weight
+from analytics import ORDERS, ORDER_MOVED, TOP_LIMIT, throughput
+from export import FORMATS, ORDERS as EXPORT_ORDERS, ORDER_NAME, SOURCE_INVENTORY, SOURCE_HISTORY
+from product_filter import ProductFilter, MODE_CONTAINS, MODE_PREFIX
+
+# Línea de comandos sobre el núcleo (sin ventana): operaciones sueltas o un lote de
+# órdenes leídas de un archivo, aplicadas sobre la misma sesión que usa la aplicación.
+#
+#   python fda_cli.py agregar "queso fresco" 2.5
+#   python fda_cli.py listar
+#   python fda_cli.py lote ordenes.txt      (una orden por línea, p. ej. "restar queso 1")
+
+def command_list(ledger, args):
+    for name, weight in ledger.snapshot():
+        if args.buscar is None or args.buscar.lower() in name.lower():
+            print(f"{name}\t{to_unit(weight, args.unidad):.2f}")
+
+def command_total(ledger, args):
+    print(f"{format_weight(ledger.total, args.unidad)} ({len(ledger)} productos)")
+
+# Subtotales por categoría (primera palabra del nombre) o de un prefijo
+def command_groups(ledger, args):
+    if args.prefijo is not None:
+        rows = [(args.prefijo, ledger.totals.prefix(args.prefijo))]
+    else:
+        rows = ledger.totals.group_stats()
+    for key, stats in rows:
+        print(f"{key}\t{stats['count']}\t{to_unit(stats['total'], args.unidad):.2f}\t"
+              f"{to_unit(stats['min'], args.unidad):.2f}\t{to_unit(stats['max'], args.unidad):.2f}")
+
+def command_add(ledger, args):
+    ledger.add(args.nombre, args.peso)
+
+def command_subtract(ledger, args):
+    ledger.subtract(args.nombre, args.peso)
+
+def command_edit(ledger, args):
+    ledger.edit(args.nombre, args.nuevo_nombre, args.restar, args.peso)
+
+def command_rename(ledger, args):
+    ledger.rename(args.nombre, args.nuevo_nombre)
+
+def command_delete(ledger, args):
+    missing = [name for name in args.nombres if name not in ledger]
+    if missing:
+        raise ValueError(f"No existen: {', '.join(missing)}")
+    ledger.delete(args.nombres)
+
+def command_clear(ledger, args):
+    ledger.clear()
+
+# Inventario (todo o filtrado) o historial; el formato sale de la extensión si no se indica
+def command_export(ledger, args):
+    if args.datos == SOURCE_HISTORY:
+        ledger.export(args.archivo, args.formato, history=True, date_from=args.desde, date_to=args.hasta,
+                      action=args.accion, product=args.producto)
+        return
+    if not len(ledger):
+        raise ValueError("No hay productos para exportar.")
+    product_filter = ProductFilter(args.buscar or "", MODE_PREFIX if args.empieza else MODE_CONTAINS, args.min, args.max)
+    ledger.export(args.archivo, args.formato, order=args.orden, product_filter=product_filter, unit=args.unidad)
+
+def command_import(ledger, args):
+    if len(args.archivos) == 1:
+        ledger.import_pdf(args.archivos[0], merge=args.combinar)
+        return
+    from batch_import import BatchImport
+    batch = BatchImport(args.archivos)
+    batch.run()
+    for name, error in batch.errors:
+        print(f"{name}: {error}", file=sys.stderr)
+    if not batch.products:
+        raise ValueError("No se encontraron productos válidos en los PDF.")
+    source = f"{batch.files_done - len(batch.errors)} PDF"
+    if args.combinar:
+        ledger.merge(batch.products, source)
+    else:
+        ledger.replace(batch.products, source)
+
+def command_ingest(ledger, args):
+    from scale_ingest import ingest_files, reject_path_for
+    reject_path = args.rechazos or reject_path_for(args.archivos[0])
+    result = ingest_files(args.archivos, reject_path)
+    ledger.add_many(result.products(), ", ".join(result.files))
+    print(f"{result.accepted} de {result.rows} lecturas aceptadas, {len(result.weights)} productos")
+    if result.rejected:
+        print(f"{result.rejected} lecturas rechazadas (detalle en {reject_path})", file=sys.stderr)
+
+def command_history(ledger, args):
+    numbers = ledger.history_log.query(args.desde, args.hasta, args.accion, args.producto)
+    for entry in ledger.history_log.page(numbers, args.limite):
+        print(f"{entry['fecha']} {entry['hora']}\t{entry['accion']}\t{entry['detalles']}")
+
+def command_undo(ledger, args):
+    if ledger.undo() is None:
+        raise ValueError("No hay acciones para deshacer.")
+
+# Totales por día (o por hora con --dias 0), acciones por minuto y productos con más movimiento
+def command_analytics(ledger, args):
+    rollups = ledger.install_rollups(ledger.read_rollups())
+    rows = rollups.daily(args.dias) if args.dias else rollups.hourly()
+    for label, weight_in, weight_out, actions, minutes in rows:
+        if actions or weight_in or weight_out:
+            print(f"{label}\t{to_unit(weight_in, args.unidad):.2f}\t{to_unit(weight_out, args.unidad):.2f}\t{actions}")
+    print(f"Acciones por minuto activo: {throughput(rows):.2f}")
+    for name, weight_in, weight_out, net in rollups.top_movers(max(args.dias, 1), args.orden, args.limite):
+        print(f"{name}\t{to_unit(weight_in, args.unidad):.2f}\t{to_unit(weight_out, args.unidad):.2f}\t{to_unit(net, args.unidad):+.2f}")
+
+# Comparar dos inventarios (con una sola fuente, la sesión actual contra ella)
+def command_reconcile(ledger, args):
+    from reconcile import prepare_source, source_label, compare, CURRENT, ADDED, REMOVED
+    if len(args.fuentes) > 2:
+        raise ValueError("Se comparan como máximo dos inventarios.")
+    left, right = ([CURRENT] + args.fuentes)[-2:]
+    result = compare(prepare_source(left, ledger)(), prepare_source(right, ledger)(),
+                     args.tolerancia, args.tolerancia_pct / 100)
+    differences = result.only(args.solo)
+    for difference in differences:
+        if difference.kind == ADDED:
+            print(f"+\t{difference.name}\t\t{difference.right_weight:.2f}")
+        elif difference.kind == REMOVED:
+            print(f"-\t{difference.name}\t{difference.left_weight:.2f}\t")
+        else:
+            print(f"~\t{difference.name}\t{difference.left_weight:.2f}\t{difference.right_weight:.2f}\t{difference.delta_weight:+.3f}")
+    print(result.summary(), file=sys.stderr)
+    if args.aplicar:
+        ledger.apply_differences(differences, f"{source_label(left)} → {source_label(right)}")
+
+# Sesiones con nombre (solo con --almacen sqlite)
+def named_sessions(ledger):
+    if not hasattr(ledger.session_store, "sessions"):
+        raise ValueError("Las sesiones con nombre requieren --almacen sqlite.")
+    return ledger.session_store
+
+def command_sessions(ledger, args):
+    for name, created, count in named_sessions(ledger).sessions():
+        print(f"{name}\t{created}\t{count} productos")
+
+def command_save_as(ledger, args):
+    named_sessions(ledger).save_as(args.nombre)
+
+def command_open(ledger, args):
+    ledger.replace(named_sessions(ledger).load_named(args.nombre), f"sesión {args.nombre}")
+
+def command_delete_session(ledger, args):
+    named_sessions(ledger).delete_named(args.nombre)
+
+# En un lote una orden mal escrita no termina el proceso: argparse muestra el uso y
+# se sale con ValueError, así main guarda lo hecho por las líneas anteriores
+class BatchParser(argparse.ArgumentParser):
+    def exit(self, status=0, message=None):
+        raise ValueError((message or "orden no válida").strip())
+
+def command_batch(ledger, args):
+    source = sys.stdin if args.archivo == "-" else open(args.archivo, "r", encoding="utf-8")
+    parser = build_parser(BatchParser)
+    try:
+        for number, line in enumerate(source, 1):
+            try:
+                words = shlex.split(line, comments=True)
+                if not words:
+                    continue
+                order = parser.parse_args(words)
+            except ValueError as e:
+                raise ValueError(f"Línea {number}: {e}")
+            if order.command is command_batch:
+                raise ValueError(f"Línea {number}: no se puede anidar 'lote'.")
+            try:
+                order.command(ledger, order)
+            except ValueError as e:
+                raise ValueError(f"Línea {number}: {e}")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+def build_parser(parser_class=argparse.ArgumentParser):
+    parser = parser_class(prog="fda_cli", description="Inventario FDA sin interfaz gráfica.")
+    parser.add_argument("--sesion", default=SESSION_FILE, help="archivo de sesión")
+    parser.add_argument("--historial", default=HISTORY_FILE, help="registro del historial")
+    parser.add_argument("--almacen", choices=STORAGES, default=os.environ.get("FDA_ALMACEN", STORAGE_JSON),
+                        help="almacenamiento (json o sqlite; la primera vez sqlite importa los archivos json)")
+    parser.add_argument("--base", help="base de datos SQLite")
+    commands = parser.add_subparsers(dest="orden", required=True)
+
+    sub = commands.add_parser("listar", help="mostrar productos y pesos")
+    sub.add_argument("--buscar", help="solo nombres que contengan este texto")
+    sub.add_argument("--unidad", choices=UNITS, default=UNIT_LB, help="mostrar los pesos en lb o kg")
+    sub.set_defaults(command=command_list)
+
+    sub = commands.add_parser("total", help="peso total")
+    sub.add_argument("--unidad", choices=UNITS, default=UNIT_LB, help="mostrar el total en lb o kg")
+    sub.set_defaults(command=command_total)
+
+    sub = commands.add_parser("categorias", help="cantidad, total, mínimo y máximo por categoría (primera palabra)")
+    sub.add_argument("--prefijo", help="solo los productos que empiezan con este texto")
+    sub.add_argument("--unidad", choices=UNITS, default=UNIT_LB, help="mostrar los pesos en lb o kg")
+    sub.set_defaults(command=command_groups)
+
+    sub = commands.add_parser("agregar", help="sumar peso a un producto")
+    sub.add_argument("nombre")
+    sub.add_argument("peso", type=float)
+    sub.set_defaults(command=command_add)
+
+    sub = commands.add_parser("restar", help="restar peso a un producto")
+    sub.add_argument("nombre")
+    sub.add_argument("peso", type=float)
+    sub.set_defaults(command=command_subtract)
+
+    sub = commands.add_parser("editar", help="restar, reemplazar peso y/o renombrar")
+    sub.add_argument("nombre")
+    sub.add_argument("--nuevo-nombre")
+    sub.add_argument("--restar", type=float)
+    sub.add_argument("--peso", type=float)
+    sub.set_defaults(command=command_edit)
+
+    sub = commands.add_parser("renombrar", help="renombrar (o combinar con un producto existente)")
+    sub.add_argument("nombre")
+    sub.add_argument("nuevo_nombre")
+    sub.set_defaults(command=command_rename)
+
+    sub = commands.add_parser("eliminar", help="eliminar productos")
+    sub.add_argument("nombres", nargs="+")
+    sub.set_defaults(command=command_delete)
+
+    sub = commands.add_parser("limpiar", help="eliminar todos los productos")
+    sub.set_defaults(command=command_clear)
+
+    sub = commands.add_parser("deshacer", help="revertir la última acción de esta orden o lote")
+    sub.set_defaults(command=command_undo)
+
+    sub = commands.add_parser("exportar", help="exportar a CSV, XLSX, JSON Lines o PDF")
+    sub.add_argument("archivo", help="destino (.csv, .xlsx, .jsonl o .pdf)")
+    sub.add_argument("--formato", choices=FORMATS, help="formato (por defecto, según la extensión)")
+    sub.add_argument("--orden", choices=EXPORT_ORDERS, default=ORDER_NAME, help="ordenar el inventario por nombre o peso")
+    sub.add_argument("--buscar", help="solo nombres que contengan este texto")
+    sub.add_argument("--empieza", action="store_true", help="--buscar por el comienzo del nombre")
+    sub.add_argument("--min", type=float, help="peso mínimo en lb")
+    sub.add_argument("--max", type=float, help="peso máximo en lb")
+    sub.add_argument("--unidad", choices=UNITS, default=UNIT_LB, help="pesos en lb o kg (el PDF siempre en lb)")
+    sub.add_argument("--datos", choices=(SOURCE_INVENTORY, SOURCE_HISTORY), default=SOURCE_INVENTORY,
+                     help="exportar el inventario o el historial (con --desde, --hasta, --accion, --producto)")
+    sub.add_argument("--desde")
+    sub.add_argument("--hasta")
+    sub.add_argument("--accion")
+    sub.add_argument("--producto")
+    sub.set_defaults(command=command_export)
+
+    sub = commands.add_parser("importar", help="importar uno o varios PDF")
+    sub.add_argument("archivos", nargs="+")
+    sub.add_argument("--combinar", action="store_true", help="sumar a la lista en lugar de reemplazarla")
+    sub.set_defaults(command=command_import)
+
+    sub = commands.add_parser("ingresar", help="sumar registros de báscula CSV/TSV")
+    sub.add_argument("archivos", nargs="+")
+    sub.add_argument("--rechazos", help="informe de lecturas rechazadas")
+    sub.set_defaults(command=command_ingest)
+
+    sub = commands.add_parser("conciliar", help="comparar dos inventarios: sesión JSON, PDF, 'actual' o sesion:NOMBRE")
+    sub.add_argument("fuentes", nargs="+", help="una fuente (se compara con la sesión actual) o dos")
+    sub.add_argument("--tolerancia", type=float, default=0, help="diferencia en lb que se ignora")
+    sub.add_argument("--tolerancia-pct", type=float, default=0, help="diferencia en %% del peso que se ignora")
+    sub.add_argument("--solo", choices=("añadido", "eliminado", "cambiado"), action="append",
+                     help="mostrar (y aplicar) solo este tipo de diferencia; se puede repetir")
+    sub.add_argument("--aplicar", action="store_true", help="sumar las diferencias a la sesión (un paso de deshacer)")
+    sub.set_defaults(command=command_reconcile)
+
+    sub = commands.add_parser("historial", help="consultar el historial")
+    sub.add_argument("--desde")
+    sub.add_argument("--hasta")
+    sub.add_argument("--accion")
+    sub.add_argument("--producto")
+    sub.add_argument("--limite", type=int, default=50)
+    sub.set_defaults(command=command_history)
+
+    sub = commands.add_parser("estadisticas", help="movimiento por día, acciones por minuto y productos más movidos")
+    sub.add_argument("--dias", type=int, default=7, help="días hasta hoy (0 = hoy por hora)")
+    sub.add_argument("--orden", choices=ORDERS, default=ORDER_MOVED, help="orden de los productos")
+    sub.add_argument("--limite", type=int, default=TOP_LIMIT)
+    sub.add_argument("--unidad", choices=UNITS, default=UNIT_LB, help="mostrar los pesos en lb o kg")
+    sub.set_defaults(command=command_analytics)
+
+    sub = commands.add_parser("sesiones", help="listar las sesiones guardadas (sqlite)")
+    sub.set_defaults(command=command_sessions)
+
+    sub = commands.add_parser("guardar-como", help="guardar una copia de la sesión actual (sqlite)")
+    sub.add_argument("nombre")
+    sub.set_defaults(command=command_save_as)
+
+    sub = commands.add_parser("abrir", help="reemplazar la lista por una sesión guardada (sqlite)")
+    sub.add_argument("nombre")
+    sub.set_defaults(command=command_open)
+
+    sub = commands.add_parser("borrar-sesion", help="eliminar una sesión guardada (sqlite)")
+    sub.add_argument("nombre")
+    sub.set_defaults(command=command_delete_session)
+
+    sub = commands.add_parser("lote", help="ejecutar órdenes de un archivo (- para la entrada estándar)")
+    sub.add_argument("archivo")
+    sub.set_defaults(command=command_batch)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    legacy_history_file = LEGACY_HISTORY_FILE if args.historial == HISTORY_FILE else None
+    try:
+        ledger = open_ledger(args.almacen, args.base, args.sesion, args.historial, legacy_history_file)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    try:
+        ledger.load()
+        args.command(ledger, args)
+        ledger.save()
+    except (OSError, ValueError) as e:
+        # OSError: archivo de lote, PDF o destino de exportación que no existe o no se
+        # puede escribir; lo hecho hasta ahí se guarda igual
+        print(f"Error: {e}", file=sys.stderr)
+        try:
+            ledger.save()
+        except OSError:
+            pass
+        return 1
+    finally:
+        ledger.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+import bisect
+import json
+import operator
+import os
+from array import array
+from datetime import datetime
+
+# Historial persistente: registro JSON Lines de solo-añadir + índice binario.
+# Por cada entrada el índice guarda 4 enteros de 64 bits: posición en el registro,
+# fecha (AAAAMMDD), id de acción e id de producto (-1 si no aplica). Los nombres de
+# acciones y productos se numeran en un archivo de claves aparte. Con el índice en
+# memoria se filtra por fecha (bisect), acción y producto sin leer el registro, y
+# solo se leen del disco las entradas de la página que se muestra.
+#
+# La búsqueda binaria por fecha supone fechas no decrecientes. Si el reloj retrocede o
+# una entrada migrada trae una fecha anterior, ordered pasa a False (se comprueba al
+# cargar el índice y en cada entrada nueva) y el filtro de fechas recorre todo el índice.
+
+INDEX_FIELDS = 4
+
+def date_key(fecha):
+    try:
+        return int(fecha.replace("-", ""))
+    except ValueError:
+        return 0
+
+class HistoryLog:
+    def __init__(self, log_path, legacy_path=None):
+        base, _ = os.path.splitext(log_path)
+        self.log_path = log_path
+        self.index_path = base + ".idx"
+        self.keys_path = base + ".claves.jsonl"
+        self.offsets = array("q")
+        self.dates = array("q")
+        self.action_ids = array("q")
+        self.product_ids = array("q")
+        self.actions = []
+        self.products = []
+        self.action_lookup = {}
+        self.product_lookup = {}
+        self.log_file = None
+        self.index_file = None
+        self.keys_file = None
+        self.reader = None
+        self.ordered = True
+        migrate = legacy_path and os.path.exists(legacy_path) and not os.path.exists(log_path)
+        self.load_index()
+        self.recover()
+        if migrate:
+            self.migrate_legacy(legacy_path)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def load_index(self):
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        kind, name = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.register_key(kind, name)
+        if os.path.exists(self.index_path):
+            raw = array("q")
+            size = os.path.getsize(self.index_path)
+            count = size // (raw.itemsize * INDEX_FIELDS)
+            with open(self.index_path, "rb") as file:
+                raw.fromfile(file, count * INDEX_FIELDS)
+            self.offsets = raw[0::INDEX_FIELDS]
+            self.dates = raw[1::INDEX_FIELDS]
+            self.action_ids = raw[2::INDEX_FIELDS]
+            self.product_ids = raw[3::INDEX_FIELDS]
+            self.ordered = all(map(operator.le, self.dates, self.dates[1:]))
+            if size != count * raw.itemsize * INDEX_FIELDS:
+                # Registro de índice incompleto por un cierre inesperado
+                with open(self.index_path, "r+b") as file:
+                    file.truncate(count * raw.itemsize * INDEX_FIELDS)
+
+    # Indexar entradas del registro que no llegaron al índice (cierre inesperado)
+    def recover(self):
+        if not os.path.exists(self.log_path):
+            return
+        log_size = os.path.getsize(self.log_path)
+        while self.offsets and self.offsets[-1] >= log_size:
+            self.drop_last_index()
+        start = 0
+        if self.offsets:
+            with open(self.log_path, "rb") as file:
+                file.seek(self.offsets[-1])
+                file.readline()
+                start = file.tell()
+        if start >= log_size:
+            return
+        with open(self.log_path, "r+b") as file:
+            file.seek(start)
+            while True:
+                offset = file.tell()
+                line = file.readline()
+                if not line:
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Línea incompleta al final: se descarta
+                    file.truncate(offset)
+                    break
+                self.index_entry(offset, entry)
+
+    def drop_last_index(self):
+        for column in (self.offsets, self.dates, self.action_ids, self.product_ids):
+            column.pop()
+        with open(self.index_path, "r+b") as file:
+            file.truncate(len(self.offsets) * self.offsets.itemsize * INDEX_FIELDS)
+
+    def register_key(self, kind, name):
+        names, lookup = (self.actions, self.action_lookup) if kind == "a" else (self.products, self.product_lookup)
+        if name not in lookup:
+            lookup[name] = len(names)
+            names.append(name)
+        return lookup[name]
+
+    def key_id(self, kind, name, flush=True):
+        lookup = self.action_lookup if kind == "a" else self.product_lookup
+        if name in lookup:
+            return lookup[name]
+        if self.keys_file is None:
+            self.keys_file = open(self.keys_path, "a", encoding="utf-8")
+        self.keys_file.write(json.dumps([kind, name], ensure_ascii=False) + "\n")
+        if flush:
+            self.keys_file.flush()
+        return self.register_key(kind, name)
+
+    def index_entry(self, offset, entry, flush=True):
+        action_id = self.key_id("a", entry.get("accion", ""), flush)
+        product = entry.get("producto")
+        product_id = self.key_id("p", product, flush) if product is not None else -1
+        record = array("q", (offset, date_key(entry.get("fecha", "")), action_id, product_id))
+        if self.dates and record[1] < self.dates[-1]:
+            self.ordered = False
+        self.offsets.append(record[0])
+        self.dates.append(record[1])
+        self.action_ids.append(record[2])
+        self.product_ids.append(record[3])
+        if self.index_file is None:
+            self.index_file = open(self.index_path, "ab")
+        record.tofile(self.index_file)
+        if flush:
+            self.index_file.flush()
+
+    def append(self, entry):
+        if self.log_file is None:
+            self.log_file = open(self.log_path, "ab")
+        offset = self.log_file.tell()
+        self.log_file.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.log_file.flush()
+        self.index_entry(offset, entry)
+
+    # Añadir muchas entradas con una sola escritura por archivo (operaciones masivas)
+    def extend(self, entries):
+        if self.log_file is None:
+            self.log_file = open(self.log_path, "ab")
+        offset = self.log_file.tell()
+        lines = []
+        for entry in entries:
+            line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+            self.index_entry(offset, entry, flush=False)
+            offset += len(line)
+            lines.append(line)
+        # El registro se escribe antes de vaciar el índice, como en append
+        self.log_file.write(b"".join(lines))
+        self.log_file.flush()
+        for file in (self.keys_file, self.index_file):
+            if file is not None:
+                file.flush()
+
+    # Importar el historial antiguo (lista de textos "Acción: detalles" sin fecha)
+    def migrate_legacy(self, legacy_path):
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as file:
+                legacy = json.load(file)
+        except (OSError, ValueError):
+            return
+        fecha = datetime.fromtimestamp(os.path.getmtime(legacy_path)).strftime("%Y-%m-%d")
+        for text in legacy:
+            action, _, details = str(text).partition(":")
+            details = details.strip()
+            product = details.split(",")[0].split(" -> ")[0].strip() or None
+            self.append({"fecha": fecha, "hora": "", "accion": action.strip(), "detalles": details, "producto": product})
+
+    def read(self, number):
+        if self.reader is None:
+            self.reader = open(self.log_path, "rb")
+        self.reader.seek(self.offsets[number])
+        return json.loads(self.reader.readline())
+
+    # Números de entrada que cumplen el filtro, de la más reciente a la más antigua (perezoso)
+    def query(self, date_from=None, date_to=None, action=None, product=None):
+        check_dates = not self.ordered and (date_from or date_to)
+        if check_dates:
+            low, high = 0, len(self.dates)
+            first = date_key(date_from) if date_from else None
+            last = date_key(date_to) if date_to else None
+        else:
+            low = bisect.bisect_left(self.dates, date_key(date_from)) if date_from else 0
+            high = bisect.bisect_right(self.dates, date_key(date_to)) if date_to else len(self.dates)
+        action_id = None
+        if action:
+            action_id = self.action_lookup.get(action)
+            if action_id is None:
+                return
+        product_ids = None
+        if product:
+            needle = product.lower()
+            product_ids = {number for name, number in self.product_lookup.items() if needle in name.lower()}
+            if not product_ids:
+                return
+        for number in range(high - 1, low - 1, -1):
+            if check_dates:
+                day = self.dates[number]
+                if (first is not None and day < first) or (last is not None and day > last):
+                    continue
+            if action_id is not None and self.action_ids[number] != action_id:
+                continue
+            if product_ids is not None and self.product_ids[number] not in product_ids:
+                continue
+            yield number
+
+    # Entradas desde la número "start" en orden, leídas de corrido con un archivo propio
+    # (puede correr en otro hilo); se detiene en la última línea completa indexada
+    def entries_since(self, start):
+        end = len(self.offsets)
+        if start >= end:
+            return
+        with open(self.log_path, "rb") as file:
+            file.seek(self.offsets[start])
+            for _ in range(start, end):
+                line = file.readline()
+                if not line.endswith(b"\n"):
+                    return
+                yield json.loads(line)
+
+    def page(self, numbers, size):
+        entries = []
+        for number in numbers:
+            entries.append(self.read(number))
+            if len(entries) >= size:
+                break
+        return entries
+
+    def close(self):
+        for name in ("log_file", "index_file", "keys_file", "reader"):
+            file = getattr(self, name)
+            if file is not None:
+                file.close()
+                setattr(self, name, None)
@@ -0,0 +1,155 @@
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Medición de tiempos de las acciones de la aplicación.
+# Las acciones se marcan con @timed("nombre") o con "with span('nombre'):". Mientras la
+# medición está apagada el costo es comprobar un atributo. Encendida, cada duración va
+# a un histograma móvil por operación (las últimas ROLLING_SAMPLES) y, si se pidió, a
+# un archivo de traza en formato Chrome (chrome://tracing o https://ui.perfetto.dev).
+#
+# Se enciende con fda.py --instrumentar [--traza archivo.json], con la variable de
+# entorno FDA_INSTRUMENTAR, o abriendo el panel oculto de rendimiento (F12).
+
+ROLLING_SAMPLES = 500
+# Límites (en ms) de los intervalos del histograma
+HISTOGRAM_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+LOOP_LAG = "retraso del bucle"
+
+class RollingHistogram:
+    def __init__(self, size=ROLLING_SAMPLES):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, milliseconds):
+        self.samples.append(milliseconds)
+        self.count += 1
+
+    def percentile(self, fraction, ordered=None):
+        ordered = ordered or sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    # (p50, p95, máx.) de las muestras recientes
+    def summary(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0, 0.0, 0.0
+        return self.percentile(0.5, ordered), self.percentile(0.95, ordered), ordered[-1]
+
+    # Cantidad de muestras recientes en cada intervalo de HISTOGRAM_BOUNDS (y una más
+    # para lo que supera el último límite)
+    def buckets(self):
+        counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        for value in self.samples:
+            counts[bisect.bisect_left(HISTOGRAM_BOUNDS, value)] += 1
+        return counts
+
+class Span:
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.record(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+class NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NO_SPAN = NoSpan()
+
+class Instrumentation:
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.trace_file = None
+        self.trace_started = None
+        self.trace_first = True
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def record(self, name, start, duration):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = RollingHistogram()
+            histogram.add(duration * 1000)
+            if self.trace_file is not None:
+                event = {
+                    "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                    "ts": round((start - self.trace_started) * 1e6), "dur": round(duration * 1e6),
+                }
+                self.trace_file.write(("" if self.trace_first else ",\n") + json.dumps(event, ensure_ascii=False))
+                self.trace_first = False
+
+    # Apagada devuelve siempre el mismo objeto que no hace nada
+    def span(self, name):
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name)
+
+    def timed(self, name):
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(name, start, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    # Traza en formato JSON de Chrome (un arreglo de eventos "X" con inicio y duración)
+    def start_trace(self, path):
+        self.stop_trace()
+        with self.lock:
+            self.trace_file = open(path, "w", encoding="utf-8")
+            self.trace_file.write("[\n")
+            self.trace_started = time.perf_counter()
+            self.trace_first = True
+        self.enable()
+
+    def stop_trace(self):
+        with self.lock:
+            if self.trace_file is not None:
+                self.trace_file.write("\n]\n")
+                self.trace_file.close()
+                self.trace_file = None
+
+    # [(operación, cantidad, p50, p95, máx.)], de la más lenta a la más rápida
+    def summary(self):
+        with self.lock:
+            rows = [(name, histogram.count, *histogram.summary()) for name, histogram in self.histograms.items()]
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+
+instruments = Instrumentation()
+timed = instruments.timed
+span = instruments.span
@@ -0,0 +1,136 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Planificador de trabajos de disco (guardar, cargar, exportar, importar) fuera del hilo
+# de la interfaz.
+# Un trabajo tiene dos partes: prepare() corre en el hilo de la interfaz justo antes de
+# empezar y toma lo que haga falta del inventario (una copia inmutable); devuelve la
+# función que corre en el grupo de hilos, o None si no hay nada que hacer. Los
+# resultados, errores y avances vuelven por una cola que la interfaz vacía con poll()
+# (root.after), así que los callbacks siempre corren en el hilo de la interfaz.
+#
+# Trabajos con la misma clave no corren a la vez: mientras uno corre, el siguiente
+# espera y uno más nuevo lo reemplaza (varios autoguardados en cola quedan en uno).
+
+JOB_WORKERS = 2
+JOB_POLL_MS = 50
+
+class Job:
+    def __init__(self, name, prepare, key=None, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        self.name = name
+        self.prepare = prepare
+        self.key = key
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self.cancel_event = threading.Event()
+        self.scheduler = None
+        # Se marca desde el hilo del trabajo al terminar (para esperar al cerrar)
+        self.completed = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    # Desde el hilo del trabajo: avance (hecho, total); solo el último de cada vaciado
+    # llega a on_progress
+    def progress(self, done, total=None):
+        self.scheduler.messages.put(("progress", self, (done, total)))
+
+class JobScheduler:
+    def __init__(self, workers=JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fda-trabajo")
+        self.messages = queue.Queue()
+        self.running = set()
+        self.running_keys = {}
+        self.waiting = {}
+
+    def submit(self, name, prepare, key=None, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        job = Job(name, prepare, key, on_done, on_error, on_progress, on_cancel)
+        job.scheduler = self
+        if key is not None and key in self.running_keys:
+            self.waiting[key] = job
+            return job
+        self.start(job)
+        return job
+
+    def start(self, job):
+        try:
+            work = job.prepare()
+        except Exception as e:
+            self.finish(job)
+            if job.on_error is not None:
+                job.on_error(e)
+            return
+        if work is None:
+            self.finish(job)
+            if job.on_done is not None:
+                job.on_done(None)
+            return
+        self.running.add(job)
+        if job.key is not None:
+            self.running_keys[job.key] = job
+        self.executor.submit(self.run, job, work)
+
+    def run(self, job, work):
+        try:
+            result = work(job)
+        except Exception as e:
+            self.messages.put(("cancelled" if job.cancelled() else "error", job, e))
+        else:
+            self.messages.put(("cancelled" if job.cancelled() else "done", job, result))
+        finally:
+            job.completed.set()
+
+    def finish(self, job):
+        self.running.discard(job)
+        if job.key is not None and self.running_keys.get(job.key) is job:
+            del self.running_keys[job.key]
+
+    # Entregar resultados y avances (hilo de la interfaz); devuelve cuántos mensajes hubo
+    def poll(self):
+        progress = {}
+        handled = 0
+        while True:
+            try:
+                kind, job, value = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            handled += 1
+            if kind == "progress":
+                progress[job] = value
+                continue
+            progress.pop(job, None)
+            self.finish(job)
+            callback = {"done": job.on_done, "error": job.on_error, "cancelled": job.on_cancel}[kind]
+            if callback is not None:
+                callback(value if kind != "cancelled" else None)
+            if job.key is not None and job.key in self.waiting:
+                self.start(self.waiting.pop(job.key))
+        for job, (done, total) in progress.items():
+            if job.on_progress is not None and job in self.running:
+                job.on_progress(done, total)
+        return handled
+
+    @property
+    def busy(self):
+        return bool(self.running)
+
+    def is_running(self, key):
+        return key in self.running_keys
+
+    # Al cerrar: descartar lo que espera, cancelar lo que corre (salvo las claves
+    # indicadas, p. ej. un guardado a medias) y esperar a que terminen
+    def shutdown(self, keep=()):
+        self.waiting.clear()
+        for job in list(self.running):
+            if job.key not in keep:
+                job.cancel()
+        for job in list(self.running):
+            job.completed.wait()
+        self.executor.shutdown(wait=True)
+        self.poll()
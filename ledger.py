@@ -0,0 +1,494 @@
+import os
+from datetime import datetime
+from totals import TotalsLedger, UNIT_LB, MAX_FIXED, to_fixed, from_fixed, checked_fixed
+from product_store import ProductStore
+from undo import UndoJournal
+from session_store import SessionStore
+from history import HistoryLog
+from autocomplete import NameIndex, DEFAULT_LIMIT
+from product_filter import WeightIndex
+from analytics import HistoryRollups, rollups_path_for
+
+# Núcleo del inventario sin interfaz gráfica.
+# ProductLedger reúne los productos, los totales, el diario de deshacer, la sesión en
+# disco y el historial. La ventana (fda.py) y la línea de comandos (fda_cli.py) solo
+# llaman a sus métodos. Las operaciones inválidas lanzan ValueError con el mensaje
+# para el usuario; las que cambian productos devuelven los nombres afectados para que
+# la vista refresque solo esas filas.
+
+SESSION_FILE = "productos_sesion.json"
+HISTORY_FILE = "historial_acciones.jsonl"
+LEGACY_HISTORY_FILE = "historial_acciones.json"
+UNDO_MAX_STEPS = 200
+UNDO_MAX_CHANGES = 200000
+STORAGE_JSON = "json"
+STORAGE_SQLITE = "sqlite"
+STORAGES = (STORAGE_JSON, STORAGE_SQLITE)
+
+class ProductLedger:
+    def __init__(self, session_file=SESSION_FILE, history_file=HISTORY_FILE, legacy_history_file=LEGACY_HISTORY_FILE,
+                 undo_max_steps=UNDO_MAX_STEPS, undo_max_changes=UNDO_MAX_CHANGES, session_store=None, history_log=None,
+                 rollups_file=None):
+        # {nombre: peso en libras} guardado en milésimas exactas (ver product_store)
+        self.products = ProductStore()
+        self.name_index = NameIndex()
+        self.installed = False
+        # Durante una operación masiva los nombres nuevos y los borrados se aplican
+        # al índice juntos al final
+        self.new_names = None
+        self.removed_names = None
+        # Funciones avisadas de cada cambio: listener(nombre, peso anterior, peso nuevo)
+        self.listeners = []
+        # Con varias estaciones sincronizadas, deshacer aplica la diferencia del paso
+        # sobre el peso actual en vez de restaurar el peso absoluto
+        self.relative_undo = False
+        self.totals = TotalsLedger(self.products)
+        self.weight_index = WeightIndex(self.products)
+        self.undo_journal = UndoJournal(undo_max_steps, undo_max_changes)
+        self.session_store = session_store if session_store is not None else SessionStore(session_file)
+        self.history_log = history_log if history_log is not None else HistoryLog(history_file, legacy_history_file)
+        # Durante una acción: cambio neto por producto (milésimas) y entradas del historial,
+        # que se escriben juntas al confirmarla
+        self.step_changes = None
+        self.step_entries = None
+        # Resúmenes del historial para estadísticas; se cargan la primera vez que se piden
+        self.rollups_file = rollups_file or rollups_path_for(history_file)
+        self.rollups = None
+
+    def __len__(self):
+        return len(self.products)
+
+    def __contains__(self, name):
+        return name in self.products
+
+    @property
+    def total(self):
+        return self.totals.total
+
+    def weight(self, name):
+        return self.products[name]
+
+    # Nombres sugeridos para lo que se lleva escrito (prefijo y luego parecidos)
+    def suggest(self, text, limit=DEFAULT_LIMIT):
+        return self.name_index.complete(text, limit)
+
+    # Copia ordenada e inmutable del inventario (exportación, hilos, comparación)
+    def snapshot(self):
+        return self.products.sorted_items()
+
+    # Sesión en disco (instantánea + cambios del diario)
+    def load(self):
+        return self.install(*self.read_session())
+
+    # Leer la sesión y preparar su índice de nombres sin tocar el inventario actual ni
+    # el estado del almacén (puede correr en otro hilo); install() lo pone en uso en el
+    # hilo de la interfaz. Hasta entonces installed es False y no hay que guardar: la
+    # lista vacía reemplazaría la sesión en disco
+    def read_session(self):
+        products, replayed = self.session_store.read()
+        products = ProductStore(products)
+        return products, NameIndex(products), replayed
+
+    def install(self, products, name_index, replayed=False):
+        self.products = products
+        self.name_index = name_index
+        self.totals.reset(products)
+        self.weight_index = WeightIndex(products)
+        self.session_store.loaded(replayed)
+        self.installed = True
+        return self.products
+
+    def save(self, force=False):
+        return self.session_store.compact(self.products, force=force)
+
+    # Guardado en segundo plano: aparta el diario y copia el inventario ahora; devuelve
+    # la función que escribe la instantánea en otro hilo, o None si no había cambios
+    def save_job(self, force=False):
+        return self.session_store.snapshot_job(self.products, force)
+
+    def save_failed(self):
+        self.session_store.snapshot_failed()
+
+    def close(self):
+        self.session_store.close()
+        if self.rollups is not None:
+            self.rollups.save()
+        self.history_log.close()
+
+    # Historial
+    @staticmethod
+    def history_entry(action, details, product=None):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        fecha, hora = timestamp.split()
+        return {"fecha": fecha, "hora": hora, "accion": action, "detalles": details, "producto": product}
+
+    def add_to_history(self, action, details, product=None):
+        self.add_history_entries([self.history_entry(action, details, product)])
+
+    # Dentro de una acción las entradas esperan a commit() para llevar sus cambios
+    def add_history_entries(self, entries):
+        if self.step_entries is not None:
+            self.step_entries.extend(entries)
+        else:
+            self.write_history(entries)
+
+    def write_history(self, entries):
+        self.history_log.extend(entries)
+        if self.rollups is not None:
+            self.rollups.extend(entries)
+
+    # Datos estructurados de las entradas de una acción: "paso" (número de la primera
+    # entrada; agrupa las de una misma acción), "delta" en libras del producto de la
+    # entrada y, en la última, "cambios" con los demás productos que cambiaron
+    # (operaciones masivas, renombrar, deshacer)
+    @staticmethod
+    def describe_step(entries, changes, step):
+        described = set()
+        for entry in entries:
+            entry["paso"] = step
+            product = entry["producto"]
+            if product is not None and product not in described and changes.get(product):
+                entry["delta"] = from_fixed(changes[product])
+                described.add(product)
+        rest = {name: from_fixed(value) for name, value in changes.items() if value and name not in described}
+        if rest:
+            entries[-1]["cambios"] = rest
+        return entries
+
+    def start_step(self):
+        self.step_changes = {}
+        self.step_entries = []
+
+    def finish_step(self):
+        changes, self.step_changes = self.step_changes, None
+        entries, self.step_entries = self.step_entries, None
+        if entries:
+            self.write_history(self.describe_step(entries, changes, len(self.history_log)))
+
+    # Resúmenes del historial: read_rollups() los lee y pone al día (puede correr en otro
+    # hilo); install_rollups() suma lo que llegó mientras tanto y los deja en uso, y
+    # desde entonces cada entrada nueva se suma al escribirse
+    def read_rollups(self, progress=None, cancelled=None):
+        rollups = HistoryRollups.load(self.rollups_file)
+        rollups.catch_up(self.history_log, progress, cancelled)
+        rollups.save()
+        return rollups
+
+    def install_rollups(self, rollups):
+        rollups.catch_up(self.history_log)
+        self.rollups = rollups
+        return rollups
+
+    # Cambios de peso: mantienen sincronizados products, los índices de nombres y pesos,
+    # totals, el diario de deshacer y el de la sesión
+    def set_product(self, name, weight):
+        self.set_fixed(name, to_fixed(weight))
+
+    # Igual que set_product con el peso en milésimas; las sumas se hacen en milésimas
+    # para que no acumulen error
+    def set_fixed(self, name, value):
+        if not -MAX_FIXED <= value <= MAX_FIXED:
+            raise ValueError(f"El peso de '{name}' es demasiado grande.")
+        old_value = self.products.fixed(name)
+        old_weight = None if old_value is None else from_fixed(old_value)
+        weight = from_fixed(value)
+        self.undo_journal.record(name, old_weight, weight)
+        if old_value is None:
+            if self.new_names is not None:
+                self.new_names.append(name)
+            else:
+                self.name_index.add(name)
+        self.products.set_fixed(name, value)
+        if self.step_changes is not None:
+            self.step_changes[name] = self.step_changes.get(name, 0) + value - (old_value or 0)
+        self.totals.update(name, old_value, value)
+        self.weight_index.invalidate()
+        self.session_store.record(name, weight)
+        for listener in self.listeners:
+            listener(name, old_weight, weight)
+
+    def remove_product(self, name):
+        old_value = self.products.fixed(name)
+        old_weight = self.products.remove(name)
+        self.undo_journal.record(name, old_weight, None)
+        if self.removed_names is not None:
+            self.removed_names.append(name)
+        else:
+            self.name_index.remove(name)
+        if self.step_changes is not None:
+            self.step_changes[name] = self.step_changes.get(name, 0) - old_value
+        self.totals.update(name, old_value, None)
+        self.weight_index.invalidate()
+        self.session_store.record(name, None)
+        for listener in self.listeners:
+            listener(name, old_weight, None)
+
+    # Aplicar {nombre: peso o None} (None elimina el producto)
+    def apply_weights(self, weights):
+        self.collect_names()
+        for name, weight in weights.items():
+            if weight is None:
+                if name in self.products:
+                    self.remove_product(name)
+            else:
+                self.set_product(name, weight)
+        self.index_collected_names()
+        self.session_store.sync()
+        return list(weights)
+
+    # Cada acción del usuario es un paso de deshacer
+    def begin(self):
+        self.undo_journal.begin()
+        self.start_step()
+
+    def commit(self):
+        self.undo_journal.commit()
+        self.session_store.sync()
+        self.finish_step()
+
+    def undo(self):
+        return self.apply_step("Deshecho", self.undo_journal.undo_pairs())
+
+    def redo(self):
+        return self.apply_step("Rehecho", self.undo_journal.redo_pairs())
+
+    # Deshacer y rehacer también quedan en el historial, con los cambios que aplicaron
+    def apply_step(self, action, pairs):
+        if pairs is None:
+            return None
+        self.start_step()
+        changed = self.apply_pairs(pairs)
+        self.add_to_history(action, f"{len(changed)} productos")
+        self.finish_step()
+        return changed
+
+    def apply_pairs(self, pairs):
+        if pairs is None:
+            return None
+        if not self.relative_undo:
+            return self.apply_weights({name: target for name, (current, target) in pairs.items()})
+        weights = {}
+        for name, (expected, target) in pairs.items():
+            value = self.products.fixed(name, 0) + to_fixed(target or 0) - to_fixed(expected or 0)
+            # Con cambios de otras estaciones de por medio puede quedar en 0 o menos
+            weights[name] = from_fixed(value) if value > 0 else None
+        return self.apply_weights(weights)
+
+    # Pesos ingresados en milésimas, validados antes de cambiar nada (diario de
+    # deshacer, índices o inventario): ValueError si no es un número finito, no cabe
+    # en los arrays o (positive_fixed) no llega a una milésima
+    @staticmethod
+    def fixed_weight(weight):
+        value = checked_fixed(weight)
+        if value is None:
+            raise ValueError("El peso no es un número válido o es demasiado grande.")
+        return value
+
+    @classmethod
+    def positive_fixed(cls, weight, message="El peso debe ser mayor a 0."):
+        value = cls.fixed_weight(weight)
+        if value <= 0:
+            raise ValueError(message)
+        return value
+
+    @staticmethod
+    def checked_sum(name, value):
+        if value > MAX_FIXED:
+            raise ValueError(f"El peso de '{name}' sería demasiado grande.")
+        return value
+
+    # Operaciones
+    def add(self, name, weight):
+        name = name.strip()
+        if name == "":
+            raise ValueError("El nombre del producto no puede estar vacío.")
+        value = self.positive_fixed(weight)
+        existing = self.products.fixed(name)
+        if existing is not None:
+            value = self.checked_sum(name, existing + value)
+        self.begin()
+        self.set_fixed(name, value)
+        if existing is not None:
+            self.add_to_history("Modificado", f"{name} - +{weight:.2f} lb", name)
+        else:
+            self.add_to_history("Añadido", f"{name} - {weight:.2f} lb", name)
+        self.commit()
+        return [name]
+
+    # Restar peso, reemplazarlo y/o renombrar; si el nuevo nombre ya existe se suman los pesos
+    def edit(self, name, new_name=None, subtract=None, new_weight=None):
+        if name not in self.products:
+            raise ValueError(f"El producto '{name}' no existe.")
+        new_name = (new_name or "").strip() or name
+        current_weight = self.products[name]
+        final_value = self.products.fixed(name)
+        if subtract is not None:
+            subtract_value = self.fixed_weight(subtract)
+            if subtract_value < 0:
+                raise ValueError("No se puede restar un valor negativo.")
+            final_value -= subtract_value
+        if new_weight is not None:
+            final_value = self.positive_fixed(new_weight, "El peso nuevo debe ser mayor a 0.")
+        if final_value <= 0:
+            raise ValueError("El peso final debe ser mayor a 0.")
+        final_weight = from_fixed(final_value)
+        combining = new_name in self.products and new_name != name
+        if combining:
+            combined_value = self.checked_sum(new_name, self.products.fixed(new_name) + final_value)
+
+        self.begin()
+        if subtract is not None:
+            self.add_to_history("Peso Restado", f"{name} - {subtract:.2f} lb (Nuevo peso: {current_weight - subtract:.2f} lb)", name)
+        if new_weight is not None:
+            self.add_to_history("Peso Reemplazado", f"{name} → {new_name} - {final_weight:.2f} lb", name)
+        if combining:
+            combined_weight = from_fixed(combined_value)
+            self.remove_product(name)
+            self.set_fixed(new_name, combined_value)
+            self.add_to_history("Combinado", f"{name} → {new_name} (Peso combinado: {combined_weight:.2f} lb)", new_name)
+        else:
+            self.remove_product(name)
+            self.set_fixed(new_name, final_value)
+            self.add_to_history("Editado", f"{name} → {new_name} - {final_weight:.2f} lb", new_name)
+        self.commit()
+        return [name, new_name]
+
+    def subtract(self, name, amount):
+        return self.edit(name, subtract=amount)
+
+    def rename(self, name, new_name):
+        return self.edit(name, new_name=new_name)
+
+    def delete(self, names):
+        removed = []
+        self.begin()
+        for name in names:
+            if name in self.products:
+                self.add_to_history("Eliminado", f"{name} - {self.products[name]:.2f} lb", name)
+                self.remove_product(name)
+                removed.append(name)
+        self.commit()
+        return removed
+
+    def clear(self):
+        return self.delete(list(self.products))
+
+    # Operación masiva: un paso de deshacer y los nombres nuevos indexados de una vez
+    def begin_bulk(self):
+        self.begin()
+        self.collect_names()
+
+    def commit_bulk(self):
+        self.index_collected_names()
+        self.commit()
+
+    def collect_names(self):
+        self.new_names = []
+        self.removed_names = []
+
+    def index_collected_names(self):
+        new_names, self.new_names = self.new_names, None
+        removed_names, self.removed_names = self.removed_names, None
+        self.name_index.remove_many(removed_names)
+        self.name_index.add_many(new_names)
+
+    # Sumar muchos pesos de una vez (ingreso masivo) como un solo paso de deshacer
+    def add_many(self, weights, source=""):
+        suffix = f" ({source})" if source else ""
+        entries = []
+        values = [self.checked_sum(name, self.products.fixed(name, 0) + self.fixed_weight(weight)) for name, weight in weights.items()]
+        self.begin_bulk()
+        for (name, weight), value in zip(weights.items(), values):
+            self.set_fixed(name, value)
+            entries.append(self.history_entry("Ingresado", f"{name} - +{weight:.2f} lb{suffix}", name))
+        self.add_history_entries(entries)
+        self.commit_bulk()
+        return list(weights)
+
+    # Reemplazar la lista por {nombre: peso}
+    def replace(self, imported_products, source=""):
+        values = [self.fixed_weight(weight) for weight in imported_products.values()]
+        self.begin_bulk()
+        removed = [name for name in self.products if name not in imported_products]
+        for name in removed:
+            self.remove_product(name)
+        for name, value in zip(imported_products, values):
+            self.set_fixed(name, value)
+        self.add_to_history("Importado", f"Lista reemplazada desde {source}" if source else "Lista reemplazada")
+        self.commit_bulk()
+        return removed + list(imported_products)
+
+    # Sumar {nombre: peso} a la lista; devuelve también los nombres que ya existían
+    def merge(self, imported_products, source=""):
+        existing = [name for name in imported_products if name in self.products]
+        values = [self.checked_sum(name, self.products.fixed(name, 0) + self.fixed_weight(weight))
+                  for name, weight in imported_products.items()]
+        self.begin_bulk()
+        for name, value in zip(imported_products, values):
+            self.set_fixed(name, value)
+        self.add_to_history("Combinado", f"{len(imported_products)} productos desde {source}" if source else f"{len(imported_products)} productos")
+        self.commit_bulk()
+        return list(imported_products), existing
+
+    # Aplicar diferencias de una conciliación (reconcile.Difference): a cada producto se
+    # le suma derecha - izquierda; si queda en 0 o menos se elimina. Un paso de deshacer
+    def apply_differences(self, differences, source=""):
+        changed = []
+        values = [self.checked_sum(difference.name, self.products.fixed(difference.name, 0) + difference.delta)
+                  for difference in differences]
+        self.begin_bulk()
+        for difference, value in zip(differences, values):
+            if value > 0:
+                self.set_fixed(difference.name, value)
+            elif difference.name in self.products:
+                self.remove_product(difference.name)
+            else:
+                continue
+            changed.append(difference.name)
+        self.add_to_history("Conciliado", f"{len(changed)} productos con {source}" if source else f"{len(changed)} productos")
+        self.commit_bulk()
+        return changed
+
+    # Exportar a CSV, XLSX, JSON Lines o PDF (export.py). export_table() toma la copia
+    # del inventario o prepara la lectura del historial (hilo de la interfaz) y sus filas
+    # se escriben con write_table(), que puede correr en otro hilo.
+    # history_filter: date_from, date_to, action, product
+    def export_table(self, history=False, order=None, product_filter=None, unit=UNIT_LB, **history_filter):
+        from export import inventory_table, history_table, ORDER_NAME
+        if history:
+            return history_table(self.history_log, **history_filter)
+        return inventory_table(self.products.frozen(), order or ORDER_NAME, product_filter, unit)
+
+    def export(self, file_path, export_format=None, progress=None, cancelled=None, **options):
+        from export import write_table
+        write_table(file_path, self.export_table(**options), export_format, progress, cancelled)
+
+    # Exportar / importar PDF (reportlab y PyPDF2 solo se cargan al usarlos)
+    def export_pdf(self, file_path, progress=None, cancelled=None):
+        from export import FORMAT_PDF
+        self.export(file_path, FORMAT_PDF, progress, cancelled)
+
+    def import_pdf(self, file_path, merge=False):
+        from pdf_import import read_pdf_products
+        imported_products = read_pdf_products(file_path)
+        if not imported_products:
+            raise ValueError("No se encontraron productos válidos en el PDF.")
+        source = os.path.basename(file_path)
+        if merge:
+            return self.merge(imported_products, source)[0]
+        return self.replace(imported_products, source)
+
+# Núcleo con el almacenamiento elegido al arrancar: archivos JSON (por defecto) o una
+# base SQLite que la primera vez importa la sesión y el historial en JSON
+def open_ledger(storage=STORAGE_JSON, database_file=None, session_file=SESSION_FILE, history_file=HISTORY_FILE,
+                legacy_history_file=LEGACY_HISTORY_FILE):
+    if storage == STORAGE_JSON:
+        return ProductLedger(session_file, history_file, legacy_history_file)
+    if storage != STORAGE_SQLITE:
+        raise ValueError(f"Almacenamiento desconocido: {storage}")
+    from sqlite_store import Database, SqliteSessionStore, SqliteHistoryLog, migrate_json, DATABASE_FILE
+    database = Database(database_file or DATABASE_FILE)
+    session_store = SqliteSessionStore(database)
+    history_log = SqliteHistoryLog(database)
+    migrate_json(database, session_store, history_log, session_file, history_file, legacy_history_file)
+    return ProductLedger(session_store=session_store, history_log=history_log, rollups_file=rollups_path_for(database.path))
@@ -0,0 +1,150 @@
+import json
+import os
+import zlib
+from datetime import datetime
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFDictionary, PDFName, PDFStream, PDFString
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from pdf_import import PAYLOAD_NAME, PAYLOAD_FORMAT
+from export import ExportCancelled
+from totals import to_fixed, from_fixed
+
+# Exportación del inventario a PDF en formato de tabla de varias columnas.
+# Las filas llegan ordenadas desde un iterable y se dibujan página a página: de filas
+# solo se guarda la página actual, pero el canvas de reportlab conserva el contenido
+# (comprimido) de todas las páginas hasta save(), y los datos adjuntos comprimidos
+# también quedan en memoria, así que la memoria crece con el inventario: unos 24 MB
+# para 100k productos (benchmarks.py, exportar_pdf). Cada página lleva encabezado,
+# subtotal de la página y total acumulado, sumados en milésimas de libra como el resto
+# de los totales; la última, el total general.
+# Además se adjunta al PDF un archivo PAYLOAD_NAME (JSON Lines comprimido, una línea
+# [nombre, peso] por producto) para que la importación no dependa del texto dibujado.
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 36
+COLUMNS = 2
+COLUMN_GAP = 18
+ROW_HEIGHT = 14
+FONT = "Helvetica"
+FONT_BOLD = "Helvetica-Bold"
+FONT_SIZE = 9
+HEADER_HEIGHT = 62
+FOOTER_HEIGHT = 40
+WEIGHT_WIDTH = 70
+PROGRESS_EVERY = 500
+PAYLOAD_VERSION = 1
+
+COLUMN_WIDTH = (PAGE_WIDTH - 2 * MARGIN - (COLUMNS - 1) * COLUMN_GAP) / COLUMNS
+ROWS_PER_COLUMN = int((PAGE_HEIGHT - 2 * MARGIN - HEADER_HEIGHT - FOOTER_HEIGHT) // ROW_HEIGHT)
+ROWS_PER_PAGE = ROWS_PER_COLUMN * COLUMNS
+
+def fit_text(text, width, font=FONT, size=FONT_SIZE):
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + "…", font, size) > width:
+        text = text[:-1]
+    return text + "…"
+
+# Datos adjuntos: se comprimen a medida que llegan las filas
+class PayloadWriter:
+    def __init__(self, row_count):
+        self.compressor = zlib.compressobj()
+        self.chunks = []
+        self.write({"formato": PAYLOAD_FORMAT, "version": PAYLOAD_VERSION, "productos": row_count})
+
+    def write(self, value):
+        line = json.dumps(value, ensure_ascii=False) + "\n"
+        self.chunks.append(self.compressor.compress(line.encode("utf-8")))
+
+    def add(self, name, weight):
+        self.write([name, weight])
+
+    # Adjuntar como archivo incrustado (/Names /EmbeddedFiles del catálogo)
+    def embed(self, pdf):
+        self.chunks.append(self.compressor.flush())
+        stream = PDFStream(
+            PDFDictionary({"Type": PDFName("EmbeddedFile"), "Filter": PDFName("FlateDecode")}),
+            b"".join(self.chunks),
+        )
+        document = pdf._doc
+        filespec = PDFDictionary({
+            "Type": PDFName("Filespec"),
+            "F": PDFString(PAYLOAD_NAME),
+            "UF": PDFString(PAYLOAD_NAME),
+            "EF": PDFDictionary({"F": document.Reference(stream)}),
+        })
+        files = PDFDictionary({"Names": PDFArray([PDFString(PAYLOAD_NAME), document.Reference(filespec)])})
+        document.Catalog.Names = PDFDictionary({"EmbeddedFiles": files})
+
+def draw_page(pdf, rows, page_number, total_pages, running_total, title, created):
+    top = PAGE_HEIGHT - MARGIN
+    pdf.setFont(FONT_BOLD, 14)
+    pdf.drawString(MARGIN, top - 14, title)
+    pdf.setFont(FONT, FONT_SIZE)
+    pdf.drawRightString(PAGE_WIDTH - MARGIN, top - 14, f"{created} - Página {page_number} de {total_pages}")
+
+    heading_y = top - HEADER_HEIGHT + ROW_HEIGHT + 4
+    pdf.setFont(FONT_BOLD, FONT_SIZE)
+    for column in range(COLUMNS):
+        x = MARGIN + column * (COLUMN_WIDTH + COLUMN_GAP)
+        pdf.drawString(x, heading_y, "Producto")
+        pdf.drawRightString(x + COLUMN_WIDTH, heading_y, "Peso Total")
+        pdf.line(x, heading_y - 4, x + COLUMN_WIDTH, heading_y - 4)
+
+    pdf.setFont(FONT, FONT_SIZE)
+    page_total = 0
+    for position, (name, weight) in enumerate(rows):
+        column, row = divmod(position, ROWS_PER_COLUMN)
+        x = MARGIN + column * (COLUMN_WIDTH + COLUMN_GAP)
+        y = heading_y - (row + 1) * ROW_HEIGHT - 2
+        pdf.drawString(x, y, fit_text(name, COLUMN_WIDTH - WEIGHT_WIDTH - 6))
+        pdf.drawRightString(x + COLUMN_WIDTH, y, f"{weight:.2f} lb")
+        page_total += to_fixed(weight)
+
+    # Subtotal y acumulado en milésimas
+    running_total += page_total
+    footer_y = MARGIN + FOOTER_HEIGHT - 14
+    pdf.line(MARGIN, footer_y + 12, PAGE_WIDTH - MARGIN, footer_y + 12)
+    pdf.drawString(MARGIN, footer_y, f"Subtotal página: {from_fixed(page_total):.2f} lb")
+    pdf.drawRightString(PAGE_WIDTH - MARGIN, footer_y, f"Acumulado: {from_fixed(running_total):.2f} lb")
+    return running_total
+
+# Escribir el PDF; progress(hechas, total) se llama cada PROGRESS_EVERY filas y
+# cancelled() se consulta entre páginas (lanza ExportCancelled y borra el archivo)
+def write_inventory_pdf(file_path, rows, row_count, progress=None, cancelled=None, title="Lista de Productos"):
+    total_pages = max(1, -(-row_count // ROWS_PER_PAGE))
+    created = datetime.now().strftime("%Y-%m-%d %H:%M")
+    pdf = canvas.Canvas(file_path, pagesize=letter, pageCompression=1)
+    pdf.setTitle(title)
+    running_total = 0
+    page_rows = []
+    page_number = 0
+    done = 0
+    payload = PayloadWriter(row_count)
+    try:
+        for row in rows:
+            if len(page_rows) == ROWS_PER_PAGE:
+                if cancelled is not None and cancelled():
+                    raise ExportCancelled()
+                page_number += 1
+                running_total = draw_page(pdf, page_rows, page_number, total_pages, running_total, title, created)
+                page_rows = []
+                pdf.showPage()
+            page_rows.append(row)
+            payload.add(*row)
+            done += 1
+            if progress is not None and done % PROGRESS_EVERY == 0:
+                progress(done, row_count)
+        page_number += 1
+        running_total = draw_page(pdf, page_rows, page_number, total_pages, running_total, title, created)
+        pdf.setFont(FONT_BOLD, 11)
+        pdf.drawString(MARGIN, MARGIN, f"Total general: {from_fixed(running_total):.2f} lb ({done} productos)")
+        payload.embed(pdf)
+        pdf.save()
+    except ExportCancelled:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    if progress is not None:
+        progress(done, row_count)
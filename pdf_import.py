@@ -0,0 +1,112 @@
+import json
+import re
+import zlib
+
+# Lectura de productos desde un PDF.
+# Los PDF exportados por la aplicación llevan adjunto un JSON Lines comprimido
+# (PAYLOAD_NAME) con los nombres y pesos exactos: se lee de una vez sin recorrer las
+# páginas. Para PDF ajenos (o anteriores a ese adjunto) se extrae el texto página a
+# página: formato de tabla (nombre y "peso lb" en líneas separadas) o formato
+# antiguo "nombre: peso lb".
+
+PAYLOAD_NAME = "fda_productos.jsonl"
+PAYLOAD_FORMAT = "fda-productos"
+
+PDF_WEIGHT_LINE = re.compile(r"^(-?\d+(?:\.\d+)?)\s*lb$")
+PDF_LABELS = ("Producto", "Peso Total", "Lista de Productos")
+PDF_FOOTERS = ("Subtotal página:", "Acumulado:", "Total general:")
+
+def parse_pdf_lines(lines, imported_products):
+    pending_name = None
+    for line in lines:
+        line = line.strip()
+        if not line or line in PDF_LABELS or line.startswith(PDF_FOOTERS):
+            pending_name = None
+            continue
+        match = PDF_WEIGHT_LINE.match(line)
+        if match:
+            if pending_name is not None:
+                imported_products[pending_name] = float(match.group(1))
+            pending_name = None
+        elif ":" in line and line.endswith("lb"):
+            name, _, weight_text = line.rpartition(":")
+            try:
+                imported_products[name.strip()] = float(weight_text.replace("lb", "").strip())
+            except ValueError:
+                pass
+            pending_name = None
+        else:
+            pending_name = line
+
+# Datos del adjunto PAYLOAD_NAME, o None si el PDF no lo trae
+def read_payload_bytes(reader):
+    try:
+        names = reader.trailer["/Root"]["/Names"]["/EmbeddedFiles"]["/Names"]
+    except (KeyError, TypeError):
+        return None
+    for position in range(0, len(names) - 1, 2):
+        if names[position] != PAYLOAD_NAME:
+            continue
+        stream = names[position + 1].get_object()["/EF"]["/F"].get_object()
+        return stream.get_data()
+    return None
+
+def parse_payload(data):
+    lines = data.decode("utf-8").splitlines()
+    if not lines:
+        return None
+    header = json.loads(lines[0])
+    if not isinstance(header, dict) or header.get("formato") != PAYLOAD_FORMAT:
+        return None
+    imported_products = {}
+    for line in lines[1:]:
+        name, weight = json.loads(line)
+        imported_products[name] = float(weight)
+    return imported_products
+
+def read_payload(reader):
+    try:
+        data = read_payload_bytes(reader)
+        return parse_payload(data) if data else None
+    except (ValueError, zlib.error):
+        # Adjunto dañado: se recurre al texto de las páginas
+        return None
+
+def read_pdf_text(reader):
+    imported_products = {}
+    for page in reader.pages:
+        text = page.extract_text()
+        if not text:
+            continue
+        parse_pdf_lines(text.split("\n"), imported_products)
+    return imported_products
+
+# Productos de un PDF: {nombre: peso}
+def read_pdf_products(file_path):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(file_path)
+    imported_products = read_payload(reader)
+    if imported_products is None:
+        imported_products = read_pdf_text(reader)
+    return imported_products
+
+# Tareas para la importación por lotes (se ejecutan en otros procesos).
+# scan_pdf devuelve ("productos", {nombre: peso}) si el PDF trae el adjunto, o
+# ("paginas", número de páginas) para que el texto se extraiga por tramos en paralelo.
+def scan_pdf(file_path):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(file_path)
+    imported_products = read_payload(reader)
+    if imported_products is not None:
+        return "productos", imported_products
+    return "paginas", len(reader.pages)
+
+def read_pdf_pages(file_path, start, stop):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(file_path)
+    imported_products = {}
+    for number in range(start, stop):
+        text = reader.pages[number].extract_text()
+        if text:
+            parse_pdf_lines(text.split("\n"), imported_products)
+    return imported_products
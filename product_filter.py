@@ -0,0 +1,128 @@
+import bisect
+from autocomplete import normalize
+from totals import to_fixed
+
+# Búsqueda y filtrado de la tabla de productos (sin interfaz gráfica).
+# ProductView guarda la lista ordenada de los nombres que cumplen el filtro actual;
+# la tabla solo dibuja una ventana de esa lista. Los filtros usan índices ya hechos:
+# prefijo -> tramo de la lista ordenada de NameIndex, texto contenido -> trigramas de
+# NameIndex, rango de peso -> WeightIndex. Los cambios sueltos se aplican con bisect
+# sin volver a filtrar todo.
+
+MODE_CONTAINS = "contiene"
+MODE_PREFIX = "empieza"
+REFRESH_THRESHOLD = 500
+
+# Pesos ordenados para filtrar por rango; se reordena solo cuando se consulta tras cambios
+class WeightIndex:
+    def __init__(self, store):
+        self.store = store
+        self.values = []
+        self.names = []
+        self.dirty = True
+
+    def invalidate(self):
+        self.dirty = True
+
+    def between(self, low=None, high=None):
+        if self.dirty:
+            self.names, self.values = self.store.by_weight()
+            self.dirty = False
+        start = bisect.bisect_left(self.values, to_fixed(low)) if low is not None else 0
+        end = bisect.bisect_right(self.values, to_fixed(high)) if high is not None else len(self.values)
+        return self.names[start:end]
+
+class ProductFilter:
+    def __init__(self, text="", mode=MODE_CONTAINS, min_weight=None, max_weight=None):
+        self.text = normalize(text)
+        self.mode = mode
+        self.min_weight = min_weight
+        self.max_weight = max_weight
+
+    @property
+    def active(self):
+        return bool(self.text) or self.min_weight is not None or self.max_weight is not None
+
+    def matches(self, name, weight):
+        if self.text:
+            key = normalize(name)
+            if self.mode == MODE_PREFIX and not key.startswith(self.text):
+                return False
+            if self.mode != MODE_PREFIX and self.text not in key:
+                return False
+        if self.min_weight is not None and to_fixed(weight) < to_fixed(self.min_weight):
+            return False
+        if self.max_weight is not None and to_fixed(weight) > to_fixed(self.max_weight):
+            return False
+        return True
+
+class ProductView:
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.filter = ProductFilter()
+        self.keys = []
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def set_filter(self, product_filter):
+        self.filter = product_filter
+        self.refresh()
+
+    # Volver a calcular la lista completa (carga, importación, cambio de filtro)
+    def refresh(self):
+        name_index = self.ledger.name_index
+        product_filter = self.filter
+        keys, names = name_index.keys, name_index.names
+        selected = None
+        if product_filter.text and product_filter.mode == MODE_PREFIX:
+            start, end = name_index.prefix_range(product_filter.text)
+            keys, names = keys[start:end], names[start:end]
+        elif product_filter.text:
+            selected = name_index.contains(product_filter.text)
+        if product_filter.min_weight is not None or product_filter.max_weight is not None:
+            in_range = set(self.ledger.weight_index.between(product_filter.min_weight, product_filter.max_weight))
+            selected = in_range if selected is None else selected & in_range
+        if selected is None:
+            self.keys, self.names = list(keys), list(names)
+        elif len(selected) * 8 < len(names):
+            # Pocos resultados: se comprueban y ordenan aparte
+            products = self.ledger.products
+            pairs = sorted((normalize(name), name) for name in selected if product_filter.matches(name, products[name]))
+            self.keys = [key for key, _ in pairs]
+            self.names = [name for _, name in pairs]
+        else:
+            # Muchos resultados: se recorre la lista ya ordenada
+            pairs = [(key, name) for key, name in zip(keys, names) if name in selected]
+            self.keys = [key for key, _ in pairs]
+            self.names = [name for _, name in pairs]
+
+    def position(self, name):
+        key = normalize(name)
+        position = bisect.bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.names[position] == name:
+                return position, True
+            position += 1
+        return position, False
+
+    # Aplicar cambios de productos sueltos; si son muchos se recalcula todo
+    def update(self, changed_products):
+        changed_products = set(changed_products)
+        if len(changed_products) > REFRESH_THRESHOLD:
+            self.refresh()
+            return
+        products = self.ledger.products
+        for name in changed_products:
+            position, listed = self.position(name)
+            visible = name in products and self.filter.matches(name, products[name])
+            if listed and not visible:
+                del self.keys[position]
+                del self.names[position]
+            elif visible and not listed:
+                self.keys.insert(position, normalize(name))
+                self.names.insert(position, name)
+
+    def window(self, start, count):
+        return self.names[start:start + count]
@@ -0,0 +1,153 @@
+from array import array
+from collections.abc import MutableMapping
+from operator import itemgetter
+from totals import to_fixed, from_fixed
+
+# Inventario compacto: cada nombre se interna una vez con un id entero y los pesos se
+# guardan por id en un array('q') de milésimas de libra (como TotalsLedger), sin un
+# objeto float por producto. Al redondear cada peso a milésimas al guardarlo, las
+# sumas repetidas no acumulan error y el total es exacto.
+#
+# Se usa como un diccionario {nombre: peso en libras} (lo que espera el resto del
+# código), y además ofrece los pesos en milésimas y operaciones que recorren los
+# arrays de una pasada (orden para exportar, orden por peso, copia a dict). El total
+# se lleva por diferencias en cada cambio.
+# Los ids de productos eliminados se reutilizan; cuando quedan muchos huecos se
+# compactan los arrays.
+
+COMPACT_MIN_FREE = 1024
+
+class ProductStore(MutableMapping):
+    def __init__(self, products=None):
+        self.ids = {}
+        self.names = []
+        self.weights = array("q")
+        self.free = []
+        self.total_fixed = 0
+        if products:
+            self.update_fixed((name, to_fixed(weight)) for name, weight in products.items())
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __getitem__(self, name):
+        return from_fixed(self.weights[self.ids[name]])
+
+    def __setitem__(self, name, weight):
+        self.set_fixed(name, to_fixed(weight))
+
+    def __delitem__(self, name):
+        self.remove(name)
+
+    def get(self, name, default=None):
+        number = self.ids.get(name)
+        return default if number is None else from_fixed(self.weights[number])
+
+    def items(self):
+        return zip(self.ids, map(from_fixed, map(self.weights.__getitem__, self.ids.values())))
+
+    # Pesos en milésimas
+    def fixed(self, name, default=None):
+        number = self.ids.get(name)
+        return default if number is None else self.weights[number]
+
+    def fixed_items(self):
+        return zip(self.ids, map(self.weights.__getitem__, self.ids.values()))
+
+    def set_fixed(self, name, value):
+        number = self.ids.get(name)
+        if number is None:
+            # El array primero: si el valor no cabe no queda nada a medias
+            if self.free:
+                number = self.free[-1]
+                self.weights[number] = value
+                self.free.pop()
+                self.names[number] = name
+            else:
+                number = len(self.names)
+                self.weights.append(value)
+                self.names.append(name)
+            self.ids[name] = number
+            self.total_fixed += value
+        else:
+            old_value = self.weights[number]
+            self.weights[number] = value
+            self.total_fixed += value - old_value
+
+    def update_fixed(self, pairs):
+        for name, value in pairs:
+            self.set_fixed(name, value)
+
+    def remove(self, name):
+        number = self.ids.pop(name)
+        value = self.weights[number]
+        self.total_fixed -= value
+        self.names[number] = None
+        self.weights[number] = 0
+        self.free.append(number)
+        if len(self.free) >= COMPACT_MIN_FREE and len(self.free) * 2 > len(self.names):
+            self.compact()
+        return from_fixed(value)
+
+    def pop(self, name, *default):
+        if name not in self.ids:
+            if default:
+                return default[0]
+            raise KeyError(name)
+        return self.remove(name)
+
+    def clear(self):
+        self.ids.clear()
+        self.names.clear()
+        self.weights = array("q")
+        self.free.clear()
+        self.total_fixed = 0
+
+    # Reasignar ids seguidos sin huecos
+    def compact(self):
+        numbers = list(self.ids.values())
+        self.names = [self.names[number] for number in numbers]
+        self.weights = array("q", map(self.weights.__getitem__, numbers))
+        self.ids = dict(zip(self.names, range(len(self.names))))
+        self.free.clear()
+
+    @property
+    def total(self):
+        return from_fixed(self.total_fixed)
+
+    # [(nombre, peso)] ordenado por nombre (exportación, copia inmutable)
+    def sorted_items(self):
+        pairs = sorted(self.fixed_items(), key=itemgetter(0))
+        return [(name, from_fixed(value)) for name, value in pairs]
+
+    # Nombres y milésimas ordenados por peso (filtro por rango)
+    def by_weight(self):
+        numbers = sorted(self.ids.values(), key=self.weights.__getitem__)
+        return [self.names[number] for number in numbers], array("q", map(self.weights.__getitem__, numbers))
+
+    def to_dict(self):
+        return dict(self.items())
+
+    # Copia inmutable para otro hilo (guardar la sesión, conciliar): solo se copian los dos arrays
+    def frozen(self):
+        return FrozenProducts(self.names[:], self.weights[:])
+
+class FrozenProducts:
+    def __init__(self, names, weights):
+        self.names = names
+        self.weights = weights
+
+    def fixed_items(self):
+        for name, value in zip(self.names, self.weights):
+            if name is not None:
+                yield name, value
+
+    def items(self):
+        for name, value in self.fixed_items():
+            yield name, from_fixed(value)
@@ -0,0 +1,138 @@
+import os
+from operator import attrgetter
+from totals import to_fixed, from_fixed
+from session_store import SessionStore
+
+# Conciliación de dos inventarios (sin interfaz gráfica).
+# Cada lado puede ser la sesión abierta ("actual"), otra sesión JSON (con su diario,
+# p. ej. el productos_sesion.json de otra estación), un PDF exportado o una sesión
+# guardada en la base SQLite ("sesion:NOMBRE"). Los pesos se comparan en milésimas de
+# libra con una sola pasada de hash join: se recorre el lado izquierdo buscando cada
+# nombre en el diccionario del derecho, y los que solo están a la derecha salen de una
+# diferencia de conjuntos. Los cambios dentro de la tolerancia (absoluta en libras y/o
+# relativa al peso de la izquierda) se cuentan pero no se listan.
+#
+# Aplicar la conciliación suma a la sesión abierta la diferencia (derecha - izquierda)
+# de cada producto, como un solo paso de deshacer; si la izquierda es la sesión actual
+# el resultado es la derecha.
+
+CURRENT = "actual"
+NAMED_PREFIX = "sesion:"
+ADDED = "añadido"
+REMOVED = "eliminado"
+CHANGED = "cambiado"
+KINDS = (ADDED, REMOVED, CHANGED)
+
+class Difference:
+    __slots__ = ("name", "kind", "left", "right")
+
+    def __init__(self, name, kind, left, right):
+        self.name = name
+        self.kind = kind
+        self.left = left
+        self.right = right
+
+    # En milésimas
+    @property
+    def delta(self):
+        return self.right - self.left
+
+    @property
+    def left_weight(self):
+        return from_fixed(self.left)
+
+    @property
+    def right_weight(self):
+        return from_fixed(self.right)
+
+    @property
+    def delta_weight(self):
+        return from_fixed(self.right - self.left)
+
+class Reconciliation:
+    def __init__(self, differences, unchanged, tolerated):
+        self.differences = differences
+        self.unchanged = unchanged
+        self.tolerated = tolerated
+        self.counts = dict.fromkeys(KINDS, 0)
+        for difference in differences:
+            self.counts[difference.kind] += 1
+
+    def __len__(self):
+        return len(self.differences)
+
+    def only(self, kinds=None):
+        if not kinds:
+            return self.differences
+        return [difference for difference in self.differences if difference.kind in kinds]
+
+    @property
+    def total_delta(self):
+        return from_fixed(sum(difference.right - difference.left for difference in self.differences))
+
+    def summary(self):
+        return (f"{self.counts[ADDED]} añadidos, {self.counts[REMOVED]} eliminados, "
+                f"{self.counts[CHANGED]} cambiados, {self.unchanged} iguales"
+                + (f", {self.tolerated} dentro de la tolerancia" if self.tolerated else ""))
+
+def fixed_weights(products):
+    return {name: to_fixed(weight) for name, weight in products.items()}
+
+# {nombre: milésimas} de un archivo: PDF exportado o sesión JSON (instantánea + diario)
+def read_file(path):
+    if not os.path.exists(path):
+        raise ValueError(f"No existe el archivo {path}.")
+    if path.lower().endswith(".pdf"):
+        from pdf_import import read_pdf_products
+        return fixed_weights(read_pdf_products(path))
+    try:
+        return fixed_weights(SessionStore(path).load())
+    except (ValueError, AttributeError, KeyError, TypeError):
+        raise ValueError(f"{os.path.basename(path)} no es una sesión válida.")
+
+# Preparar la lectura de una fuente en el hilo de la interfaz: lo que depende del
+# inventario abierto o de la base se toma ahora; devuelve la función que lee el resto
+# (puede correr en otro hilo) y da {nombre: milésimas}
+def prepare_source(source, ledger):
+    source = source.strip()
+    if not source:
+        raise ValueError("Falta indicar qué inventario comparar.")
+    if source == CURRENT:
+        frozen = ledger.products.frozen()
+        return lambda: dict(frozen.fixed_items())
+    if source.startswith(NAMED_PREFIX):
+        if not hasattr(ledger.session_store, "load_named"):
+            raise ValueError("Las sesiones con nombre requieren --almacen sqlite.")
+        products = fixed_weights(ledger.session_store.load_named(source[len(NAMED_PREFIX):]))
+        return lambda: products
+    return lambda: read_file(source)
+
+def source_label(source):
+    source = source.strip()
+    if source == CURRENT:
+        return "sesión actual"
+    if source.startswith(NAMED_PREFIX):
+        return f"sesión {source[len(NAMED_PREFIX):]}"
+    return os.path.basename(source)
+
+# Diferencias de right respecto de left ({nombre: milésimas}), ordenadas por nombre.
+# tolerance en libras; relative como fracción del peso de la izquierda (0.01 = 1 %)
+def compare(left, right, tolerance=0, relative=0):
+    tolerance = to_fixed(tolerance)
+    differences = []
+    unchanged = tolerated = 0
+    lookup = right.get
+    for name, value in left.items():
+        other = lookup(name)
+        if other is None:
+            differences.append(Difference(name, REMOVED, value, 0))
+        elif other == value:
+            unchanged += 1
+        elif abs(other - value) <= max(tolerance, relative * value):
+            tolerated += 1
+        else:
+            differences.append(Difference(name, CHANGED, value, other))
+    for name in right.keys() - left.keys():
+        differences.append(Difference(name, ADDED, 0, right[name]))
+    differences.sort(key=attrgetter("name"))
+    return Reconciliation(differences, unchanged, tolerated)
@@ -0,0 +1,235 @@
+import asyncio
+import queue
+import random
+import sys
+import threading
+from scale_ingest import parse_weight
+from totals import to_fixed, from_fixed, checked_fixed
+
+# Lectura de básculas conectadas (puerto serie/USB, TCP o cualquier flujo de líneas).
+# Un hilo propio corre un bucle asyncio con una tarea por dispositivo; cada línea leída
+# se convierte en una lectura (producto, peso) y va a una cola segura entre hilos. La
+# interfaz vacía la cola con root.after cada DEVICE_FRAME_MS y suma todas las lecturas
+# del intervalo en un solo ProductLedger.add_many, así que una ráfaga de cientos de
+# lecturas por segundo produce una actualización y un refresco por intervalo.
+#
+# Fuentes (texto de --bascula o del diálogo):
+#   simulada[:lecturas_por_segundo]   báscula simulada (pruebas y demostraciones)
+#   tcp:host:puerto                   báscula en red o conversor serie-TCP
+#   serial:/dev/ttyUSB0[:baudios]     puerto serie (requiere pyserial)
+#   ruta o -                          archivo, FIFO o entrada estándar
+#
+# Cada línea es "producto<sep>peso" (sep: tabulador, ;, |, coma o espacio) o solo el
+# peso ("2.50 lb"); con decimales con coma hay que separar con ; o tabulador. Las
+# lecturas sin nombre se asignan al producto escrito en la ventana al vaciar la cola.
+
+DEVICE_FRAME_MS = 100
+RECONNECT_DELAY = 2.0
+DEFAULT_BAUDRATE = 9600
+SIMULATED_RATE = 200
+SIMULATED_PRODUCTS = ("queso fresco", "leche entera", "pollo", "carne molida", "tomate", "manzana", "arroz", "frijol")
+ERRORS_KEPT = 20
+
+# (nombre o None, peso) de una línea de la báscula
+def parse_reading(line):
+    line = line.strip()
+    if not line:
+        raise ValueError("línea vacía")
+    try:
+        return None, parse_weight(line)
+    except ValueError:
+        pass
+    for separator in ("\t", ";", "|", ","):
+        if separator in line:
+            name, _, weight = line.rpartition(separator)
+            break
+    else:
+        name, _, weight = line.rpartition(" ")
+    name = name.strip()
+    if not name:
+        raise ValueError(f"lectura no válida: {line[:40]}")
+    return name, parse_weight(weight)
+
+class SimulatedScale:
+    def __init__(self, rate=SIMULATED_RATE, products=SIMULATED_PRODUCTS, seed=None):
+        self.rate = rate
+        self.products = products
+        self.random = random.Random(seed)
+
+    async def lines(self):
+        interval = 1 / self.rate
+        while True:
+            await asyncio.sleep(interval)
+            yield f"{self.random.choice(self.products)},{self.random.uniform(0.1, 5):.2f}"
+
+class TcpScale:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    async def lines(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                yield line.decode("utf-8", errors="replace")
+        finally:
+            writer.close()
+
+# Archivos, FIFOs y puertos serie se leen con llamadas bloqueantes en un hilo auxiliar
+# (daemon, para que una lectura que no termina no impida cerrar la aplicación) que pasa
+# las líneas al bucle
+class StreamScale:
+    def __init__(self, path):
+        self.path = path
+
+    def open(self):
+        if self.path == "-":
+            return sys.stdin
+        return open(self.path, "r", encoding="utf-8", errors="replace")
+
+    def pump(self, stream, loop, lines):
+        try:
+            while True:
+                line = stream.readline()
+                if not line:
+                    break
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            loop.call_soon_threadsafe(lines.put_nowait, None)
+        except (OSError, ValueError, RuntimeError) as e:
+            # RuntimeError: el bucle ya se cerró
+            try:
+                loop.call_soon_threadsafe(lines.put_nowait, e)
+            except RuntimeError:
+                pass
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    async def lines(self):
+        loop = asyncio.get_running_loop()
+        stream = self.open()
+        lines = asyncio.Queue()
+        threading.Thread(target=self.pump, args=(stream, loop, lines), daemon=True).start()
+        while True:
+            line = await lines.get()
+            if line is None:
+                return
+            if isinstance(line, Exception):
+                raise line
+            yield line if isinstance(line, str) else line.decode("utf-8", errors="replace")
+
+class SerialScale(StreamScale):
+    def __init__(self, path, baudrate=DEFAULT_BAUDRATE):
+        super().__init__(path)
+        self.baudrate = baudrate
+
+    def open(self):
+        try:
+            import serial
+        except ImportError:
+            raise ValueError("Para leer puertos serie hace falta instalar pyserial.")
+        return serial.Serial(self.path, self.baudrate, timeout=None)
+
+def open_source(text):
+    kind, _, rest = text.partition(":")
+    if kind == "simulada":
+        return SimulatedScale(float(rest) if rest else SIMULATED_RATE)
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        return TcpScale(host or "127.0.0.1", int(port))
+    if kind == "serial":
+        path, _, baudrate = rest.partition(":")
+        return SerialScale(path, int(baudrate) if baudrate else DEFAULT_BAUDRATE)
+    return StreamScale(text)
+
+class DeviceReader:
+    def __init__(self, sources):
+        self.sources = list(sources)
+        self.readings = queue.SimpleQueue()
+        self.errors = []
+        self.errors_lock = threading.Lock()
+        self.rejected = 0
+        self.unnamed = 0
+        self.loop = None
+        self.stop_event = None
+        self.thread = None
+
+    def start(self):
+        devices = [(text, open_source(text)) for text in self.sources]
+        self.thread = threading.Thread(target=asyncio.run, args=(self.run(devices),), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+        if self.thread is not None:
+            self.thread.join(timeout=RECONNECT_DELAY)
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    async def run(self, devices):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        tasks = [asyncio.create_task(self.read_device(text, device)) for text, device in devices]
+        await self.stop_event.wait()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def report(self, message):
+        with self.errors_lock:
+            self.errors.append(message)
+            del self.errors[:-ERRORS_KEPT]
+
+    # Una tarea por dispositivo; si la conexión se cae se reintenta (salvo archivos,
+    # que terminan al llegar al final)
+    async def read_device(self, text, device):
+        while True:
+            try:
+                async for line in device.lines():
+                    try:
+                        name, weight = parse_reading(line)
+                    except ValueError:
+                        self.rejected += 1
+                        continue
+                    # Solo pesos positivos que quepan en milésimas (ni "inf" ni 1e30)
+                    if weight > 0 and checked_fixed(weight) is not None:
+                        self.readings.put((name, weight))
+                    else:
+                        self.rejected += 1
+                if isinstance(device, StreamScale) and not isinstance(device, SerialScale):
+                    return
+            except asyncio.CancelledError:
+                raise
+            except (OSError, ValueError) as e:
+                self.report(f"{text}: {e}")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    # Sumar todo lo leído desde la última vez (hilo de la interfaz): devuelve
+    # ({nombre: peso}, número de lecturas); las lecturas sin nombre van a default_name
+    # o se descartan si no hay
+    def drain(self, default_name=None):
+        totals = {}
+        count = 0
+        while True:
+            try:
+                name, weight = self.readings.get_nowait()
+            except queue.Empty:
+                break
+            name = name or default_name
+            if not name:
+                self.unnamed += 1
+                continue
+            totals[name] = totals.get(name, 0) + to_fixed(weight)
+            count += 1
+        return {name: from_fixed(value) for name, value in totals.items()}, count
+
+    def take_errors(self):
+        with self.errors_lock:
+            errors, self.errors = self.errors, []
+        return errors
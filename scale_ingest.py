@@ -0,0 +1,152 @@
+import csv
+import os
+from totals import to_fixed, from_fixed, checked_fixed
+
+# Ingreso masivo de registros de báscula (CSV/TSV).
+# El archivo se lee en flujo, por bloques de CHUNK_ROWS filas; cada bloque se suma
+# primero en un diccionario local y luego se vuelca al total por producto, así que la
+# memoria depende del número de productos distintos y no del de lecturas. Las sumas
+# se hacen en milésimas de libra enteras (como TotalsLedger) para no acumular error.
+# Las filas inválidas no interrumpen el ingreso: se escriben en un informe de
+# rechazos (CSV con archivo, línea, motivo y contenido) y se cuentan.
+
+CHUNK_ROWS = 5000
+SNIFF_BYTES = 64 * 1024
+NAME_COLUMNS = ("producto", "nombre", "product", "name", "articulo", "artículo")
+WEIGHT_COLUMNS = ("peso", "weight", "lb", "libras", "peso (lb)")
+REJECTS_SHOWN = 20
+
+class IngestResult:
+    def __init__(self):
+        self.weights = {}
+        self.rows = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.samples = []
+        self.files = []
+
+    # {nombre: peso en libras} listo para ProductLedger.add_many
+    def products(self):
+        return {name: from_fixed(value) for name, value in self.weights.items()}
+
+    def reject(self, file_name, line_number, reason, row, report):
+        self.rejected += 1
+        if len(self.samples) < REJECTS_SHOWN:
+            self.samples.append((file_name, line_number, reason))
+        if report is not None:
+            report.writerow([file_name, line_number, reason, *row])
+
+# Peso en libras de una lectura; ValueError si no es un número finito que quepa en
+# milésimas (ProductStore), así "inf" o "1e30" son filas inválidas y no un error
+def parse_weight(text):
+    text = text.strip().lower().replace("lb", "").strip()
+    if "," in text and "." not in text:
+        text = text.replace(",", ".")
+    weight = float(text)
+    if checked_fixed(weight) is None:
+        raise ValueError(f"Peso fuera de rango: {text}")
+    return weight
+
+# Delimitador (coma, punto y coma o tabulador) y columnas de nombre y peso
+def detect_layout(sample):
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel_tab if "\t" in sample else csv.excel
+    first_line = sample.splitlines()[0] if sample else ""
+    header = [cell.strip().lower() for cell in next(csv.reader([first_line], dialect), [])]
+    name_column = next((header.index(name) for name in NAME_COLUMNS if name in header), None)
+    weight_column = next((header.index(name) for name in WEIGHT_COLUMNS if name in header), None)
+    if name_column is None or weight_column is None:
+        return dialect, False, 0, 1
+    return dialect, True, name_column, weight_column
+
+def ingest_file(file_path, result, report=None, progress=None, cancelled=None):
+    file_name = os.path.basename(file_path)
+    total_bytes = os.path.getsize(file_path)
+    with open(file_path, "r", encoding="utf-8-sig", errors="replace", newline="") as file:
+        sample = file.read(SNIFF_BYTES)
+        if len(sample) == SNIFF_BYTES and "\n" in sample:
+            sample = sample[:sample.rindex("\n")]
+        file.seek(0)
+        dialect, has_header, name_column, weight_column = detect_layout(sample)
+        needed = max(name_column, weight_column)
+        read_bytes = 0
+
+        def lines():
+            nonlocal read_bytes
+            for line in file:
+                read_bytes += len(line)
+                yield line
+
+        reader = csv.reader(lines(), dialect)
+        if has_header:
+            next(reader, None)
+        chunk = {}
+        chunk_rows = 0
+        for row in reader:
+            line_number = reader.line_num
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            result.rows += 1
+            chunk_rows += 1
+            if len(row) <= needed:
+                result.reject(file_name, line_number, "Faltan columnas", row, report)
+            else:
+                name = row[name_column].strip()
+                try:
+                    weight = parse_weight(row[weight_column])
+                except ValueError:
+                    result.reject(file_name, line_number, "Peso no numérico o fuera de rango", row, report)
+                else:
+                    if not name:
+                        result.reject(file_name, line_number, "Nombre vacío", row, report)
+                    elif not weight > 0:
+                        result.reject(file_name, line_number, "Peso menor o igual a 0", row, report)
+                    else:
+                        chunk[name] = chunk.get(name, 0) + to_fixed(weight)
+                        result.accepted += 1
+            if chunk_rows >= CHUNK_ROWS:
+                merge_chunk(result.weights, chunk)
+                chunk = {}
+                chunk_rows = 0
+                if progress is not None:
+                    progress(file_name, read_bytes, total_bytes)
+                if cancelled is not None and cancelled():
+                    return False
+        merge_chunk(result.weights, chunk)
+    result.files.append(file_name)
+    if progress is not None:
+        progress(file_name, total_bytes, total_bytes)
+    return True
+
+def merge_chunk(weights, chunk):
+    for name, weight in chunk.items():
+        weights[name] = weights.get(name, 0) + weight
+
+# Ingresar varios archivos; devuelve None si se canceló
+def ingest_files(file_paths, reject_path=None, progress=None, cancelled=None):
+    result = IngestResult()
+    report_file = None
+    report = None
+    if reject_path is not None:
+        report_file = open(reject_path, "w", encoding="utf-8", newline="")
+        report = csv.writer(report_file)
+        report.writerow(["archivo", "linea", "motivo", "contenido"])
+    completed = False
+    try:
+        for file_path in file_paths:
+            if not ingest_file(file_path, result, report, progress, cancelled):
+                return None
+        completed = True
+    finally:
+        if report_file is not None:
+            report_file.close()
+            if not completed or not result.rejected:
+                os.remove(reject_path)
+    return result
+
+# Informe de rechazos junto al primer archivo: registro.csv -> registro.rechazos.csv
+def reject_path_for(file_path):
+    base, _ = os.path.splitext(file_path)
+    return base + ".rechazos.csv"
@@ -0,0 +1,177 @@
+import itertools
+import json
+import os
+
+# Persistencia de la sesión: instantánea JSON + diario de cambios (JSON Lines).
+# Los cambios de una acción se juntan en memoria y se añaden al diario con una sola
+# escritura al terminarla (sync); la compactación reescribe la instantánea
+# (archivo temporal + rename atómico) solo si hubo cambios y luego vacía el diario.
+# El diario guarda pesos absolutos, por lo que repetirlo sobre la instantánea es idempotente.
+#
+# Para escribir la instantánea en otro hilo, el diario activo se aparta primero como
+# segmento numerado (un rename) y los cambios siguientes van a un diario nuevo; la
+# instantánea se escribe después con una copia del inventario de ese momento y al
+# terminar se borran los segmentos que ya incluye. Al cargar se repiten los segmentos
+# en orden y luego el diario activo; si la escritura falló o se cortó, los segmentos
+# siguen ahí y se incluyen en la próxima compactación.
+
+SNAPSHOT_CHUNK = 10000
+
+# Escribir (nombre, peso) como un objeto JSON igual al de json.dump, por tandas y sin
+# armar antes un dict con todo el inventario
+def dump_items(items, file):
+    encode = json.encoder.encode_basestring_ascii
+    file.write("{")
+    separator = ""
+    for chunk in iter(lambda: list(itertools.islice(items, SNAPSHOT_CHUNK)), []):
+        file.write(separator + ", ".join(f"{encode(name)}: {weight!r}" for name, weight in chunk))
+        separator = ", "
+    file.write("}")
+
+def journal_path_for(snapshot_path):
+    base, _ = os.path.splitext(snapshot_path)
+    return base + ".journal.jsonl"
+
+def segment_path_for(journal_path, number):
+    base = journal_path[:-len(".jsonl")] if journal_path.endswith(".jsonl") else journal_path
+    return f"{base}.{number}.jsonl"
+
+class SessionStore:
+    def __init__(self, snapshot_path, journal_path=None):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or journal_path_for(snapshot_path)
+        self.journal_file = None
+        # Líneas del diario de la acción en curso, hasta sync()
+        self.pending = []
+        self.dirty = False
+
+    def open_journal(self):
+        if self.journal_file is None:
+            self.journal_file = open(self.journal_path, "a", encoding="utf-8")
+        return self.journal_file
+
+    # Registrar el nuevo peso de un producto (None = eliminado)
+    def record(self, name, weight):
+        self.pending.append(json.dumps({"p": name, "w": weight}, ensure_ascii=False) + "\n")
+        self.dirty = True
+
+    # Escribir al diario los cambios de la acción terminada (una escritura y un flush)
+    def sync(self):
+        if not self.pending:
+            return
+        journal = self.open_journal()
+        journal.write("".join(self.pending))
+        journal.flush()
+        self.pending = []
+
+    # Números de los segmentos apartados que quedan en disco, en orden
+    def segment_numbers(self):
+        directory = os.path.dirname(self.journal_path) or "."
+        prefix = os.path.basename(segment_path_for(self.journal_path, ""))[:-len(".jsonl")]
+        numbers = []
+        for file_name in os.listdir(directory):
+            if file_name.startswith(prefix) and file_name.endswith(".jsonl"):
+                number = file_name[len(prefix):-len(".jsonl")]
+                if number.isdigit():
+                    numbers.append(int(number))
+        return sorted(numbers)
+
+    def segments(self):
+        return [segment_path_for(self.journal_path, number) for number in self.segment_numbers()]
+
+    # Aplicar un diario a products; devuelve cuántos cambios tenía
+    @staticmethod
+    def replay(path, products):
+        replayed = 0
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Línea incompleta por un cierre inesperado
+                    continue
+                if entry["w"] is None:
+                    products.pop(entry["p"], None)
+                else:
+                    products[entry["p"]] = entry["w"]
+                replayed += 1
+        return replayed
+
+    # Reconstruir la sesión: instantánea + repetición de los segmentos y del diario.
+    # No cambia el estado del almacén (puede correr en otro hilo); devuelve también si
+    # se repitieron cambios, que loaded() marca como pendientes de compactar
+    def read(self):
+        products = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as file:
+                products = json.load(file)
+        replayed = 0
+        for path in self.segments() + [self.journal_path]:
+            if os.path.exists(path):
+                replayed += self.replay(path, products)
+        return products, replayed > 0
+
+    def load(self):
+        return self.read()[0]
+
+    # La sesión leída con read() quedó en uso (hilo de la interfaz)
+    def loaded(self, replayed):
+        if replayed:
+            self.dirty = True
+
+    # Apartar el diario activo (hilo de la interfaz); devuelve los segmentos que la
+    # próxima instantánea deja obsoletos
+    def rotate(self):
+        self.sync()
+        if self.journal_file is not None:
+            self.journal_file.close()
+            self.journal_file = None
+        numbers = self.segment_numbers()
+        if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path):
+            numbers.append(numbers[-1] + 1 if numbers else 1)
+            os.replace(self.journal_path, segment_path_for(self.journal_path, numbers[-1]))
+        return [segment_path_for(self.journal_path, number) for number in numbers]
+
+    # Escribir la instantánea de forma atómica y borrar los segmentos que incluye
+    # (puede correr en otro hilo: solo usa sus argumentos y las rutas)
+    def write_snapshot(self, products, segments):
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            dump_items(products.items(), file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        for segment in segments:
+            os.remove(segment)
+
+    # Preparar una compactación en segundo plano: aparta el diario y copia el inventario
+    # (los arrays del ProductStore) ahora; devuelve la función que escribe la instantánea, o None si no había cambios.
+    # Si la escritura falla hay que llamar a snapshot_failed()
+    def snapshot_job(self, products, force=False):
+        if not self.dirty and not force:
+            return None
+        segments = self.rotate()
+        products = products.frozen()
+        self.dirty = False
+        return lambda: self.write_snapshot(products, segments)
+
+    def snapshot_failed(self):
+        self.dirty = True
+
+    # Escribir la instantánea ahora; devuelve False si no había cambios
+    def compact(self, products, force=False):
+        write = self.snapshot_job(products, force)
+        if write is None:
+            return False
+        try:
+            write()
+        except Exception:
+            self.snapshot_failed()
+            raise
+        return True
+
+    def close(self):
+        self.sync()
+        if self.journal_file is not None:
+            self.journal_file.close()
+            self.journal_file = None
@@ -0,0 +1,324 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from session_store import SessionStore
+from history import HistoryLog
+
+# Almacenamiento alternativo en SQLite (modo WAL).
+# Una sola base con sesiones con nombre, sus productos y el historial. Cada cambio de
+# producto es un UPSERT/DELETE de una fila; ProductLedger llama a sync() al terminar
+# cada acción, así que una acción se confirma entera o no se confirma. El historial
+# se consulta con índices por fecha, acción y producto.
+#
+# SqliteSessionStore y SqliteHistoryLog tienen la misma interfaz que SessionStore y
+# HistoryLog, de modo que el núcleo y la interfaz no cambian según el almacenamiento.
+#
+# La conexión es una sola y la usan la interfaz y los trabajos en segundo plano (carga,
+# resúmenes del historial, exportación), así que todo pasa por Database con su candado:
+# las lecturas traen las filas dentro del candado (fetchone/fetchall) y nunca queda un
+# cursor a medio recorrer compartido entre hilos.
+
+DATABASE_FILE = "fda.sqlite3"
+CURRENT_SESSION = "actual"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+CREATE TABLE IF NOT EXISTS sesiones (
+    id INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL UNIQUE,
+    creada TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS productos (
+    sesion INTEGER NOT NULL REFERENCES sesiones(id) ON DELETE CASCADE,
+    nombre TEXT NOT NULL,
+    peso REAL NOT NULL,
+    PRIMARY KEY (sesion, nombre)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS historial (
+    id INTEGER PRIMARY KEY,
+    fecha TEXT NOT NULL,
+    hora TEXT NOT NULL,
+    accion TEXT NOT NULL,
+    detalles TEXT NOT NULL,
+    producto TEXT,
+    datos TEXT
+);
+CREATE INDEX IF NOT EXISTS historial_fecha ON historial (fecha);
+CREATE INDEX IF NOT EXISTS historial_accion ON historial (accion, fecha);
+CREATE INDEX IF NOT EXISTS historial_producto ON historial (producto);
+"""
+
+class Database:
+    def __init__(self, path=DATABASE_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        self.upgrade()
+        self.connection.commit()
+
+    # Bases creadas por versiones anteriores
+    def upgrade(self):
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(historial)")}
+        if "datos" not in columns:
+            self.connection.execute("ALTER TABLE historial ADD COLUMN datos TEXT")
+
+    # Escrituras: el cursor solo sirve para lastrowid/rowcount
+    def execute(self, sql, parameters=()):
+        with self.lock:
+            return self.connection.execute(sql, parameters)
+
+    def executemany(self, sql, rows):
+        with self.lock:
+            return self.connection.executemany(sql, rows)
+
+    def fetchone(self, sql, parameters=()):
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchone()
+
+    def fetchall(self, sql, parameters=()):
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def commit(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.commit()
+
+    def meta(self, key):
+        row = self.fetchone("SELECT valor FROM meta WHERE clave = ?", (key,))
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.execute("INSERT INTO meta (clave, valor) VALUES (?, ?) ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor", (key, value))
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.commit()
+                self.connection.close()
+                self.connection = None
+
+class SqliteSessionStore:
+    def __init__(self, database, session_name=CURRENT_SESSION):
+        self.database = database
+        self.session_id = self.session_id_for(session_name, create=True)
+        self.dirty = False
+
+    def session_id_for(self, name, create=False):
+        row = self.database.fetchone("SELECT id FROM sesiones WHERE nombre = ?", (name,))
+        if row:
+            return row[0]
+        if not create:
+            return None
+        created = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return self.database.execute("INSERT INTO sesiones (nombre, creada) VALUES (?, ?)", (name, created)).lastrowid
+
+    def record(self, name, weight):
+        if weight is None:
+            self.database.execute("DELETE FROM productos WHERE sesion = ? AND nombre = ?", (self.session_id, name))
+        else:
+            self.database.execute(
+                "INSERT INTO productos (sesion, nombre, peso) VALUES (?, ?, ?) "
+                "ON CONFLICT (sesion, nombre) DO UPDATE SET peso = excluded.peso",
+                (self.session_id, name, weight),
+            )
+        self.dirty = True
+
+    # Confirmar los cambios de la acción terminada
+    def sync(self):
+        if self.dirty:
+            self.database.commit()
+            self.dirty = False
+
+    def load(self):
+        return dict(self.database.fetchall("SELECT nombre, peso FROM productos WHERE sesion = ?", (self.session_id,)))
+
+    # Cada cambio ya está en la base: no hay diario que repetir ni compactar
+    def read(self):
+        return self.load(), False
+
+    def loaded(self, replayed):
+        pass
+
+    # No hay instantánea que reescribir: solo se confirma lo pendiente
+    def compact(self, products, force=False):
+        changed = self.dirty
+        self.sync()
+        if force:
+            self.database.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return changed
+
+    # Cada acción ya se confirmó en sync(); no hay escritura pendiente para otro hilo
+    def snapshot_job(self, products, force=False):
+        self.compact(products, force)
+        return None
+
+    def snapshot_failed(self):
+        self.dirty = True
+
+    # Sesiones con nombre: copias del inventario actual dentro de la misma base
+    def sessions(self):
+        return self.database.fetchall(
+            "SELECT s.nombre, s.creada, COUNT(p.nombre) FROM sesiones s "
+            "LEFT JOIN productos p ON p.sesion = s.id GROUP BY s.id ORDER BY s.nombre"
+        )
+
+    def save_as(self, name):
+        if name == CURRENT_SESSION:
+            raise ValueError(f"El nombre '{CURRENT_SESSION}' está reservado.")
+        self.sync()
+        target = self.session_id_for(name, create=True)
+        self.database.execute("DELETE FROM productos WHERE sesion = ?", (target,))
+        self.database.execute(
+            "INSERT INTO productos (sesion, nombre, peso) SELECT ?, nombre, peso FROM productos WHERE sesion = ?",
+            (target, self.session_id),
+        )
+        self.database.commit()
+
+    # Productos de una sesión guardada ({nombre: peso})
+    def load_named(self, name):
+        session_id = self.session_id_for(name)
+        if session_id is None:
+            raise ValueError(f"La sesión '{name}' no existe.")
+        return dict(self.database.fetchall("SELECT nombre, peso FROM productos WHERE sesion = ?", (session_id,)))
+
+    def delete_named(self, name):
+        if name == CURRENT_SESSION:
+            raise ValueError(f"No se puede eliminar la sesión '{CURRENT_SESSION}'.")
+        self.database.execute("DELETE FROM sesiones WHERE nombre = ?", (name,))
+        self.database.commit()
+
+    def close(self):
+        self.sync()
+        self.database.close()
+
+HISTORY_COLUMNS = ("fecha", "hora", "accion", "detalles", "producto")
+# Campos estructurados de la entrada (delta, cambios, paso), guardados como JSON en "datos"
+HISTORY_DATA_FIELDS = ("delta", "cambios", "paso")
+HISTORY_CHUNK = 5000
+
+def history_values(entry):
+    data = {field: entry[field] for field in HISTORY_DATA_FIELDS if field in entry}
+    return [entry.get(column, "") if column != "producto" else entry.get(column) for column in HISTORY_COLUMNS] + [
+        json.dumps(data, ensure_ascii=False) if data else None
+    ]
+
+def history_row(row):
+    entry = dict(zip(HISTORY_COLUMNS, row))
+    if row[len(HISTORY_COLUMNS)]:
+        entry.update(json.loads(row[len(HISTORY_COLUMNS)]))
+    return entry
+
+class SqliteHistoryLog:
+    def __init__(self, database):
+        self.database = database
+        # COUNT(*) recorre la tabla: se cuenta una vez y luego se suma al escribir
+        self.count = None
+
+    def __len__(self):
+        if self.count is None:
+            self.count = self.database.fetchone("SELECT COUNT(*) FROM historial")[0]
+        return self.count
+
+    @property
+    def actions(self):
+        return [row[0] for row in self.database.fetchall("SELECT DISTINCT accion FROM historial ORDER BY accion")]
+
+    def append(self, entry):
+        self.extend([entry])
+
+    def extend(self, entries):
+        cursor = self.database.executemany(
+            "INSERT INTO historial (fecha, hora, accion, detalles, producto, datos) VALUES (?, ?, ?, ?, ?, ?)",
+            (history_values(entry) for entry in entries),
+        )
+        self.database.commit()
+        if self.count is not None:
+            self.count += cursor.rowcount
+
+    def read(self, number):
+        row = self.database.fetchone(
+            "SELECT fecha, hora, accion, detalles, producto, datos FROM historial WHERE id = ?", (number,)
+        )
+        return history_row(row)
+
+    # Ids de las entradas que cumplen el filtro, de la más reciente a la más antigua
+    def query(self, date_from=None, date_to=None, action=None, product=None):
+        conditions = []
+        parameters = []
+        if date_from:
+            conditions.append("fecha >= ?")
+            parameters.append(date_from)
+        if date_to:
+            conditions.append("fecha <= ?")
+            parameters.append(date_to)
+        if action:
+            conditions.append("accion = ?")
+            parameters.append(action)
+        if product:
+            # Los nombres que coinciden se buscan recorriendo solo el índice de productos
+            conditions.append("producto IN (SELECT DISTINCT producto FROM historial INDEXED BY historial_producto WHERE producto LIKE ? ESCAPE '\\')")
+            escaped = product.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            parameters.append(f"%{escaped}%")
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.database.fetchall(f"SELECT id FROM historial{where} ORDER BY id DESC", parameters)
+        return iter([row[0] for row in rows])
+
+    # Entradas desde la número "start" (0 = la primera) en orden, por tandas para no
+    # dejar un cursor abierto mientras la interfaz escribe
+    def entries_since(self, start):
+        columns = "id, fecha, hora, accion, detalles, producto, datos"
+        rows = self.database.fetchall(
+            f"SELECT {columns} FROM historial ORDER BY id LIMIT ? OFFSET ?", (HISTORY_CHUNK, start)
+        )
+        while rows:
+            for row in rows:
+                yield history_row(row[1:])
+            rows = self.database.fetchall(
+                f"SELECT {columns} FROM historial WHERE id > ? ORDER BY id LIMIT ?", (rows[-1][0], HISTORY_CHUNK)
+            )
+
+    def page(self, numbers, size):
+        ids = []
+        for number in numbers:
+            ids.append(number)
+            if len(ids) >= size:
+                break
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        rows = self.database.fetchall(
+            f"SELECT id, fecha, hora, accion, detalles, producto, datos FROM historial WHERE id IN ({placeholders}) ORDER BY id DESC",
+            ids,
+        )
+        return [history_row(row[1:]) for row in rows]
+
+    def close(self):
+        self.database.close()
+
+# Importar una sola vez la sesión JSON (instantánea + diario) y el historial en disco
+def migrate_json(database, session_store, history_log, session_file, history_file, legacy_history_file=None):
+    if database.meta("migrado"):
+        return False
+    if os.path.exists(session_file):
+        for name, weight in SessionStore(session_file).load().items():
+            session_store.record(name, weight)
+    if os.path.exists(history_file) or (legacy_history_file and os.path.exists(legacy_history_file)):
+        source = HistoryLog(history_file, legacy_history_file)
+        try:
+            history_log.extend(source.read(number) for number in range(len(source)))
+        finally:
+            source.close()
+    database.set_meta("migrado", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    session_store.dirty = True
+    session_store.sync()
+    return True
@@ -0,0 +1,388 @@
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+import zlib
+from totals import to_fixed, from_fixed
+
+# Sincronización entre estaciones de pesaje.
+# Cada producto es un contador sumable sin conflictos (PN-counter): por estación se
+# guardan dos enteros que solo crecen, lo añadido y lo restado (en milésimas de
+# libra). El peso de un producto es la suma de (añadido - restado) de todas las
+# estaciones, y combinar dos estados es tomar el máximo de cada entero, así que el
+# orden y la repetición de los mensajes no importan y todas las estaciones convergen.
+#
+# SyncServer escucha en localhost y reenvía a las demás estaciones los contadores que
+# cambian; cada conexión tiene su cola de salida y su hilo de envío, así que una
+# estación lenta o colgada no frena a las demás (si acumula OUTBOX_FRAMES mensajes se
+# la desconecta y al reconectar recibe el estado completo). SyncClient traduce cada cambio local del ProductLedger a su contador, envía
+# los cambios acumulados cada SYNC_INTERVAL segundos desde un hilo propio y deja los
+# cambios remotos en una cola que la interfaz vacía con root.after. Los mensajes son
+# JSON comprimido con zlib, precedido de su longitud (4 bytes).
+
+SYNC_HOST = "127.0.0.1"
+SYNC_PORT = 8765
+SYNC_INTERVAL = 0.2
+RECONNECT_DELAY = 2.0
+SAVE_INTERVAL = 10.0
+HEADER = struct.Struct("!I")
+MAX_FRAME = 256 * 1024 * 1024
+OUTBOX_FRAMES = 256
+
+def encode_frame(message):
+    data = zlib.compress(json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return HEADER.pack(len(data)) + data
+
+def send_frame(sock, message):
+    sock.sendall(encode_frame(message))
+
+def recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+# Siguiente mensaje, o None si la conexión se cerró
+def recv_frame(sock):
+    header = recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ValueError("Mensaje de sincronización demasiado grande.")
+    data = recv_exact(sock, size)
+    if data is None:
+        return None
+    return json.loads(zlib.decompress(data))
+
+# Estado de los contadores: {producto: {estación: [añadido, restado]}}
+class CounterState:
+    def __init__(self, counters=None):
+        self.counters = counters or {}
+
+    def value(self, product):
+        return sum(added - removed for added, removed in self.counters.get(product, {}).values())
+
+    def has_station(self, station):
+        return any(station in stations for stations in self.counters.values())
+
+    # Sumar una diferencia (en milésimas) al contador de una estación
+    def add(self, station, product, delta):
+        counter = self.counters.setdefault(product, {}).setdefault(station, [0, 0])
+        if delta > 0:
+            counter[0] += delta
+        else:
+            counter[1] -= delta
+
+    # Combinar contadores de una estación {producto: [añadido, restado]};
+    # devuelve los productos cuyo contador cambió
+    def merge_station(self, station, counters):
+        changed = []
+        for product, (added, removed) in counters.items():
+            current = self.counters.setdefault(product, {}).get(station)
+            if current is None:
+                self.counters[product][station] = [added, removed]
+                changed.append(product)
+            elif added > current[0] or removed > current[1]:
+                current[0] = max(current[0], added)
+                current[1] = max(current[1], removed)
+                changed.append(product)
+        return changed
+
+    # Combinar un estado completo; devuelve {estación: productos que cambiaron}
+    def merge(self, counters):
+        by_station = {}
+        for product, stations in counters.items():
+            for station, counter in stations.items():
+                if self.merge_station(station, {product: counter}):
+                    by_station.setdefault(station, []).append(product)
+        return by_station
+
+    def station_counters(self, station, products):
+        return {product: list(self.counters[product][station]) for product in products
+                if station in self.counters.get(product, {})}
+
+    def to_json(self):
+        return {product: {station: list(counter) for station, counter in stations.items()}
+                for product, stations in self.counters.items()}
+
+def load_state(path):
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            return CounterState(json.load(file))
+    return CounterState()
+
+def save_state(state, path):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(state.to_json(), file)
+    os.replace(temp_path, path)
+
+class SyncHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        sock = self.request
+        hello = recv_frame(sock)
+        if not hello or hello.get("tipo") != "hola":
+            return
+        station = hello["estacion"]
+        with server.lock:
+            changed = server.state.merge(hello.get("contadores", {}))
+            server.add_client(sock, station, encode_frame({"tipo": "estado", "contadores": server.state.to_json()}))
+        for origin, products in changed.items():
+            server.broadcast(origin, products, sock)
+        try:
+            while True:
+                message = recv_frame(sock)
+                if message is None:
+                    break
+                if message.get("tipo") == "deltas":
+                    with server.lock:
+                        products = server.state.merge_station(message["estacion"], message["contadores"])
+                    if products:
+                        server.broadcast(message["estacion"], products, sock)
+        except (OSError, ValueError, zlib.error):
+            pass
+        finally:
+            server.remove_client(sock)
+
+# Servidor de sincronización (también sirve como sustituto local en pruebas: port=0
+# elige un puerto libre y start() lo devuelve)
+class SyncServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host=SYNC_HOST, port=SYNC_PORT, state_file=None):
+        super().__init__((host, port), SyncHandler)
+        self.lock = threading.Lock()
+        self.state = load_state(state_file)
+        self.state_file = state_file
+        self.clients = {}
+        # {socket: cola de mensajes ya codificados}; solo su hilo de envío escribe en él
+        self.outboxes = {}
+        self.thread = None
+
+    # Registrar una conexión (con self.lock tomado) y arrancar su hilo de envío
+    def add_client(self, sock, station, first_frame=None):
+        outbox = queue.Queue(OUTBOX_FRAMES)
+        if first_frame is not None:
+            outbox.put_nowait(first_frame)
+        self.clients[sock] = station
+        self.outboxes[sock] = outbox
+        threading.Thread(target=self.send_loop, args=(sock, outbox), daemon=True).start()
+
+    def remove_client(self, sock):
+        with self.lock:
+            self.clients.pop(sock, None)
+            outbox = self.outboxes.pop(sock, None)
+        if outbox is not None:
+            try:
+                outbox.put_nowait(None)
+            except queue.Full:
+                # El hilo de envío sigue ocupado; termina al fallar sobre el socket cerrado
+                pass
+
+    def send_loop(self, sock, outbox):
+        while True:
+            frame = outbox.get()
+            if frame is None:
+                return
+            try:
+                sock.sendall(frame)
+            except OSError:
+                self.disconnect(sock)
+                return
+
+    # Cortar la conexión: el hilo que la atiende ve el cierre y la quita
+    def disconnect(self, sock):
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    # Reenviar los contadores de una estación a todas las demás conexiones; solo encola,
+    # nunca espera a otro socket
+    def broadcast(self, station, products, origin=None):
+        with self.lock:
+            message = {"tipo": "deltas", "estacion": station, "contadores": self.state.station_counters(station, products)}
+            targets = [(sock, outbox) for sock, outbox in self.outboxes.items() if sock is not origin]
+        frame = encode_frame(message)
+        for sock, outbox in targets:
+            try:
+                outbox.put_nowait(frame)
+            except queue.Full:
+                self.disconnect(sock)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self.server_address[1]
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.state_file:
+            with self.lock:
+                save_state(self.state, self.state_file)
+
+class SyncClient:
+    def __init__(self, ledger, station, host=SYNC_HOST, port=SYNC_PORT, state_file=None):
+        self.ledger = ledger
+        self.station = station
+        self.host = host
+        self.port = port
+        self.state_file = state_file
+        self.state = load_state(state_file)
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.inbound = queue.Queue()
+        self.applying = False
+        self.connected = False
+        self.stopped = threading.Event()
+        self.sock = None
+
+    # Enganchar al núcleo: lo que difiera entre la lista local y los contadores
+    # conocidos (primera conexión, cambios hechos sin sincronizar) pasa a ser aporte
+    # de esta estación
+    def attach(self):
+        with self.lock:
+            for product in set(self.ledger.products) | set(self.state.counters):
+                delta = to_fixed(self.ledger.products.get(product, 0)) - self.state.value(product)
+                if delta:
+                    self.state.add(self.station, product, delta)
+                    self.pending.add(product)
+        self.ledger.listeners.append(self.on_local_change)
+        self.ledger.relative_undo = True
+
+    def on_local_change(self, product, old_weight, new_weight):
+        if self.applying:
+            return
+        delta = to_fixed(new_weight or 0) - to_fixed(old_weight or 0)
+        if delta:
+            with self.lock:
+                self.state.add(self.station, product, delta)
+                self.pending.add(product)
+
+    def start(self):
+        self.attach()
+        threading.Thread(target=self.run, daemon=True).start()
+        threading.Thread(target=self.send_loop, daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.save()
+
+    def save(self):
+        if self.state_file:
+            with self.lock:
+                save_state(self.state, self.state_file)
+
+    # Conexión y recepción (hilo propio, reconecta si se cae el servidor)
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=RECONNECT_DELAY)
+                sock.settimeout(None)
+                with self.lock:
+                    hello = {"tipo": "hola", "estacion": self.station, "contadores": self.state.to_json()}
+                    self.pending.clear()
+                send_frame(sock, hello)
+                self.sock = sock
+                self.connected = True
+                self.inbound.put(("conexion", True))
+                while True:
+                    message = recv_frame(sock)
+                    if message is None:
+                        break
+                    self.inbound.put((message["tipo"], message))
+            except (OSError, ValueError, zlib.error):
+                pass
+            if self.connected:
+                self.connected = False
+                self.inbound.put(("conexion", False))
+            self.sock = None
+            self.stopped.wait(RECONNECT_DELAY)
+
+    # Envío por lotes de los contadores propios que cambiaron
+    def send_loop(self):
+        last_save = time.monotonic()
+        while not self.stopped.wait(SYNC_INTERVAL):
+            sock = self.sock
+            if sock is not None and self.connected:
+                with self.lock:
+                    counters = self.state.station_counters(self.station, self.pending)
+                    self.pending.clear()
+                if counters:
+                    try:
+                        send_frame(sock, {"tipo": "deltas", "estacion": self.station, "contadores": counters})
+                    except OSError:
+                        # Se reenvían tras reconectar dentro del estado completo
+                        pass
+            if time.monotonic() - last_save >= SAVE_INTERVAL:
+                self.save()
+                last_save = time.monotonic()
+
+    # Aplicar al núcleo los cambios recibidos (hilo de la interfaz); devuelve los
+    # productos cambiados, o None si no llegó nada
+    def apply_remote(self):
+        changed = set()
+        received = False
+        while True:
+            try:
+                kind, message = self.inbound.get_nowait()
+            except queue.Empty:
+                break
+            received = True
+            if kind == "estado":
+                with self.lock:
+                    self.state.merge(message["contadores"])
+                    changed.update(self.state.counters)
+            elif kind == "deltas":
+                with self.lock:
+                    changed.update(self.state.merge_station(message["estacion"], message["contadores"]))
+        if not changed:
+            return changed if received else None
+        weights = {}
+        with self.lock:
+            for product in changed:
+                # Restas simultáneas en dos estaciones pueden dejar el contador bajo
+                # cero: en el inventario eso es un producto agotado, no un peso negativo
+                value = max(self.state.value(product), 0)
+                if value != to_fixed(self.ledger.products.get(product, 0)):
+                    weights[product] = from_fixed(value) if value else None
+        self.applying = True
+        try:
+            self.ledger.apply_weights(weights)
+        finally:
+            self.applying = False
+        return list(weights)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Servidor de sincronización de estaciones FDA.")
+    parser.add_argument("--host", default=SYNC_HOST)
+    parser.add_argument("--puerto", type=int, default=SYNC_PORT)
+    parser.add_argument("--estado", default="fda_sync_estado.json", help="archivo donde se guarda el estado al cerrar")
+    args = parser.parse_args()
+    server = SyncServer(args.host, args.puerto, args.estado)
+    print(f"Sincronizando en {args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        save_state(server.state, args.estado)
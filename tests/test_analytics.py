@@ -0,0 +1,124 @@
+import json
+from datetime import date, timedelta
+
+import analytics
+from analytics import HistoryRollups, ORDER_IN, ORDER_OUT, ORDER_NET, DAILY_PRODUCT_DAYS, HOURLY_PRODUCT_DAYS, throughput
+from history import HistoryLog
+
+TODAY = date(2026, 3, 10)
+
+def entry(day, hour, product, delta, step, action="Añadido"):
+    return {"fecha": day.isoformat(), "hora": hour, "accion": action, "producto": product,
+            "delta": delta, "paso": step, "detalles": ""}
+
+def make_log(tmp_path, entries):
+    log = HistoryLog(str(tmp_path / "historial.jsonl"))
+    for item in entries:
+        log.append(item)
+    return log
+
+def test_catch_up_adds_only_new_entries(tmp_path):
+    log = make_log(tmp_path, [
+        entry(TODAY, "09:00:00", "queso", 2.5, 1),
+        entry(TODAY, "09:00:30", "leche", 1.0, 2),
+    ])
+    path = str(tmp_path / "historial.resumen.json")
+    rollups = HistoryRollups(path)
+    assert rollups.catch_up(log) == 2
+    assert rollups.save()
+    log.append(entry(TODAY, "10:15:00", "queso", -0.5, 3, "Peso Restado"))
+
+    reloaded = HistoryRollups.load(path)
+    assert reloaded.processed == 2
+    assert reloaded.catch_up(log) == 1
+    assert reloaded.catch_up(log) == 0
+    # Dos acciones en el minuto 09:00 y una a las 10:15
+    assert reloaded.daily(1, TODAY) == [(TODAY.isoformat(), 3.5, 0.5, 3, 2)]
+    assert reloaded.hourly(TODAY.isoformat())[9] == ("09", 3.5, 0.0, 2, 1)
+    assert reloaded.hourly(TODAY.isoformat())[10] == ("10", 0.0, 0.5, 1, 1)
+    log.close()
+
+def test_catch_up_restarts_when_history_was_replaced(tmp_path):
+    log = make_log(tmp_path, [entry(TODAY, "09:00:00", "queso", 1.0, 1)])
+    rollups = HistoryRollups(str(tmp_path / "historial.resumen.json"))
+    rollups.processed = 5
+    rollups.days = {"2000-01-01": [1, 0, 1, 1]}
+    assert rollups.catch_up(log) == 1
+    assert rollups.processed == 1
+    assert list(rollups.days) == [TODAY.isoformat()]
+    log.close()
+
+def test_catch_up_stops_when_cancelled(tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics, "CATCH_UP_CHUNK", 2)
+    log = make_log(tmp_path, [entry(TODAY, "09:00:00", f"p{number}", 1.0, number) for number in range(5)])
+    rollups = HistoryRollups(str(tmp_path / "historial.resumen.json"))
+    progress = []
+    assert rollups.catch_up(log, lambda done, total: progress.append((done, total)), lambda: len(progress) == 1) == 4
+    assert progress == [(2, 5)]
+    # Lo que falta se suma en la siguiente vuelta
+    assert rollups.catch_up(log) == 1
+    assert rollups.daily(1, TODAY)[0][1] == 5.0
+    log.close()
+
+def test_bulk_step_counts_as_one_action_and_legacy_entries_use_details(tmp_path):
+    rollups = HistoryRollups(str(tmp_path / "historial.resumen.json"))
+    rollups.extend([
+        entry(TODAY, "08:00:00", "queso", 1.0, 7, "Ingresado"),
+        entry(TODAY, "08:00:00", "leche", 2.0, 7, "Ingresado"),
+        {"fecha": TODAY.isoformat(), "hora": "08:05:00", "accion": "Peso Restado", "producto": "queso",
+         "detalles": "queso - 0.25 lb"},
+        {"fecha": TODAY.isoformat(), "hora": "08:06:00", "accion": "Masivo", "paso": 8,
+         "cambios": {"queso": 0.5, "leche": -1.5}},
+    ])
+    assert rollups.daily(1, TODAY) == [(TODAY.isoformat(), 3.5, 1.75, 3, 3)]
+
+def test_top_movers_orders_and_window(tmp_path):
+    rollups = HistoryRollups(str(tmp_path / "historial.resumen.json"))
+    week_ago = TODAY - timedelta(days=7)
+    rollups.extend([
+        entry(TODAY, "09:00:00", "queso", 5.0, 1),
+        entry(TODAY, "09:01:00", "queso", -4.0, 2),
+        entry(TODAY - timedelta(days=1), "09:00:00", "leche", 6.0, 3),
+        entry(TODAY, "09:02:00", "pan", -7.0, 4),
+        entry(week_ago, "09:00:00", "arroz", 100.0, 5),
+    ])
+    assert rollups.top_movers(7, until=TODAY) == [
+        ("queso", 5.0, 4.0, 1.0), ("pan", 0.0, 7.0, -7.0), ("leche", 6.0, 0.0, 6.0)]
+    assert [row[0] for row in rollups.top_movers(7, ORDER_IN, until=TODAY)] == ["leche", "queso", "pan"]
+    assert [row[0] for row in rollups.top_movers(7, ORDER_OUT, until=TODAY)] == ["pan", "queso", "leche"]
+    assert [row[0] for row in rollups.top_movers(7, ORDER_NET, limit=2, until=TODAY)] == ["leche", "queso"]
+    # El día de hace una semana queda fuera de 7 días y dentro de 8
+    assert rollups.top_movers(8, limit=1, until=TODAY) == [("arroz", 100.0, 0.0, 100.0)]
+    assert rollups.top_movers(1, until=TODAY - timedelta(days=1)) == [("leche", 6.0, 0.0, 6.0)]
+    assert rollups.hour_movers(TODAY.isoformat(), "09", ORDER_OUT, limit=1) == [("pan", 0.0, 7.0, -7.0)]
+
+def test_throughput(tmp_path):
+    assert throughput([]) == 0.0
+    assert throughput([("2026-03-10", 0.0, 0.0, 0, 0)]) == 0.0
+    rollups = HistoryRollups(str(tmp_path / "historial.resumen.json"))
+    rollups.extend([
+        entry(TODAY, "09:00:00", "queso", 1.0, 1),
+        entry(TODAY, "09:00:20", "queso", 1.0, 2),
+        entry(TODAY, "09:00:40", "queso", 1.0, 3),
+        entry(TODAY, "11:30:00", "queso", 1.0, 4),
+    ])
+    # Cuatro acciones en dos minutos con actividad
+    assert throughput(rollups.daily(7, TODAY)) == 2.0
+    assert throughput(rollups.hourly(TODAY.isoformat())) == 2.0
+
+def test_save_prunes_product_detail(tmp_path):
+    path = str(tmp_path / "historial.resumen.json")
+    rollups = HistoryRollups(path)
+    first = TODAY - timedelta(days=DAILY_PRODUCT_DAYS + 30)
+    for offset in range(DAILY_PRODUCT_DAYS + 31):
+        rollups.add(entry(first + timedelta(days=offset), "12:00:00", "queso", 1.0, offset))
+    assert rollups.save()
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    assert len(data["dias_producto"]) == DAILY_PRODUCT_DAYS
+    assert min(data["dias_producto"]) == (TODAY - timedelta(days=DAILY_PRODUCT_DAYS - 1)).isoformat()
+    assert len(data["horas_producto"]) == HOURLY_PRODUCT_DAYS
+    # Los totales por día se conservan todos
+    assert len(data["dias"]) == DAILY_PRODUCT_DAYS + 31
+    reloaded = HistoryRollups.load(path)
+    assert reloaded.top_movers(DAILY_PRODUCT_DAYS, until=TODAY) == [("queso", DAILY_PRODUCT_DAYS, 0.0, DAILY_PRODUCT_DAYS)]
@@ -0,0 +1,105 @@
+import pytest
+
+from autocomplete import NameIndex, BULK_REBUILD_MIN, normalize
+from ledger import ProductLedger
+
+NAMES = ["Queso Fresco", "queso  manchego", "Queso azul", "Leche entera", "leche descremada", "Pollo",
+         "Carne molida", "Jamón serrano", "Manzana verde", "Tomate"]
+
+# Un índice actualizado paso a paso debe quedar igual que uno construido de cero
+def assert_consistent(index):
+    fresh = NameIndex(index.names)
+    assert index.keys == fresh.keys
+    assert index.names == fresh.names
+    assert index.gram_counts == fresh.gram_counts
+    assert index.grams == fresh.grams
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = ProductLedger(str(tmp_path / "sesion.json"), str(tmp_path / "historial.jsonl"), None)
+    ledger.load()
+    ledger.add_many({name: 1 for name in NAMES})
+    yield ledger
+    ledger.close()
+
+def test_prefix_ignores_case_and_spaces():
+    index = NameIndex(NAMES)
+    assert index.prefix("queso") == ["Queso azul", "Queso Fresco", "queso  manchego"]
+    assert index.prefix("  QUESO   m") == ["queso  manchego"]
+    assert index.prefix("queso", limit=2) == ["Queso azul", "Queso Fresco"]
+    assert index.prefix("queso", limit=None) == ["Queso azul", "Queso Fresco", "queso  manchego"]
+    assert index.prefix("yogur") == []
+    assert index.prefix_range("le") == (2, 4)
+
+def test_contains_uses_trigrams_and_short_text():
+    index = NameIndex(NAMES)
+    assert index.contains("ESO") == {"Queso Fresco", "queso  manchego", "Queso azul"}
+    assert index.contains("so man") == {"queso  manchego"}
+    assert index.contains("a v") == {"Manzana verde"}
+    assert index.contains("ch") == {"queso  manchego", "Leche entera", "leche descremada"}
+    assert index.contains("xyz") == set()
+
+def test_fuzzy_tolerates_typos():
+    index = NameIndex(NAMES)
+    assert index.fuzzy("qeuso fresco")[0] == "Queso Fresco"
+    assert index.fuzzy("lehce entera")[0] == "Leche entera"
+    assert index.fuzzy("jamon serano")[0] == "Jamón serrano"
+    assert index.fuzzy("zz") == []
+    assert index.fuzzy("xyzw") == []
+
+def test_complete_puts_prefix_matches_first():
+    index = NameIndex(NAMES + ["Quesadilla"])
+    assert index.complete("ques", limit=3) == ["Quesadilla", "Queso azul", "Queso Fresco"]
+    assert index.complete("qeuso azul")[0] == "Queso azul"
+    assert index.complete("") == sorted(index.names, key=normalize)[:15]
+    assert len(index.complete("queso", limit=2)) == 2
+
+def test_add_and_remove_keep_index_consistent():
+    index = NameIndex(NAMES)
+    index.add("Queso de cabra")
+    index.add("Queso de cabra")
+    assert len(index) == len(NAMES) + 1
+    index.remove("Pollo")
+    index.remove("no existe")
+    assert_consistent(index)
+    assert index.prefix("pol") == []
+    assert "Pollo" not in index.contains("oll")
+    assert "Pollo" not in index.fuzzy("polo")
+    assert index.prefix("queso d") == ["Queso de cabra"]
+
+def test_names_that_differ_only_in_case():
+    index = NameIndex(["Queso", "queso"])
+    assert len(index) == 2
+    index.remove("queso")
+    assert index.names == ["Queso"]
+    assert index.contains("ques") == {"Queso"}
+    assert_consistent(index)
+
+@pytest.mark.parametrize("count", [10, BULK_REBUILD_MIN + 50])
+def test_bulk_add_and_remove(count):
+    index = NameIndex(NAMES)
+    added = [f"Producto {number:04d}" for number in range(count)]
+    index.add_many(added + ["Pollo"])
+    assert len(index) == len(NAMES) + count
+    assert_consistent(index)
+    index.remove_many(added[::2] + ["Tomate", "no existe"])
+    assert_consistent(index)
+    assert index.prefix("producto 0000") == []
+    assert index.prefix("producto 0001") == ["Producto 0001"]
+    assert "Tomate" not in index.names
+
+def test_ledger_rename_and_delete_update_suggestions(ledger):
+    ledger.rename("Queso azul", "Queso roquefort")
+    assert ledger.name_index.prefix("queso a") == []
+    assert ledger.suggest("queso r")[0] == "Queso roquefort"
+    assert "Queso azul" not in ledger.suggest("queso azul")
+    ledger.delete(["Pollo"])
+    assert "Pollo" not in ledger.suggest("pollo")
+    assert_consistent(ledger.name_index)
+    # Deshacer vuelve a dejar los nombres de antes
+    ledger.undo()
+    ledger.undo()
+    assert ledger.name_index.prefix("queso a") == ["Queso azul"]
+    assert ledger.name_index.prefix("queso r") == []
+    assert ledger.suggest("pollo")[0] == "Pollo"
+    assert_consistent(ledger.name_index)
@@ -0,0 +1,29 @@
+import pytest
+
+import fda_cli
+
+def run_cli(tmp_path, *argv):
+    return fda_cli.main(["--sesion", str(tmp_path / "sesion.json"), "--historial", str(tmp_path / "historial.jsonl"), *argv])
+
+def test_batch_with_malformed_line_reports_it_and_keeps_earlier_orders(tmp_path, capsys):
+    batch = tmp_path / "ordenes.txt"
+    batch.write_text('agregar "queso fresco" 2.5\nagregar leche\nagregar pan 1\n', encoding="utf-8")
+    assert run_cli(tmp_path, "lote", str(batch)) == 1
+    assert "Línea 2:" in capsys.readouterr().err
+    assert run_cli(tmp_path, "listar") == 0
+    assert capsys.readouterr().out == "queso fresco\t2.50\n"
+
+def test_missing_files_report_error_without_traceback(tmp_path, capsys):
+    assert run_cli(tmp_path, "agregar", "queso", "1") == 0
+    assert run_cli(tmp_path, "lote", str(tmp_path / "no_existe.txt")) == 1
+    assert "no_existe.txt" in capsys.readouterr().err
+    assert run_cli(tmp_path, "exportar", str(tmp_path / "no_hay" / "inventario.csv")) == 1
+    assert "inventario.csv" in capsys.readouterr().err
+    # Lo anterior sigue guardado
+    assert run_cli(tmp_path, "listar") == 0
+    assert capsys.readouterr().out == "queso\t1.00\n"
+
+def test_missing_pdf_reports_error(tmp_path, capsys):
+    pytest.importorskip("PyPDF2")
+    assert run_cli(tmp_path, "importar", str(tmp_path / "no_existe.pdf")) == 1
+    assert capsys.readouterr().err.startswith("Error: ")
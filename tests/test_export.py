@@ -0,0 +1,136 @@
+import csv
+import json
+import os
+import zipfile
+import xml.etree.ElementTree as ElementTree
+import pytest
+
+import export
+from export import ExportTable, ExportCancelled, SOURCE_INVENTORY, ORDER_WEIGHT, XLSX_MAIN, inventory_table, write_table
+from ledger import ProductLedger
+
+PRODUCTS = {
+    "queso fresco": 2.5,
+    "jamón serrano «ibérico»": 0.125,
+    "café, molido; \"500 g\"": 1.001,
+    "leche": 3.0,
+}
+
+NAMESPACE = {"x": XLSX_MAIN}
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = ProductLedger(str(tmp_path / "sesion.json"), str(tmp_path / "historial.jsonl"), None)
+    ledger.load()
+    ledger.add_many(PRODUCTS)
+    yield ledger
+    ledger.close()
+
+def read_sheet(path):
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+        names = set(archive.namelist())
+        assert {"[Content_Types].xml", "_rels/.rels", "xl/workbook.xml", "xl/styles.xml"} <= names
+        workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+        raw = archive.read("xl/worksheets/sheet1.xml")
+    sheet_name = workbook.find("x:sheets/x:sheet", NAMESPACE).get("name")
+    rows = []
+    for row in ElementTree.fromstring(raw).iterfind("x:sheetData/x:row", NAMESPACE):
+        cells = {}
+        for cell in row.iterfind("x:c", NAMESPACE):
+            if cell.get("t") == "inlineStr":
+                cells[cell.get("r")] = cell.find("x:is/x:t", NAMESPACE).text
+            else:
+                cells[cell.get("r")] = float(cell.find("x:v", NAMESPACE).text)
+        rows.append(cells)
+    return sheet_name, rows, raw.decode("utf-8")
+
+def test_csv_inventory(ledger, tmp_path):
+    path = str(tmp_path / "inventario.csv")
+    ledger.export(path)
+    with open(path, "rb") as file:
+        assert file.read(3) == b"\xef\xbb\xbf"
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ["producto", "peso_lb"]
+    assert rows[1:] == [[name, repr(PRODUCTS[name])] for name in sorted(PRODUCTS)]
+
+def test_json_lines_inventory_by_weight(ledger, tmp_path):
+    path = str(tmp_path / "inventario.jsonl")
+    ledger.export(path, order=ORDER_WEIGHT)
+    with open(path, encoding="utf-8") as file:
+        lines = [json.loads(line) for line in file]
+    expected = sorted(PRODUCTS.items(), key=lambda item: (-item[1], item[0]))
+    assert lines == [{"producto": name, "peso_lb": weight} for name, weight in expected]
+
+def test_xlsx_inventory(ledger, tmp_path):
+    path = str(tmp_path / "inventario.xlsx")
+    ledger.export(path)
+    sheet_name, rows, raw = read_sheet(path)
+    assert sheet_name == "Lista de Productos"
+    assert rows[0] == {"A1": "producto", "B1": "peso_lb"}
+    assert [(row[f"A{number}"], row[f"B{number}"]) for number, row in enumerate(rows[1:], 2)] == sorted(PRODUCTS.items())
+    # Los pesos son celdas numéricas, no texto
+    assert '<c r="B5"><v>2.5</v></c>' in raw
+    assert '<c r="A2" t="inlineStr">' in raw
+
+def test_xlsx_escapes_text(tmp_path):
+    rows = [
+        ("a & b <c> \"d\"", 1),
+        ("control\x01\x1f fuera\ttab", 2.5),
+        ("", None),
+        (True, -3),
+    ]
+    table = ExportTable(SOURCE_INVENTORY, "Hoja: [uno]/dos?", ("texto", "número"), iter(rows), len(rows))
+    path = str(tmp_path / "especiales.xlsx")
+    write_table(path, table)
+    sheet_name, parsed, raw = read_sheet(path)
+    # Caracteres no permitidos en nombres de hoja se reemplazan
+    assert sheet_name == "Hoja   uno  dos "
+    assert "a &amp; b &lt;c&gt; &quot;d&quot;" in raw
+    assert parsed[1] == {"A2": "a & b <c> \"d\"", "B2": 1.0}
+    assert parsed[2] == {"A3": "control fuera\ttab", "B3": 2.5}
+    # Vacíos y None no generan celda; los booleanos van como texto
+    assert parsed[3] == {}
+    assert parsed[4] == {"A5": "True", "B5": -3.0}
+
+def test_xlsx_column_letters():
+    assert [export.column_letter(number) for number in (0, 25, 26, 27, 701, 702)] == ["A", "Z", "AA", "AB", "ZZ", "AAA"]
+
+def test_unknown_format_writes_nothing(tmp_path):
+    path = str(tmp_path / "inventario.txt")
+    with pytest.raises(ValueError):
+        write_table(path, ExportTable(SOURCE_INVENTORY, "x", ("a",), iter([("b",)])))
+    assert os.listdir(tmp_path) == []
+
+@pytest.mark.parametrize("name", ["inventario.csv", "inventario.jsonl", "inventario.xlsx"])
+def test_cancelled_export_leaves_no_file(ledger, tmp_path, name):
+    ledger.add_many({f"producto {number:05d}": 1 for number in range(export.PROGRESS_EVERY * 2)})
+    path = str(tmp_path / name)
+    before = set(os.listdir(tmp_path))
+    with pytest.raises(ExportCancelled):
+        ledger.export(path, cancelled=lambda: True)
+    assert set(os.listdir(tmp_path)) == before
+    assert not os.path.exists(path + ".tmp")
+
+@pytest.mark.parametrize("name", ["inventario.csv", "inventario.jsonl", "inventario.xlsx"])
+def test_failed_export_keeps_previous_file(tmp_path, name):
+    path = str(tmp_path / name)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("anterior")
+
+    def rows():
+        yield "queso", 1.0
+        raise OSError("disco lleno")
+    with pytest.raises(OSError):
+        write_table(path, ExportTable(SOURCE_INVENTORY, "x", ("producto", "peso_lb"), rows()))
+    assert os.listdir(tmp_path) == [name]
+    with open(path, encoding="utf-8") as file:
+        assert file.read() == "anterior"
+
+def test_progress_reports_every_row(ledger):
+    calls = []
+    table = inventory_table(ledger.products.frozen())
+    table.rows = export.tracked(table.rows, table.count, lambda done, count: calls.append((done, count)))
+    assert len(list(table.rows)) == len(PRODUCTS)
+    assert calls == [(len(PRODUCTS), len(PRODUCTS))]
@@ -0,0 +1,95 @@
+import json
+import os
+from history import HistoryLog, INDEX_FIELDS
+
+ENTRIES = [
+    {"fecha": "2026-01-05", "hora": "08:00:00", "accion": "Añadido", "detalles": "queso - 2.00 lb", "producto": "queso fresco"},
+    {"fecha": "2026-01-05", "hora": "09:00:00", "accion": "Añadido", "detalles": "leche - 1.00 lb", "producto": "leche"},
+    {"fecha": "2026-02-10", "hora": "10:00:00", "accion": "Peso Restado", "detalles": "queso - 0.50 lb", "producto": "queso fresco"},
+    {"fecha": "2026-03-01", "hora": "11:00:00", "accion": "Importado", "detalles": "Lista reemplazada", "producto": None},
+    {"fecha": "2026-03-02", "hora": "12:00:00", "accion": "Añadido", "detalles": "queso duro - 3.00 lb", "producto": "Queso Duro"},
+]
+
+def make_log(tmp_path, entries=ENTRIES):
+    log = HistoryLog(str(tmp_path / "historial.jsonl"))
+    log.append(entries[0])
+    log.extend(entries[1:])
+    return log
+
+def details(log, numbers):
+    return [entry["detalles"] for entry in log.page(numbers, 100)]
+
+def test_query_filters_by_date_action_and_product(tmp_path):
+    log = make_log(tmp_path)
+    assert list(log.query()) == [4, 3, 2, 1, 0]
+    assert list(log.query(date_from="2026-01-06", date_to="2026-03-01")) == [3, 2]
+    assert list(log.query(date_to="2026-01-05")) == [1, 0]
+    assert list(log.query(action="Añadido")) == [4, 1, 0]
+    assert list(log.query(action="Desconocida")) == []
+    # El producto se busca sin distinguir mayúsculas y por subcadena
+    assert list(log.query(product="queso")) == [4, 2, 0]
+    assert list(log.query(date_from="2026-02-01", action="Añadido", product="queso")) == [4]
+    assert details(log, log.query(product="leche")) == ["leche - 1.00 lb"]
+    assert log.page(log.query(), 2) == [ENTRIES[4], ENTRIES[3]]
+    log.close()
+
+def test_index_survives_reopening(tmp_path):
+    make_log(tmp_path).close()
+    log = HistoryLog(str(tmp_path / "historial.jsonl"))
+    assert len(log) == 5
+    assert list(log.query(product="queso", action="Peso Restado")) == [2]
+    assert list(log.entries_since(3)) == ENTRIES[3:]
+    log.close()
+
+def test_recover_after_truncated_index(tmp_path):
+    make_log(tmp_path).close()
+    index_path = tmp_path / "historial.idx"
+    record_size = 8 * INDEX_FIELDS
+    # Índice cortado a mitad del cuarto registro: faltan dos entradas y media
+    with open(index_path, "r+b") as file:
+        file.truncate(record_size * 3 + 5)
+    log = HistoryLog(str(tmp_path / "historial.jsonl"))
+    assert len(log) == 5
+    assert os.path.getsize(index_path) == record_size * 5
+    assert details(log, log.query(date_from="2026-03-01")) == ["queso duro - 3.00 lb", "Lista reemplazada"]
+    log.close()
+
+def test_recover_drops_incomplete_last_line(tmp_path):
+    make_log(tmp_path).close()
+    log_path = tmp_path / "historial.jsonl"
+    with open(log_path, "ab") as file:
+        file.write(b'{"fecha": "2026-03-03", "acc')
+    log = HistoryLog(str(log_path))
+    assert len(log) == 5
+    log.append({"fecha": "2026-03-04", "hora": "", "accion": "Añadido", "detalles": "pan", "producto": "pan"})
+    log.close()
+    log = HistoryLog(str(log_path))
+    assert details(log, log.query(product="pan")) == ["pan"]
+    log.close()
+
+def test_migrate_legacy_history(tmp_path):
+    legacy_path = tmp_path / "historial_acciones.json"
+    legacy_path.write_text(json.dumps(["Añadido: queso - 2.00 lb", "Editado: leche -> leche entera, 1 lb"]), encoding="utf-8")
+    log = HistoryLog(str(tmp_path / "historial.jsonl"), str(legacy_path))
+    assert len(log) == 2
+    newest, oldest = log.page(log.query(), 10)
+    assert (newest["accion"], newest["producto"], newest["detalles"]) == ("Editado", "leche", "leche -> leche entera, 1 lb")
+    assert (oldest["accion"], oldest["detalles"]) == ("Añadido", "queso - 2.00 lb")
+    assert list(log.query(action="Editado")) == [1]
+    log.close()
+    # Solo se migra una vez
+    log = HistoryLog(str(tmp_path / "historial.jsonl"), str(legacy_path))
+    assert len(log) == 2
+    log.close()
+
+def test_date_filter_with_clock_going_back(tmp_path):
+    entries = [dict(ENTRIES[0], fecha="2026-05-02"), dict(ENTRIES[1], fecha="2026-05-01"), dict(ENTRIES[2], fecha="2026-05-03")]
+    log = make_log(tmp_path, entries)
+    assert not log.ordered
+    assert list(log.query(date_from="2026-05-01", date_to="2026-05-01")) == [1]
+    assert list(log.query(date_from="2026-05-02")) == [2, 0]
+    log.close()
+    log = HistoryLog(str(tmp_path / "historial.jsonl"))
+    assert not log.ordered
+    assert list(log.query(date_to="2026-05-01")) == [1]
+    log.close()
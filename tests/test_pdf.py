@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("reportlab")
+PyPDF2 = pytest.importorskip("PyPDF2")
+
+import pdf_export
+from ledger import ProductLedger
+from pdf_export import write_inventory_pdf, ROWS_PER_PAGE
+from pdf_import import read_pdf_products, scan_pdf, read_pdf_pages
+
+def pdf_text(path):
+    return "\n".join(page.extract_text() for page in PyPDF2.PdfReader(str(path)).pages)
+
+def test_page_subtotals_and_total_are_exact(tmp_path):
+    # 0.1 sumado como float muchas veces se desvía; en milésimas da exacto
+    rows = [(f"producto {number:05d}", 0.1) for number in range(ROWS_PER_PAGE * 2 + 5)]
+    path = tmp_path / "inventario.pdf"
+    write_inventory_pdf(str(path), iter(rows), len(rows))
+    text = pdf_text(path)
+    assert f"Subtotal página: {ROWS_PER_PAGE * 0.1:.2f} lb" in text
+    assert f"Acumulado: {ROWS_PER_PAGE * 2 * 0.1:.2f} lb" in text
+    assert f"Total general: {len(rows) / 10:.2f} lb ({len(rows)} productos)" in text
+
+PRODUCTS = {
+    "queso fresco": 2.5,
+    "jamón serrano «ibérico»": 0.125,
+    "café, molido; 500 g": 1.001,
+    "nombre muy largo que no cabe en la columna del pdf y se recorta al dibujarlo": 12345.678,
+    "leche": 3.0,
+}
+
+def test_export_import_round_trip_is_exact(tmp_path):
+    ledger = ProductLedger(str(tmp_path / "sesion.json"), str(tmp_path / "historial.jsonl"), None)
+    ledger.load()
+    ledger.add_many(PRODUCTS)
+    path = str(tmp_path / "inventario.pdf")
+    ledger.export_pdf(path)
+    assert read_pdf_products(path) == PRODUCTS
+    assert scan_pdf(path) == ("productos", PRODUCTS)
+    # Importar sobre una lista vacía deja exactamente lo exportado
+    ledger.clear()
+    ledger.import_pdf(path)
+    assert dict(ledger.snapshot()) == PRODUCTS
+    ledger.close()
+
+def test_text_fallback_without_payload(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_export.PayloadWriter, "embed", lambda self, pdf: None)
+    rows = sorted((name, round(weight, 2)) for name, weight in PRODUCTS.items() if len(name) < 30)
+    rows += [(f"producto {number:04d}", number / 4) for number in range(1, ROWS_PER_PAGE + 10)]
+    path = str(tmp_path / "sin_adjunto.pdf")
+    write_inventory_pdf(path, iter(rows), len(rows))
+    assert scan_pdf(path) == ("paginas", 2)
+    assert read_pdf_products(path) == dict(rows)
+    # La importación por lotes lee las páginas por tramos y llega a lo mismo
+    assert {**read_pdf_pages(path, 0, 1), **read_pdf_pages(path, 1, 2)} == dict(rows)
@@ -0,0 +1,106 @@
+import random
+import pytest
+
+from autocomplete import normalize
+from ledger import ProductLedger
+from product_filter import ProductFilter, ProductView, MODE_PREFIX, REFRESH_THRESHOLD
+
+PRODUCTS = {
+    "Queso Fresco": 2.5, "queso manchego": 10.0, "Queso azul": 0.75, "Leche entera": 3.0,
+    "leche descremada": 1.0, "Pollo": 7.25, "Carne molida": 4.0, "Requesón": 1.5,
+}
+
+FILTERS = [
+    ProductFilter(),
+    ProductFilter("queso"),
+    ProductFilter("QUESO", MODE_PREFIX),
+    ProductFilter("e", min_weight=1.0),
+    ProductFilter(max_weight=2.5),
+    ProductFilter("leche", MODE_PREFIX, 1.5, 3.0),
+    ProductFilter("no existe"),
+]
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = ProductLedger(str(tmp_path / "sesion.json"), str(tmp_path / "historial.jsonl"), None)
+    ledger.load()
+    ledger.add_many(PRODUCTS)
+    yield ledger
+    ledger.close()
+
+def expected(ledger, product_filter):
+    return sorted((name for name, weight in ledger.snapshot() if product_filter.matches(name, weight)), key=normalize)
+
+def test_filter_matches():
+    assert not ProductFilter().active
+    assert ProductFilter(min_weight=0).active
+    assert ProductFilter("  QUESO   az").matches("queso azul", 1)
+    assert ProductFilter("ques").matches("Requesón", 1)
+    assert not ProductFilter("ques", MODE_PREFIX).matches("Requesón", 1)
+    # Límites inclusivos, comparados en milésimas
+    assert ProductFilter(min_weight=0.1, max_weight=0.3).matches("x", 0.1 + 0.2)
+    assert not ProductFilter(max_weight=0.3).matches("x", 0.301)
+
+@pytest.mark.parametrize("product_filter", FILTERS)
+def test_refresh_lists_matching_products_in_order(ledger, product_filter):
+    view = ProductView(ledger)
+    view.set_filter(product_filter)
+    assert view.names == expected(ledger, product_filter)
+    assert view.keys == [normalize(name) for name in view.names]
+    assert view.window(1, 2) == view.names[1:3]
+
+def test_update_follows_edits_rename_and_delete(ledger):
+    view = ProductView(ledger)
+    view.set_filter(ProductFilter("queso", min_weight=1.0))
+    assert view.names == ["Queso Fresco", "queso manchego"]
+    changed = []
+    ledger.listeners.append(lambda name, old_weight, weight: changed.append(name))
+
+    def apply():
+        view.update(changed)
+        changed.clear()
+        assert view.names == expected(ledger, view.filter)
+
+    ledger.add("Queso azul", 0.5)
+    apply()
+    assert "Queso azul" in view.names
+    ledger.subtract("Queso Fresco", 2.0)
+    apply()
+    assert "Queso Fresco" not in view.names
+    ledger.rename("queso manchego", "Manchego curado")
+    apply()
+    assert "queso manchego" not in view.names
+    ledger.rename("Pollo", "Pollo con queso")
+    apply()
+    assert "Pollo con queso" in view.names
+    ledger.delete(["Queso azul"])
+    apply()
+    ledger.undo()
+    apply()
+    assert view.names == ["Pollo con queso", "Queso azul"]
+
+@pytest.mark.parametrize("product_filter", FILTERS[:6])
+def test_random_updates_match_refresh(ledger, product_filter):
+    generator = random.Random(7)
+    view = ProductView(ledger)
+    view.set_filter(product_filter)
+    changed = []
+    ledger.listeners.append(lambda name, old_weight, weight: changed.append(name))
+    names = list(PRODUCTS) + ["queso crema", "Leche de cabra", "Pan"]
+    for _ in range(200):
+        name = generator.choice(names)
+        if name in ledger and generator.random() < 0.3:
+            ledger.delete([name])
+        else:
+            ledger.add(name, generator.choice((0.5, 1.0, 2.0)))
+        view.update(changed)
+        changed.clear()
+        assert view.names == expected(ledger, product_filter)
+
+def test_many_changes_refresh_everything(ledger):
+    view = ProductView(ledger)
+    view.set_filter(ProductFilter("producto"))
+    added = {f"producto {number:04d}": 1 for number in range(REFRESH_THRESHOLD + 1)}
+    ledger.add_many(added)
+    view.update(added)
+    assert view.names == sorted(added)
@@ -0,0 +1,85 @@
+import pytest
+from ledger import ProductLedger
+from reconcile import compare, prepare_source, source_label, ADDED, REMOVED, CHANGED, CURRENT, NAMED_PREFIX
+from totals import MAX_FIXED
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = ProductLedger(str(tmp_path / "sesion.json"), str(tmp_path / "historial.jsonl"), None)
+    ledger.load()
+    yield ledger
+    ledger.close()
+
+def kinds(result):
+    return {difference.name: difference.kind for difference in result.differences}
+
+def test_compare_lists_added_removed_and_changed():
+    result = compare({"queso": 2000, "leche": 1000, "pan": 500}, {"queso": 2500, "pan": 500, "arroz": 3000})
+    assert kinds(result) == {"queso": CHANGED, "leche": REMOVED, "arroz": ADDED}
+    assert [difference.name for difference in result.differences] == ["arroz", "leche", "queso"]
+    assert result.unchanged == 1 and result.tolerated == 0
+    assert result.total_delta == 2.5
+    assert [difference.name for difference in result.only([ADDED, REMOVED])] == ["arroz", "leche"]
+    assert result.summary() == "1 añadidos, 1 eliminados, 1 cambiados, 1 iguales"
+
+def test_compare_tolerances_are_counted_not_listed():
+    left = {"queso": 100000, "leche": 1000}
+    right = {"queso": 100900, "leche": 1040}
+    assert len(compare(left, right)) == 2
+    # Absoluta en libras: 0.05 lb cubre la leche pero no el queso
+    result = compare(left, right, tolerance=0.05)
+    assert kinds(result) == {"queso": CHANGED}
+    assert result.tolerated == 1
+    # Relativa al peso de la izquierda: 1 % de 100 lb cubre 0.9 lb, no 4 % de 1 lb
+    result = compare(left, right, relative=0.01)
+    assert kinds(result) == {"leche": CHANGED}
+    assert compare(left, right, tolerance=0.05, relative=0.01).tolerated == 2
+
+def test_prepare_source_reads_current_and_session_files(ledger, tmp_path):
+    other = ProductLedger(str(tmp_path / "otra.json"), str(tmp_path / "otra.jsonl"), None)
+    other.load()
+    other.add("queso", 3)
+    other.save()
+    # Después de la instantánea: el diario también cuenta
+    other.add("pan", 1)
+    ledger.add("queso", 2)
+    ledger.add("leche", 1)
+    current = prepare_source(CURRENT, ledger)
+    ledger.add("arroz", 5)
+    # La copia se tomó al preparar
+    assert current() == {"queso": 2000, "leche": 1000}
+    assert prepare_source(str(tmp_path / "otra.json"), ledger)() == {"queso": 3000, "pan": 1000}
+    assert source_label(str(tmp_path / "otra.json")) == "otra.json"
+    other.close()
+    with pytest.raises(ValueError):
+        prepare_source(str(tmp_path / "no_existe.json"), ledger)()
+    with pytest.raises(ValueError):
+        prepare_source(NAMED_PREFIX + "ayer", ledger)
+    with pytest.raises(ValueError):
+        prepare_source("  ", ledger)
+
+def test_apply_differences_then_undo(ledger):
+    ledger.add("queso", 2)
+    ledger.add("leche", 1)
+    ledger.add("pan", 0.5)
+    target = {"queso": 2500, "pan": 500, "arroz": 3000}
+    result = compare(prepare_source(CURRENT, ledger)(), target)
+    changed = ledger.apply_differences(result.differences, "otra estación")
+    assert sorted(changed) == ["arroz", "leche", "queso"]
+    assert dict(ledger.snapshot()) == {"arroz": 3.0, "pan": 0.5, "queso": 2.5}
+    ledger.undo()
+    assert dict(ledger.snapshot()) == {"leche": 1.0, "pan": 0.5, "queso": 2.0}
+    assert ledger.suggest("arr") == []
+    ledger.redo()
+    assert dict(ledger.snapshot()) == {"arroz": 3.0, "pan": 0.5, "queso": 2.5}
+
+def test_apply_differences_overflow_changes_nothing(ledger):
+    ledger.add("queso", 2)
+    ledger.add("leche", 1)
+    result = compare({"leche": 1000, "queso": 0}, {"leche": 0, "queso": MAX_FIXED})
+    with pytest.raises(ValueError):
+        ledger.apply_differences(result.differences)
+    assert dict(ledger.snapshot()) == {"leche": 1.0, "queso": 2.0}
+    assert ledger.undo_journal.current is None
+    ledger.undo()
+    assert dict(ledger.snapshot()) == {"queso": 2.0}
@@ -0,0 +1,18 @@
+import asyncio
+import pytest
+from scale_device import DeviceReader, StreamScale, parse_reading
+
+def test_parse_reading_rejects_non_finite():
+    for line in ("inf", "leche,inf", "queso;nan", "pollo,1e30"):
+        with pytest.raises(ValueError):
+            parse_reading(line)
+
+def test_read_device_counts_bad_weights_and_keeps_reading(tmp_path):
+    path = tmp_path / "bascula.txt"
+    path.write_text("leche,1.5\nleche,inf\nqueso,1e30\nqueso,-2\nqueso,0.25\n", encoding="utf-8")
+    reader = DeviceReader([str(path)])
+    asyncio.run(reader.read_device(str(path), StreamScale(str(path))))
+    assert reader.rejected == 3
+    weights, count = reader.drain()
+    assert weights == {"leche": 1.5, "queso": 0.25}
+    assert count == 2
@@ -0,0 +1,20 @@
+import csv
+import pytest
+from scale_ingest import ingest_files, parse_weight
+
+@pytest.mark.parametrize("text", ["inf", "-inf", "nan", "1e30"])
+def test_parse_weight_rejects_non_finite_and_huge(text):
+    with pytest.raises(ValueError):
+        parse_weight(text)
+
+def test_inf_line_goes_to_reject_report(tmp_path):
+    log = tmp_path / "bascula.csv"
+    log.write_text("producto,peso\nleche,inf\nqueso,2.5\nleche,1e30\nleche,1\n", encoding="utf-8")
+    reject_path = tmp_path / "rechazos.csv"
+    result = ingest_files([str(log)], str(reject_path))
+    assert result.products() == {"queso": 2.5, "leche": 1.0}
+    assert result.accepted == 2
+    assert result.rejected == 2
+    with open(reject_path, encoding="utf-8-sig", newline="") as file:
+        rows = list(csv.reader(file))
+    assert [row[1] for row in rows[1:]] == ["2", "4"]
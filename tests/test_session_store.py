@@ -0,0 +1,69 @@
+import json
+from ledger import ProductLedger
+
+def open_ledger_in(tmp_path):
+    return ProductLedger(str(tmp_path / "sesion.json"), str(tmp_path / "historial.jsonl"), None)
+
+# Sesión tras un cierre inesperado: instantánea + diario sin compactar
+def crashed_session(tmp_path):
+    ledger = open_ledger_in(tmp_path)
+    ledger.load()
+    ledger.add("queso", 2.5)
+    ledger.save()
+    ledger.add("leche", 4)
+    ledger.session_store.close()
+    ledger.history_log.close()
+
+def test_read_session_does_not_mark_store_dirty(tmp_path):
+    crashed_session(tmp_path)
+    ledger = open_ledger_in(tmp_path)
+    products, name_index, replayed = ledger.read_session()
+    assert replayed
+    assert not ledger.session_store.dirty
+    assert not ledger.installed
+    ledger.close()
+
+def test_closing_during_load_keeps_snapshot_and_journal(tmp_path):
+    crashed_session(tmp_path)
+    snapshot = (tmp_path / "sesion.json").read_text(encoding="utf-8")
+    ledger = open_ledger_in(tmp_path)
+    # El trabajo de carga leyó la sesión pero se canceló antes de instalarla
+    ledger.read_session()
+    assert ledger.save() is False
+    ledger.close()
+    assert (tmp_path / "sesion.json").read_text(encoding="utf-8") == snapshot
+    assert json.loads(snapshot) == {"queso": 2.5}
+    reopened = open_ledger_in(tmp_path)
+    reopened.load()
+    assert dict(reopened.products.items()) == {"queso": 2.5, "leche": 4.0}
+    reopened.close()
+
+def test_install_marks_replayed_journal_for_compaction(tmp_path):
+    crashed_session(tmp_path)
+    ledger = open_ledger_in(tmp_path)
+    ledger.load()
+    assert ledger.installed
+    assert ledger.save() is True
+    ledger.close()
+    assert json.loads((tmp_path / "sesion.json").read_text(encoding="utf-8")) == {"queso": 2.5, "leche": 4.0}
+
+def test_journal_is_written_once_per_action(tmp_path):
+    ledger = open_ledger_in(tmp_path)
+    ledger.load()
+    store = ledger.session_store
+    flushes = []
+    journal = store.open_journal()
+    flush = journal.flush
+    journal.flush = lambda: (flushes.append(1), flush())
+    ledger.add_many({f"queso {number}": 1.5 for number in range(1000)}, "lote")
+    assert flushes == [1]
+    assert store.pending == []
+    with open(store.journal_path, encoding="utf-8") as file:
+        assert sum(1 for _ in file) == 1000
+    # Otro proceso que abre la sesión ve todo lo que se hizo (sin compactar)
+    store.close()
+    ledger.history_log.close()
+    reopened = open_ledger_in(tmp_path)
+    reopened.load()
+    assert len(reopened.products) == 1000
+    reopened.close()
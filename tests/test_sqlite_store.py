@@ -0,0 +1,35 @@
+import threading
+from ledger import open_ledger, STORAGE_SQLITE
+
+def test_background_reads_while_the_ui_thread_writes(tmp_path):
+    ledger = open_ledger(STORAGE_SQLITE, str(tmp_path / "fda.sqlite3"), str(tmp_path / "sesion.json"),
+                         str(tmp_path / "historial.jsonl"), None)
+    ledger.load()
+    errors = []
+    done = threading.Event()
+
+    # Lo que hacen los trabajos en segundo plano: cargar la sesión y leer el historial
+    def read():
+        try:
+            while not done.is_set():
+                ledger.session_store.read()
+                history = ledger.history_log
+                sum(1 for _ in history.entries_since(0))
+                history.page(history.query(product="queso"), 50)
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    try:
+        for number in range(500):
+            ledger.add(f"queso {number % 40}", 1.5)
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+    assert errors == []
+    assert ledger.session_store.read()[0] == {name: weight for name, weight in ledger.snapshot()}
+    assert len(ledger.history_log) == 500
+    ledger.close()
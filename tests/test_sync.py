@@ -0,0 +1,111 @@
+import threading
+import time
+import pytest
+from ledger import ProductLedger
+from sync import SyncServer, SyncClient, HEADER, OUTBOX_FRAMES
+
+# Socket falso: guarda lo enviado; si stalled está puesto, sendall queda colgado hasta
+# que se cierre (como una estación que dejó de leer)
+class FakeSocket:
+    def __init__(self, stalled=False):
+        self.data = bytearray()
+        self.sent = threading.Event()
+        self.closed = threading.Event()
+        self.stalled = stalled
+
+    def sendall(self, data):
+        if self.stalled:
+            self.closed.wait()
+            raise OSError("conexión cerrada")
+        self.data += data
+        self.sent.set()
+
+    def shutdown(self, how):
+        self.closed.set()
+
+def frames(data):
+    offset = 0
+    while offset < len(data):
+        (size,) = HEADER.unpack_from(data, offset)
+        offset += HEADER.size + size
+        yield size
+    assert offset == len(data)
+
+def test_stalled_station_does_not_block_relays_and_gets_disconnected():
+    server = SyncServer(port=0)
+    try:
+        server.state.add("a", "queso", 1500)
+        stalled, listening = FakeSocket(stalled=True), FakeSocket()
+        with server.lock:
+            server.add_client(stalled, "b")
+            server.add_client(listening, "c")
+        start = time.monotonic()
+        for _ in range(OUTBOX_FRAMES + 2):
+            server.broadcast("a", ["queso"])
+        assert time.monotonic() - start < 1
+        assert listening.sent.wait(1)
+        assert stalled.closed.wait(1)
+        deadline = time.monotonic() + 2
+        while len(list(frames(listening.data))) < OUTBOX_FRAMES + 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(set(frames(listening.data))) == 1
+        assert len(list(frames(listening.data))) == OUTBOX_FRAMES + 2
+        assert not listening.closed.is_set()
+    finally:
+        for sock in (stalled, listening):
+            server.remove_client(sock)
+        server.server_close()
+
+@pytest.fixture
+def stations(tmp_path):
+    server = SyncServer(port=0)
+    port = server.start()
+    ledgers = []
+    clients = []
+    for station in ("a", "b"):
+        ledger = ProductLedger(str(tmp_path / f"{station}.json"), str(tmp_path / f"{station}.jsonl"), None)
+        ledger.load()
+        ledgers.append(ledger)
+        clients.append(SyncClient(ledger, station, port=port))
+    yield server, ledgers, clients
+    for client in clients:
+        client.stop()
+    for ledger in ledgers:
+        ledger.close()
+    server.stop()
+
+# Vaciar las colas de las estaciones (como root.after) hasta que se cumpla la condición
+def wait_until(clients, condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for client in clients:
+            client.apply_remote()
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_simultaneous_subtractions_never_store_a_negative_weight(stations):
+    server, (a, b), clients = stations
+    a.add("queso", 2)
+    for client in clients:
+        client.start()
+    assert wait_until(clients, lambda: b.products.get("queso") == 2)
+    # Las dos estaciones restan antes de ver la resta de la otra: contador en -1 lb
+    a.subtract("queso", 1.5)
+    b.subtract("queso", 1.5)
+    assert wait_until(clients, lambda: all(client.state.value("queso") == -1000 for client in clients))
+    assert wait_until(clients, lambda: "queso" not in a.products and "queso" not in b.products)
+    assert a.total == 0 and b.total == 0
+
+def test_relative_undo_after_remote_subtraction_removes_instead_of_going_negative(tmp_path):
+    ledger = ProductLedger(str(tmp_path / "sesion.json"), str(tmp_path / "historial.jsonl"), None)
+    ledger.load()
+    ledger.relative_undo = True
+    ledger.add("queso", 2)
+    # Otra estación restó 1.5 lb: deshacer el agregado daría -1.5
+    ledger.apply_weights({"queso": 0.5})
+    ledger.undo()
+    assert "queso" not in ledger.products
+    assert ledger.total == 0
+    ledger.close()
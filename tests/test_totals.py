@@ -0,0 +1,48 @@
+import random
+from product_store import ProductStore
+from totals import TotalsLedger, GroupTotals, HEAP_SLACK, to_fixed
+
+def test_group_min_max_follow_removals():
+    group = GroupTotals()
+    for value in (5, 1, 9, 1):
+        group.add(value)
+    group.remove(1)
+    assert group.stats()["min"] == 0.001
+    group.remove(1)
+    group.remove(9)
+    stats = group.stats()
+    assert (stats["count"], stats["min"], stats["max"]) == (1, 0.005, 0.005)
+    group.remove(5)
+    assert group.stats() == {"total": 0.0, "count": 0, "min": 0.0, "max": 0.0}
+
+def test_ledger_groups_and_prefixes():
+    store = ProductStore()
+    totals = TotalsLedger(store)
+    for name, weight in (("queso fresco", 2.0), ("queso duro", 3.5), ("leche", 1.0)):
+        old = store.fixed(name)
+        store.set_fixed(name, to_fixed(weight))
+        totals.update(name, old, to_fixed(weight))
+    assert totals.prefix("queso d") == {"total": 3.5, "count": 1, "min": 3.5, "max": 3.5}
+    store.set_fixed("queso duro", to_fixed(0.5))
+    totals.update("queso duro", to_fixed(3.5), to_fixed(0.5))
+    assert totals.group("queso") == {"total": 2.5, "count": 2, "min": 0.5, "max": 2.0}
+    assert [key for key, _ in totals.group_stats()] == ["leche", "queso"]
+
+def test_group_min_max_match_a_full_scan_under_random_changes():
+    generator = random.Random(7)
+    group = GroupTotals()
+    present = []
+    for _ in range(5000):
+        if present and generator.random() < 0.45:
+            group.remove(present.pop(generator.randrange(len(present))))
+        else:
+            value = generator.randrange(1, 200)
+            group.add(value)
+            present.append(value)
+        if generator.random() < 0.2:
+            stats = group.stats()
+            expected = (min(present) / 1000, max(present) / 1000) if present else (0.0, 0.0)
+            assert (stats["min"], stats["max"]) == expected
+            assert stats["count"] == len(present)
+    # Los montículos no crecen con los valores ya borrados
+    assert len(group.low) <= 2 * len(group.values) + HEAP_SLACK + 1
@@ -0,0 +1,117 @@
+import pytest
+from ledger import ProductLedger
+from undo import UndoJournal
+
+@pytest.fixture
+def make_ledger(tmp_path):
+    ledgers = []
+
+    def make(**options):
+        ledger = ProductLedger(str(tmp_path / f"sesion{len(ledgers)}.json"), str(tmp_path / f"historial{len(ledgers)}.jsonl"), None, **options)
+        ledger.load()
+        ledgers.append(ledger)
+        return ledger
+    yield make
+    for ledger in ledgers:
+        ledger.close()
+
+@pytest.fixture
+def ledger(make_ledger):
+    return make_ledger()
+
+def inventory(ledger):
+    return dict(ledger.snapshot())
+
+def test_undo_and_redo_add(ledger):
+    ledger.add("queso", 2)
+    ledger.add("queso", 0.5)
+    assert ledger.undo() == ["queso"]
+    assert inventory(ledger) == {"queso": 2.0}
+    ledger.undo()
+    assert inventory(ledger) == {}
+    assert ledger.suggest("que") == []
+    assert ledger.undo() is None
+    ledger.redo()
+    ledger.redo()
+    assert inventory(ledger) == {"queso": 2.5}
+    assert ledger.redo() is None
+
+def test_new_action_clears_redo(ledger):
+    ledger.add("queso", 2)
+    ledger.undo()
+    ledger.add("leche", 1)
+    assert ledger.redo() is None
+    assert inventory(ledger) == {"leche": 1.0}
+
+def test_undo_edit_restores_name_and_weight(ledger):
+    ledger.add("queso", 2)
+    ledger.edit("queso", "queso fresco", subtract=0.5)
+    assert inventory(ledger) == {"queso fresco": 1.5}
+    ledger.undo()
+    assert inventory(ledger) == {"queso": 2.0}
+    assert ledger.suggest("queso") == ["queso"]
+    ledger.redo()
+    assert inventory(ledger) == {"queso fresco": 1.5}
+
+def test_undo_combining_rename_splits_products_again(ledger):
+    ledger.add("queso", 2)
+    ledger.add("queso fresco", 1)
+    ledger.rename("queso", "queso fresco")
+    assert inventory(ledger) == {"queso fresco": 3.0}
+    ledger.undo()
+    assert inventory(ledger) == {"queso": 2.0, "queso fresco": 1.0}
+    ledger.redo()
+    assert inventory(ledger) == {"queso fresco": 3.0}
+
+def test_bulk_add_many_and_replace_are_single_steps(ledger):
+    ledger.add("queso", 2)
+    ledger.add_many({"queso": 1, "leche": 4, "pan": 0.25}, "báscula")
+    assert inventory(ledger) == {"queso": 3.0, "leche": 4.0, "pan": 0.25}
+    ledger.replace({"arroz": 10}, "archivo.pdf")
+    assert inventory(ledger) == {"arroz": 10.0}
+    ledger.undo()
+    assert inventory(ledger) == {"queso": 3.0, "leche": 4.0, "pan": 0.25}
+    ledger.undo()
+    assert inventory(ledger) == {"queso": 2.0}
+    assert ledger.suggest("le") == []
+    ledger.redo()
+    ledger.redo()
+    assert inventory(ledger) == {"arroz": 10.0}
+
+def test_max_steps_keeps_only_the_latest_steps(make_ledger):
+    ledger = make_ledger(undo_max_steps=3)
+    for number in range(5):
+        ledger.add(f"producto {number}", 1)
+    undone = 0
+    while ledger.undo() is not None:
+        undone += 1
+    assert undone == 3
+    assert set(inventory(ledger)) == {"producto 0", "producto 1"}
+
+def test_max_changes_drops_old_steps_but_keeps_the_latest(make_ledger):
+    ledger = make_ledger(undo_max_changes=10)
+    ledger.add_many({f"a {number}": 1 for number in range(6)})
+    ledger.add_many({f"b {number}": 1 for number in range(6)})
+    # Los dos pasos suman 12 cambios: el primero se descarta
+    assert ledger.undo_journal.change_count == 6
+    ledger.undo()
+    assert ledger.undo() is None
+    assert len(inventory(ledger)) == 6
+    # Un solo paso más grande que el límite se conserva igual
+    ledger.add_many({f"c {number}": 1 for number in range(20)})
+    assert ledger.undo() is not None
+    assert len(inventory(ledger)) == 6
+
+def test_journal_merges_repeated_changes_and_drops_no_ops():
+    journal = UndoJournal()
+    journal.begin()
+    journal.record("queso", None, 1.0)
+    journal.record("queso", 1.0, 2.0)
+    journal.record("leche", 3.0, 3.0)
+    journal.commit()
+    assert journal.undo_pairs() == {"queso": (2.0, None)}
+    assert journal.redo_pairs() == {"queso": (None, 2.0)}
+    journal.begin()
+    journal.record("pan", 1.0, 1.0)
+    journal.commit()
+    assert journal.undo_pairs() == {"queso": (2.0, None)}
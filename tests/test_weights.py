@@ -0,0 +1,45 @@
+import math
+import pytest
+from ledger import ProductLedger
+from product_store import ProductStore
+from totals import MAX_FIXED
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = ProductLedger(str(tmp_path / "sesion.json"), str(tmp_path / "historial.jsonl"), None)
+    ledger.load()
+    yield ledger
+    ledger.close()
+
+def assert_untouched(ledger):
+    assert "grande" not in ledger.products
+    assert ledger.suggest("gran") == []
+    assert ledger.undo_journal.current is None
+    assert len(ledger.history_log) == 0
+    assert ledger.total == 0
+
+@pytest.mark.parametrize("weight", [1e20, math.inf, math.nan, 0.0001])
+def test_out_of_range_weight_leaves_index_untouched(ledger, weight):
+    with pytest.raises(ValueError):
+        ledger.add("grande", weight)
+    assert_untouched(ledger)
+
+def test_sum_past_the_limit_is_rejected_before_any_change(ledger):
+    ledger.add("queso", 1)
+    with pytest.raises(ValueError):
+        ledger.add("queso", (MAX_FIXED - 10) / 1000)
+    assert ledger.products.fixed("queso") == 1000
+    assert ledger.undo_journal.current is None
+
+def test_edit_rejects_huge_new_weight(ledger):
+    ledger.add("queso", 1)
+    with pytest.raises(ValueError):
+        ledger.edit("queso", new_weight=1e20)
+    assert ledger.products.fixed("queso") == 1000
+
+def test_store_overflow_leaves_no_slot():
+    store = ProductStore()
+    with pytest.raises(OverflowError):
+        store.set_fixed("grande", MAX_FIXED + 1)
+    assert "grande" not in store
+    assert store.names == [] and len(store.weights) == 0
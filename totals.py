@@ -0,0 +1,185 @@
+import heapq
+import math
+
+# Los pesos se guardan como enteros en milésimas de libra para que los totales sean exactos
+WEIGHT_SCALE = 1000
+# Mayor valor (en milésimas) que cabe en los arrays 'q' de ProductStore
+MAX_FIXED = 2 ** 63 - 1
+
+# Entradas borradas que se toleran en los montículos de GroupTotals antes de rehacerlos
+HEAP_SLACK = 64
+
+def to_fixed(weight):
+    return int(round(weight * WEIGHT_SCALE))
+
+def from_fixed(value):
+    return value / WEIGHT_SCALE
+
+# Milésimas de un peso leído o ingresado, o None si no es finito o no cabe en los arrays
+def checked_fixed(weight):
+    if not math.isfinite(weight):
+        return None
+    value = to_fixed(weight)
+    return value if -MAX_FIXED <= value <= MAX_FIXED else None
+
+# Unidades para mostrar e ingresar pesos; el inventario siempre se guarda en libras
+UNIT_LB = "lb"
+UNIT_KG = "kg"
+UNITS = (UNIT_LB, UNIT_KG)
+KG_PER_LB = 0.45359237
+
+def to_unit(weight, unit):
+    return weight * KG_PER_LB if unit == UNIT_KG else weight
+
+def from_unit(weight, unit):
+    return weight / KG_PER_LB if unit == UNIT_KG else weight
+
+def format_weight(weight, unit=UNIT_LB):
+    return f"{to_unit(weight, unit):.2f} {unit}"
+
+# Categoría por defecto: la primera palabra del nombre ("queso fresco" -> "queso")
+def default_group_key(name):
+    parts = name.strip().lower().split()
+    return parts[0] if parts else ""
+
+# Subtotal de una categoría: suma y cantidad al día en O(1); mínimo y máximo con dos
+# montículos (el del máximo con valores negados) y borrado perezoso: quitar un valor
+# solo baja su cuenta, y stats() descarta de la cima los que ya no están. Cada valor
+# distinto entra una vez a cada montículo, así que add cuesta O(log d) y stats O(log d)
+# amortizado (d = valores distintos); si los montículos acumulan muchos valores
+# borrados se reconstruyen
+class GroupTotals:
+    __slots__ = ("total", "count", "values", "low", "high")
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+        # {valor: cuántos productos lo tienen}
+        self.values = {}
+        self.low = []
+        self.high = []
+
+    def add(self, value):
+        self.total += value
+        self.count += 1
+        count = self.values.get(value, 0)
+        self.values[value] = count + 1
+        if not count:
+            heapq.heappush(self.low, value)
+            heapq.heappush(self.high, -value)
+
+    def remove(self, value):
+        self.total -= value
+        self.count -= 1
+        left = self.values[value] - 1
+        if left:
+            self.values[value] = left
+        else:
+            del self.values[value]
+            if len(self.low) > 2 * len(self.values) + HEAP_SLACK:
+                self.low = list(self.values)
+                heapq.heapify(self.low)
+                self.high = [-value for value in self.values]
+                heapq.heapify(self.high)
+
+    def stats(self):
+        values = self.values
+        while self.low and self.low[0] not in values:
+            heapq.heappop(self.low)
+        while self.high and -self.high[0] not in values:
+            heapq.heappop(self.high)
+        return {
+            "total": from_fixed(self.total),
+            "count": self.count,
+            "min": from_fixed(self.low[0]) if values else 0.0,
+            "max": from_fixed(-self.high[0]) if values else 0.0,
+        }
+
+# Libro de totales: se actualiza por diferencias, sin recorrer el inventario. Los pesos
+# y el total general los lleva el ProductStore; aquí quedan las categorías y prefijos
+class TotalsLedger:
+    def __init__(self, store, group_key=default_group_key):
+        self.store = store
+        self.group_key = group_key
+        self.groups = {}
+        self.prefixes = {}
+
+    @property
+    def total(self):
+        return from_fixed(self.store.total_fixed)
+
+    @property
+    def total_fixed(self):
+        return self.store.total_fixed
+
+    @property
+    def count(self):
+        return len(self.store)
+
+    # Subtotales afectados por un nombre: su categoría y los prefijos seguidos que coinciden
+    def affected_groups(self, name, create=False):
+        groups = []
+        if self.group_key is not None:
+            key = self.group_key(name)
+            group = self.groups.get(key)
+            if group is None and create:
+                group = self.groups[key] = GroupTotals()
+            if group is not None:
+                groups.append(group)
+        for prefix, group in self.prefixes.items():
+            if name.startswith(prefix):
+                groups.append(group)
+        return groups
+
+    # Un peso cambió en el store (en milésimas; None = no estaba / se eliminó)
+    def update(self, name, old_value, value):
+        if old_value == value:
+            return
+        groups = self.affected_groups(name, create=value is not None)
+        for group in groups:
+            if old_value is not None:
+                group.remove(old_value)
+            if value is not None:
+                group.add(value)
+        if value is None and self.group_key is not None:
+            key = self.group_key(name)
+            if not self.groups[key].count:
+                del self.groups[key]
+
+    def clear(self):
+        self.groups.clear()
+        for prefix in self.prefixes:
+            self.prefixes[prefix] = GroupTotals()
+
+    # Reconstrucción completa (carga, importación)
+    def reset(self, store):
+        self.store = store
+        self.clear()
+        for name, value in store.fixed_items():
+            for group in self.affected_groups(name, create=True):
+                group.add(value)
+
+    def group(self, key):
+        group = self.groups.get(key)
+        return group.stats() if group is not None else GroupTotals().stats()
+
+    # [(categoría, subtotales)] ordenadas por nombre
+    def group_stats(self):
+        return [(key, self.groups[key].stats()) for key in sorted(self.groups)]
+
+    # Empezar a seguir un prefijo (p. ej. "queso" para todas las líneas "queso*")
+    def track_prefix(self, prefix):
+        if prefix in self.prefixes:
+            return
+        group = GroupTotals()
+        for name, value in self.store.fixed_items():
+            if name.startswith(prefix):
+                group.add(value)
+        self.prefixes[prefix] = group
+
+    def untrack_prefix(self, prefix):
+        self.prefixes.pop(prefix, None)
+
+    def prefix(self, prefix):
+        self.track_prefix(prefix)
+        return self.prefixes[prefix].stats()
@@ -0,0 +1,81 @@
+from collections import deque
+
+# Diario de deshacer/rehacer basado en diferencias.
+# Cada paso guarda solo los productos que cambiaron: {nombre: [peso_anterior, peso_nuevo]},
+# donde None significa que el producto no existía (o dejó de existir).
+
+DEFAULT_MAX_STEPS = 200
+DEFAULT_MAX_CHANGES = 200000
+
+class UndoJournal:
+    def __init__(self, max_steps=DEFAULT_MAX_STEPS, max_changes=DEFAULT_MAX_CHANGES):
+        self.max_steps = max_steps
+        self.max_changes = max_changes
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self.current = None
+        self.change_count = 0
+
+    # Abrir un paso nuevo; invalida lo que se pudiera rehacer
+    def begin(self, label=""):
+        self.commit()
+        self.current = {"label": label, "changes": {}}
+        self.redo_steps.clear()
+
+    def record(self, name, old_weight, new_weight):
+        if self.current is None:
+            return
+        changes = self.current["changes"]
+        if name in changes:
+            changes[name][1] = new_weight
+        else:
+            changes[name] = [old_weight, new_weight]
+
+    # Cerrar el paso abierto; los pasos sin cambios efectivos se descartan
+    def commit(self):
+        step = self.current
+        self.current = None
+        if step is None:
+            return
+        changes = step["changes"]
+        for name in [name for name, (old, new) in changes.items() if old == new]:
+            del changes[name]
+        if not changes:
+            return
+        self.undo_steps.append(step)
+        self.change_count += len(changes)
+        self.trim()
+
+    # Respetar la profundidad máxima y el límite de cambios guardados (memoria);
+    # el paso más reciente se conserva siempre
+    def trim(self):
+        while len(self.undo_steps) > 1 and (len(self.undo_steps) > self.max_steps or self.change_count > self.max_changes):
+            dropped = self.undo_steps.popleft()
+            self.change_count -= len(dropped["changes"])
+
+    # Devuelve {nombre: (peso actual esperado, peso a aplicar)} para revertir el último paso
+    def undo_pairs(self):
+        self.commit()
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        self.change_count -= len(step["changes"])
+        self.redo_steps.append(step)
+        return {name: (new, old) for name, (old, new) in step["changes"].items()}
+
+    # Lo mismo para repetir el último paso deshecho
+    def redo_pairs(self):
+        self.commit()
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        self.undo_steps.append(step)
+        self.change_count += len(step["changes"])
+        self.trim()
+        return {name: (old, new) for name, (old, new) in step["changes"].items()}
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.current = None
+        self.change_count = 0